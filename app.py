@@ -2,46 +2,232 @@ import streamlit as st
 import pandas as pd
 from datetime import datetime, timedelta
 import os
+import hashlib
+import io
+import tempfile
 import database as db # Your database module
-from PIL import Image
-
-# --- db.py needs to ensure these tables and columns exist ---
-# Example: In db.init_db():
-#   add_customer_fields_if_not_exist() # To add ReferenceID to Customers
-#   add_order_fields_if_not_exist()    # To add ReferenceID to Orders
-#   create_invoices_table()
-#   Ensure Projects table has CustomerID
-#   create_project_materials_table() # NEW
+from PIL import Image, ImageOps, features
+
+# --- Database schema ---
+# db.init_db() applies any pending numbered migrations from database.py (applied
+# versions are recorded in the schema_version table). After the first call in a
+# process it returns at once, so reruns never introspect or ALTER the schema.
+# Schema changes go in as a new migration at the end of db._MIGRATIONS.
 # --------------------------------------------------------------
 
 st.set_page_config(layout="wide")
+db.reset_profile()  # Performance panel tallies start fresh each rerun (DIYI_PROFILE=1)
+db.init_db()
 st.title("🛋️ DYI Furniture Management System")
 
+# --- Thumbnail cache ---
+# Grids and edit pages show small previews, so full-resolution uploads are only
+# decoded once: uploads write a fixed-size thumbnail named after the SHA-256 of the
+# original's bytes, and files that predate the cache get theirs on first view.
+THUMBNAIL_DIR = os.path.join(db.IMAGE_DIR, "thumbnails")
+THUMBNAIL_SIZE = (320, 320)
+THUMBNAIL_FORMAT = "WEBP" if features.check("webp") else "JPEG"
+THUMBNAIL_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+
+def write_thumbnail(data):
+    """Writes the thumbnail for image bytes `data` unless it is already cached and returns its path."""
+    digest = hashlib.sha256(data).hexdigest()
+    thumb_path = os.path.join(THUMBNAIL_DIR, f"{digest}.{THUMBNAIL_FORMAT.lower()}")
+    if not os.path.exists(thumb_path):
+        os.makedirs(THUMBNAIL_DIR, exist_ok=True)
+        with Image.open(io.BytesIO(data)) as img:
+            img.draft("RGB", THUMBNAIL_SIZE) # Lets JPEG decode at a reduced scale
+            thumb = ImageOps.exif_transpose(img)
+            thumb.thumbnail(THUMBNAIL_SIZE)
+            if THUMBNAIL_FORMAT == "JPEG" or thumb.mode not in ("RGB", "RGBA"):
+                thumb = thumb.convert("RGB" if THUMBNAIL_FORMAT == "JPEG" else "RGBA")
+            tmp_path = f"{thumb_path}.{os.getpid()}.tmp"
+            thumb.save(tmp_path, THUMBNAIL_FORMAT, quality=80)
+        os.replace(tmp_path, thumb_path)
+    return thumb_path
+
+@st.cache_data(show_spinner=False)
+def _cached_thumbnail(image_path, mtime, size):
+    with open(image_path, "rb") as f:
+        return write_thumbnail(f.read())
+
+def thumbnail_path(image_path):
+    """Thumbnail for a stored image, backfilled on first use; None for missing files and non-images."""
+    if not image_path or not image_path.lower().endswith(THUMBNAIL_EXTENSIONS):
+        return None
+    try:
+        stat = os.stat(image_path)
+        return _cached_thumbnail(image_path, stat.st_mtime_ns, stat.st_size)
+    except OSError:
+        return None
+
+def existing_files(paths):
+    """Returns the subset of `paths` that exist, listing each directory once instead of stat-ing every file."""
+    paths = {p for p in paths if isinstance(p, str) and p}
+    names_by_dir = {}
+    for directory in {os.path.dirname(p) or "." for p in paths}:
+        try:
+            with os.scandir(directory) as entries:
+                names_by_dir[directory] = {entry.name for entry in entries if entry.is_file()}
+        except OSError:
+            names_by_dir[directory] = set()
+    return {p for p in paths if os.path.basename(p) in names_by_dir[os.path.dirname(p) or "."]}
+
+def selected_grid_row(grid_key, frame):
+    """The row picked in a single-row-selection st.dataframe as a dict, or None."""
+    grid_state = st.session_state.get(grid_key)
+    selected = grid_state.selection.rows if grid_state else []
+    if selected and selected[0] < len(frame):
+        return frame.iloc[[selected[0]]].to_dict("records")[0]
+    return None
+
 # --- Helper for saving uploaded file (modified for receipts) ---
+def _save_upload_with_thumbnail(uploaded_file, directory, filename):
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+    path = os.path.join(directory, filename)
+    data = uploaded_file.getvalue()
+    with open(path, "wb") as f:
+        f.write(data)
+    if path.lower().endswith(THUMBNAIL_EXTENSIONS):
+        try:
+            write_thumbnail(data)
+        except OSError:
+            pass # The original is saved; thumbnail_path() retries on first view
+    return path
+
 def save_uploaded_receipt(uploaded_file, service_id): # Changed parameters
     if uploaded_file is not None:
         file_extension = os.path.splitext(uploaded_file.name)[1]
-        if not os.path.exists(db.RECEIPT_DIR):
-            os.makedirs(db.RECEIPT_DIR)
-        filename = f"service_{service_id}_receipt{file_extension}"
-        receipt_path = os.path.join(db.RECEIPT_DIR, filename)
-        with open(receipt_path, "wb") as f:
-            f.write(uploaded_file.getbuffer())
-        return receipt_path
+        return _save_upload_with_thumbnail(uploaded_file, db.RECEIPT_DIR, f"service_{service_id}_receipt{file_extension}")
     return None
 
 def save_uploaded_product_image(uploaded_file, product_id_or_sku):
     if uploaded_file is not None:
         file_extension = os.path.splitext(uploaded_file.name)[1]
-        if not os.path.exists(db.IMAGE_DIR):
-            os.makedirs(db.IMAGE_DIR)
-        filename = f"product_{product_id_or_sku}{file_extension}"
-        img_path = os.path.join(db.IMAGE_DIR, filename)
-        with open(img_path, "wb") as f:
-            f.write(uploaded_file.getbuffer())
-        return img_path
+        return _save_upload_with_thumbnail(uploaded_file, db.IMAGE_DIR, f"product_{product_id_or_sku}{file_extension}")
     return None
 
+# --- Display formatting ---
+# Grids keep money and dates in numeric/datetime dtypes and let st.column_config
+# format them in the browser, so no Python runs per cell and the columns still
+# sort by value instead of as text. Status columns get a badge through one
+# dictionary replace per column.
+CURRENCY_FORMAT = "Rs. %,.2f"
+DATE_FORMAT = "YYYY-MM-DD"
+MONEY_COLUMNS = {"TotalAmount", "Amount", "Cost", "CostPerUnit", "CostPrice", "SellingPrice", "Budget", "UnitPriceAtSale",
+                 "Discount", "LineTotal", "LineCost", "CostPerUnitAtTimeOfUse", "Revenue", "ExpenseCost",
+                 "UnloggedServiceCost", "MaterialCost", "TotalCost", "Profit", "Gross", "Net", "UnitCost", "StockValue",
+                 "COGS", "GrossProfit", "OperatingExpenses", "NetOperatingIncome"}
+DATE_COLUMNS = {"OrderDate", "IssueDate", "DueDate", "PaymentDate", "ExpenseDate", "ServiceDate", "StartDate", "EndDate", "DateAdded", "Period"}
+STATUS_COLUMNS = {"Status", "OrderStatus", "PaymentStatus"}
+STATUS_BADGES = {
+    "Paid": "🟢 Paid", "Delivered": "🟢 Delivered", "Completed": "🟢 Completed",
+    "Sent": "🔵 Sent", "Confirmed": "🔵 Confirmed", "Processing": "🔵 Processing", "Shipped": "🔵 Shipped", "In Progress": "🔵 In Progress",
+    "Pending": "🟡 Pending", "Planning": "🟡 Planning", "On Hold": "🟡 On Hold", "Partially Paid": "🟡 Partially Paid", "Draft": "⚪ Draft",
+    "Unpaid": "🔴 Unpaid", "Overdue": "🔴 Overdue", "Cancelled": "⚫ Cancelled", "Refunded": "⚫ Refunded",
+}
+
+def show_grid(frame, columns=None, labels=None, **kwargs):
+    """st.dataframe with currency, date and status formatting picked by column name; returns the widget value."""
+    labels = labels or {}
+    columns = [col for col in (columns if columns is not None else frame.columns) if col in frame.columns]
+    view = frame[columns].copy()
+    column_config = {}
+    for col in columns:
+        label = labels.get(col)
+        if col in MONEY_COLUMNS:
+            if not pd.api.types.is_numeric_dtype(view[col]):
+                view[col] = pd.to_numeric(view[col], errors="coerce")
+            column_config[col] = st.column_config.NumberColumn(label, format=CURRENCY_FORMAT)
+        elif col in DATE_COLUMNS:
+            if not pd.api.types.is_datetime64_any_dtype(view[col]):
+                view[col] = pd.to_datetime(view[col], errors="coerce")
+            column_config[col] = st.column_config.DateColumn(label, format=DATE_FORMAT)
+        elif col in STATUS_COLUMNS:
+            view[col] = view[col].replace(STATUS_BADGES)
+            column_config[col] = st.column_config.TextColumn(label)
+        elif label:
+            column_config[col] = label
+    kwargs.setdefault("use_container_width", True)
+    kwargs.setdefault("hide_index", True)
+    return st.dataframe(view, column_config=column_config, **kwargs)
+
+# --- Helper for paging "View All" grids ---
+# Pages are fetched with keyset cursors: the state keeps the key of the row that
+# ended each previous page, so "Next" never re-reads earlier rows. Search results
+# come back best match first, so their cursor is the (SearchRank, key) pair.
+PAGE_SIZE_OPTIONS = [25, 50, 100, 250]
+CUSTOMER_DETAIL_PAGE_SIZE = 25
+
+def pager_cursor(grid_key, page_size, filter_signature=None):
+    """Key of the row that ended the previous page (None on page 1); resets when the filter or page size changes."""
+    pager_state_key = f"{grid_key}_pager"
+    pager_signature = (filter_signature, page_size)
+    if st.session_state.get(pager_state_key, {}).get("signature") != pager_signature:
+        st.session_state[pager_state_key] = {"signature": pager_signature, "cursors": [None]}
+    return st.session_state[pager_state_key]["cursors"][-1]
+
+def pager_controls(grid_key, page_rows, total_count, key_column, page_size):
+    cursors = st.session_state[f"{grid_key}_pager"]["cursors"]
+    page_number = len(cursors)
+    total_pages = max(1, -(-total_count // page_size))
+    has_next_page = len(page_rows) == page_size and page_number < total_pages
+
+    col_prev, col_next, col_info = st.columns([1, 1, 4])
+    if col_prev.button("⬅️ Previous", key=f"{grid_key}_prev", disabled=page_number == 1):
+        cursors.pop()
+        st.rerun()
+    if col_next.button("Next ➡️", key=f"{grid_key}_next", disabled=not has_next_page):
+        last_row = page_rows.tail(1).to_dict("records")[0] if isinstance(page_rows, pd.DataFrame) else page_rows[-1]
+        cursors.append((last_row["SearchRank"], last_row[key_column]) if "SearchRank" in last_row.keys() else last_row[key_column])
+        st.rerun()
+    col_info.caption(f"Page {page_number} of {total_pages} · {total_count:,} records")
+
+def paginated_rows(grid_key, fetch_page, total_count, key_column, filter_signature=None):
+    page_size = st.selectbox("Rows per page", PAGE_SIZE_OPTIONS, index=1, key=f"{grid_key}_page_size")
+    page_rows = fetch_page(limit=page_size, after=pager_cursor(grid_key, page_size, filter_signature))
+    pager_controls(grid_key, page_rows, total_count, key_column, page_size)
+    return page_rows
+
+# --- Helper for exports ---
+# The file is only built when its download button is clicked. Streamlit runs
+# that callable on its own thread, so the page stays usable while the export
+# is written batch by batch to a temporary file.
+EXPORT_MIME_TYPES = {"csv": "text/csv", "parquet": "application/vnd.apache.parquet"}
+
+def export_controls(export_key, file_stem, frame=None, query_name=None, **query_kwargs):
+    """Exports `frame`, or every row of the db.fetch_frame query `query_name` (same search/columns as the grid)."""
+    if frame is not None:
+        make_batches = lambda: [frame]
+    else:
+        make_batches = lambda: db.iter_frame_batches(query_name, **query_kwargs)
+    col_format, col_button = st.columns([1, 4])
+    export_format = col_format.selectbox("Export format", db.EXPORT_FORMATS, format_func=str.upper,
+                                         key=f"{export_key}_export_format", label_visibility="collapsed")
+
+    def build_export():
+        with tempfile.TemporaryFile() as export_file:
+            db.export_frames(make_batches(), export_file, export_format)
+            export_file.seek(0)
+            return export_file.read()
+
+    col_button.download_button(f"⬇️ Export {export_format.upper()}", data=build_export, file_name=f"{file_stem}.{export_format}",
+                               mime=EXPORT_MIME_TYPES[export_format], key=f"{export_key}_export", on_click="ignore")
+
+# --- Helper for bulk imports ---
+IMPORT_CHUNK_SIZE = 5000
+IMPORT_ENTITIES = {"Customers": "customers", "Products": "products", "Materials": "materials", "Expenses": "expenses"}
+
+def read_import_chunks(uploaded_file, chunk_size=IMPORT_CHUNK_SIZE):
+    """Yields the upload as DataFrames of text values; CSV is parsed chunk by chunk, XLSX sheets are sliced."""
+    if uploaded_file.name.lower().endswith(".xlsx"):
+        sheet = pd.read_excel(uploaded_file, dtype=str)
+        for start in range(0, len(sheet), chunk_size):
+            yield sheet.iloc[start:start + chunk_size]
+    else:
+        yield from pd.read_csv(uploaded_file, dtype=str, keep_default_na=False, chunksize=chunk_size)
+
 # --- Sidebar Navigation ---
 st.sidebar.header("Navigation")
 modules = [
@@ -49,7 +235,7 @@ modules = [
     "Supplier Services",
     "Material Management", "Product Management", "Project Management",
     "Sales Book (Orders)", "Invoice Tracking", 
-    "Expense Tracking", "Reports"
+    "Expense Tracking", "Bulk Import", "Reports"
 ]
 choice = st.sidebar.radio("Go to", modules)
 
@@ -70,69 +256,32 @@ if 'current_order_items_main' not in st.session_state: # For Sales Book
 
 if choice == "Dashboard":
     st.header("📊 Dashboard")
-    customers = db.get_all_customers()
-    products = db.get_all_products()
-    suppliers = db.get_all_suppliers()
-    materials = db.get_all_materials()
-    try:
-        projects_rows = db.get_all_projects() 
-        projects = db.rows_to_dicts(projects_rows) if projects_rows else []
-    except Exception as e:
-        st.error(f"Error loading project data for Dashboard: {e}")
-        st.warning("The Dashboard might be incomplete. This could be due to a database schema issue (e.g., missing 'Projects.CustomerID'). Please check `database.py`.")
-        projects = [] 
-
-    expenses_rows = db.get_all_expenses()
-    expenses = db.rows_to_dicts(expenses_rows) if expenses_rows else []
-    services_rows = db.get_all_supplier_services()
-    services_count = len(services_rows) if services_rows else 0
-    invoices_rows = db.get_all_invoices() 
-    invoices = db.rows_to_dicts(invoices_rows) if invoices_rows else []
-
+    kpis = db.get_dashboard_kpis()
 
     col1, col2, col3, col4 = st.columns(4)
-    col1.metric("Total Customers", len(db.rows_to_dicts(customers)) if customers else 0)
-    col2.metric("Total Products", len(db.rows_to_dicts(products)) if products else 0)
-    col3.metric("Total Suppliers", len(db.rows_to_dicts(suppliers)) if suppliers else 0)
-    col4.metric("Total Materials", len(db.rows_to_dicts(materials)) if materials else 0)
+    col1.metric("Total Customers", kpis["TotalCustomers"])
+    col2.metric("Total Products", kpis["TotalProducts"])
+    col3.metric("Total Suppliers", kpis["TotalSuppliers"])
+    col4.metric("Total Materials", kpis["TotalMaterials"])
 
     col5, col6, col7, col8 = st.columns(4)
-    col5.metric("Total Projects", len(projects) if projects else 0)
-
-    total_revenue_from_invoices = sum(inv['TotalAmount'] for inv in invoices if inv.get('Status') == 'Paid' and inv.get('TotalAmount'))
-    col6.metric("Total Sales Revenue (from Paid Invoices)", f"Rs. {total_revenue_from_invoices:,.2f}")
-
-    total_expenses_val = sum(e['Amount'] for e in expenses if e.get('Amount'))
-    col7.metric("Total Expenses", f"Rs. {total_expenses_val:,.2f}")
-    col8.metric("Total Supplier Services Logged", services_count)
+    col5.metric("Total Projects", kpis["TotalProjects"])
+    col6.metric("Total Sales Revenue (from Paid Invoices)", f"Rs. {kpis['PaidInvoiceRevenue']:,.2f}")
+    col7.metric("Total Expenses", f"Rs. {kpis['TotalExpenses']:,.2f}")
+    col8.metric("Total Supplier Services Logged", kpis["TotalSupplierServices"])
 
     st.subheader("Recent Orders")
     recent_orders_rows = db.get_all_orders(limit=5) 
     if recent_orders_rows:
-        st.dataframe(db.rows_to_dicts(recent_orders_rows), use_container_width=True)
+        show_grid(pd.DataFrame(db.rows_to_dicts(recent_orders_rows)), ['OrderID', 'OrderDate', 'CustomerName', 'ProjectName', 'OrderStatus', 'TotalAmount', 'PaymentStatus'])
     else:
         st.info("No orders yet.")
 
     st.subheader("Recent Invoices")
-    if invoices:
-        recent_invoices_df = pd.DataFrame(invoices) # invoices is already list of dicts
-        if not recent_invoices_df.empty:
-            recent_invoices_df['IssueDate'] = pd.to_datetime(recent_invoices_df['IssueDate'])
-            if 'PaymentDate' in recent_invoices_df.columns:
-                recent_invoices_df['PaymentDate_Display'] = pd.to_datetime(recent_invoices_df['PaymentDate'], errors='coerce').dt.strftime('%Y-%m-%d').fillna('N/A')
-            else:
-                recent_invoices_df['PaymentDate_Display'] = 'N/A'
-            
-            recent_invoices_df = recent_invoices_df.sort_values(by='IssueDate', ascending=False).head(5)
-            
-            cols_recent_inv_display = ['InvoiceReferenceID', 'CustomerName', 'ProjectName', 'TotalAmount', 'Status', 'IssueDate']
-            if 'PaymentDate_Display' in recent_invoices_df.columns: # Check again on the potentially modified df
-                cols_recent_inv_display.append('PaymentDate_Display')
-            
-            final_cols_recent_inv = [col for col in cols_recent_inv_display if col in recent_invoices_df.columns]
-            st.dataframe(recent_invoices_df[final_cols_recent_inv], use_container_width=True, hide_index=True)
-        else:
-            st.info("No invoices yet.")
+    recent_invoices_rows = db.get_recent_invoices(limit=5)
+    if recent_invoices_rows:
+        recent_invoices_df = pd.DataFrame(db.rows_to_dicts(recent_invoices_rows))
+        show_grid(recent_invoices_df, ['InvoiceReferenceID', 'CustomerName', 'ProjectName', 'TotalAmount', 'Status', 'IssueDate', 'PaymentDate'])
     else:
         st.info("No invoices yet.")
 
@@ -149,54 +298,53 @@ elif choice == "Customer Management":
         if action == "View All Customers":
             st.subheader("Existing Customers")
             search_term_cust = st.text_input("Search Customers (by Name, Email, or Ref ID)", key="search_cust_view_all")
-            customers_list_rows = db.get_all_customers(search_term=search_term_cust)
+            cols_to_show = ['CustomerID', 'CustomerName', 'Email', 'Phone', 'ReferenceID', 'BillingAddress', 'ShippingAddress', 'Notes']
+            df_customers = paginated_rows(
+                "customer_grid",
+                lambda limit, after: db.fetch_frame("customers", columns=cols_to_show, search_term=search_term_cust, limit=limit, after=after),
+                db.count_customers(search_term=search_term_cust), "CustomerID", filter_signature=search_term_cust)
             
-            if customers_list_rows:
-                customers_dicts = db.rows_to_dicts(customers_list_rows)
-                if not customers_dicts:
-                    st.info("No customers found or added yet.")
-                else:
-                    df_customers = pd.DataFrame(customers_dicts)
-                    cols_to_show = ['CustomerID', 'CustomerName', 'Email', 'Phone', 'ReferenceID', 'BillingAddress', 'ShippingAddress', 'Notes']
-                    cols_to_show_filtered = [col for col in cols_to_show if col in df_customers.columns]
-                    
-                    st.dataframe(df_customers[cols_to_show_filtered],
-                                 use_container_width=True,
-                                 key="customer_df_main_list", 
-                                 on_select="rerun",
-                                 selection_mode="single-row",
-                                 hide_index=True)
-
-                    dataframe_selection_state = st.session_state.get("customer_df_main_list", None)
+            if not df_customers.empty:
+                export_controls("customer_grid", "customers", query_name="customers", columns=cols_to_show, search_term=search_term_cust)
+                cols_to_show_filtered = [col for col in cols_to_show if col in df_customers.columns]
+                
+                st.dataframe(df_customers[cols_to_show_filtered],
+                             use_container_width=True,
+                             key="customer_df_main_list", 
+                             on_select="rerun",
+                             selection_mode="single-row",
+                             hide_index=True)
+
+                dataframe_selection_state = st.session_state.get("customer_df_main_list", None)
+                
+                if dataframe_selection_state and dataframe_selection_state.selection.rows:
+                    selected_row_index = dataframe_selection_state.selection.rows[0]
+                    if not df_customers.empty and selected_row_index < len(df_customers):
+                        st.session_state.active_selection_for_button_cust_id = int(df_customers.iloc[selected_row_index]['CustomerID'])
+                        st.session_state.active_selection_for_button_cust_name = df_customers.iloc[selected_row_index]['CustomerName']
+                    else:
+                        st.session_state.active_selection_for_button_cust_id = None
+                        st.session_state.active_selection_for_button_cust_name = None
+                else: # This else might be hit on initial load or after deselection logic.
+                    # If a button was just clicked, this part should ideally not clear the state needed for the button press itself.
+                    # The current logic for on_select="rerun" and then button click should be okay if session state for button is stable.
+                    # To be safe, only clear if it's explicitly a de-selection event or df is empty.
+                    # For now, this simpler logic is kept; if issues, more nuanced handling of dataframe_selection_state needed.
+                    if not (dataframe_selection_state and dataframe_selection_state.selection.rows):
+                         st.session_state.active_selection_for_button_cust_id = None
+                         st.session_state.active_selection_for_button_cust_name = None
+
+
+                if st.session_state.active_selection_for_button_cust_id is not None:
+                    cust_id_for_btn = st.session_state.active_selection_for_button_cust_id
+                    cust_name_for_btn = str(st.session_state.active_selection_for_button_cust_name) if st.session_state.active_selection_for_button_cust_name is not None else "N/A"
                     
-                    if dataframe_selection_state and dataframe_selection_state.selection.rows:
-                        selected_row_index = dataframe_selection_state.selection.rows[0]
-                        if not df_customers.empty and selected_row_index < len(df_customers):
-                            st.session_state.active_selection_for_button_cust_id = df_customers.iloc[selected_row_index]['CustomerID']
-                            st.session_state.active_selection_for_button_cust_name = df_customers.iloc[selected_row_index]['CustomerName']
-                        else:
-                            st.session_state.active_selection_for_button_cust_id = None
-                            st.session_state.active_selection_for_button_cust_name = None
-                    else: # This else might be hit on initial load or after deselection logic.
-                        # If a button was just clicked, this part should ideally not clear the state needed for the button press itself.
-                        # The current logic for on_select="rerun" and then button click should be okay if session state for button is stable.
-                        # To be safe, only clear if it's explicitly a de-selection event or df is empty.
-                        # For now, this simpler logic is kept; if issues, more nuanced handling of dataframe_selection_state needed.
-                        if not (dataframe_selection_state and dataframe_selection_state.selection.rows):
-                             st.session_state.active_selection_for_button_cust_id = None
-                             st.session_state.active_selection_for_button_cust_name = None
-
-
-                    if st.session_state.active_selection_for_button_cust_id is not None:
-                        cust_id_for_btn = st.session_state.active_selection_for_button_cust_id
-                        cust_name_for_btn = str(st.session_state.active_selection_for_button_cust_name) if st.session_state.active_selection_for_button_cust_name is not None else "N/A"
-                        
-                        if st.button(f"View Details for {cust_name_for_btn} (ID: {cust_id_for_btn})", key=f"view_detail_btn_for_{cust_id_for_btn}"):
-                            st.session_state.selected_customer_id_for_detail_view = cust_id_for_btn
-                            st.session_state.customer_management_action_view = "Details"
-                            st.session_state.active_selection_for_button_cust_id = None 
-                            st.session_state.active_selection_for_button_cust_name = None
-                            st.rerun()
+                    if st.button(f"View Details for {cust_name_for_btn} (ID: {cust_id_for_btn})", key=f"view_detail_btn_for_{cust_id_for_btn}"):
+                        st.session_state.selected_customer_id_for_detail_view = cust_id_for_btn
+                        st.session_state.customer_management_action_view = "Details"
+                        st.session_state.active_selection_for_button_cust_id = None 
+                        st.session_state.active_selection_for_button_cust_name = None
+                        st.rerun()
             else:
                 st.info("No customers found or added yet.")
         # ... (Rest of Customer Management Add, Edit, Delete as before) ...
@@ -221,7 +369,7 @@ elif choice == "Customer Management":
         
         elif action == "Edit Customer":
             st.subheader("Edit Customer")
-            customers_list_edit_rows = db.get_all_customers()
+            customers_list_edit_rows = db.get_reference_list("Customers")
             if not customers_list_edit_rows: 
                 st.info("No customers to edit.")
             else:
@@ -262,7 +410,7 @@ elif choice == "Customer Management":
 
         elif action == "Delete Customer":
             st.subheader("Delete Customer")
-            customers_list_del_rows = db.get_all_customers()
+            customers_list_del_rows = db.get_reference_list("Customers")
             if not customers_list_del_rows: 
                 st.info("No customers to delete.")
             else:
@@ -293,10 +441,16 @@ elif choice == "Customer Management":
         st.subheader("View Customer Details")
         if st.session_state.selected_customer_id_for_detail_view:
             cust_id = st.session_state.selected_customer_id_for_detail_view
-            customer_data_row = db.get_customer_by_id(cust_id) 
+            detail_grids = {"Orders": f"cust_{cust_id}_orders", "Invoices": f"cust_{cust_id}_invoices", "Projects": f"cust_{cust_id}_projects"}
+            customer_360 = db.get_customer_360(
+                cust_id, limit=CUSTOMER_DETAIL_PAGE_SIZE,
+                orders_after=pager_cursor(detail_grids["Orders"], CUSTOMER_DETAIL_PAGE_SIZE),
+                invoices_after=pager_cursor(detail_grids["Invoices"], CUSTOMER_DETAIL_PAGE_SIZE),
+                projects_after=pager_cursor(detail_grids["Projects"], CUSTOMER_DETAIL_PAGE_SIZE))
 
-            if customer_data_row:
-                customer_data = dict(customer_data_row)
+            if customer_360:
+                customer_data = dict(customer_360["Profile"])
+                customer_totals = customer_360["Totals"]
 
                 if customer_data:
                     st.markdown(f"### Profile: {customer_data.get('CustomerName', 'N/A')}")
@@ -310,55 +464,40 @@ elif choice == "Customer Management":
                         st.text_area("Shipping Address", customer_data.get('ShippingAddress', 'N/A'), disabled=True, height=100, key=f"detail_ship_{cust_id}")
                     st.text_area("Notes", customer_data.get('Notes', 'N/A'), disabled=True, height=100, key=f"detail_notes_{cust_id}")
 
+                    kpi_col1, kpi_col2, kpi_col3, kpi_col4 = st.columns(4)
+                    kpi_col1.metric("Lifetime Orders", f"{customer_totals['OrderCount']:,}")
+                    kpi_col2.metric("Lifetime Order Value", f"Rs. {customer_totals['OrderTotal']:,.2f}")
+                    kpi_col3.metric("Outstanding Invoices", f"Rs. {customer_totals['OutstandingInvoiceTotal']:,.2f}")
+                    kpi_col4.metric("Last Order", customer_totals['LastOrderDate'] or "N/A")
+
                     st.markdown("---")
                     st.markdown("### Order History")
-                    customer_orders_rows = db.get_orders_by_customer_id(cust_id)
-                    customer_orders = db.rows_to_dicts(customer_orders_rows) if customer_orders_rows else []
+                    customer_orders = db.rows_to_dicts(customer_360["Orders"])
                     if customer_orders:
                         orders_df = pd.DataFrame(customer_orders)
-                        orders_df['TotalAmount_Display'] = orders_df['TotalAmount'].apply(lambda x: f"Rs. {x:,.2f}" if pd.notnull(x) else "Rs. 0.00")
-                        cols_orders = ['OrderID', 'OrderDate', 'ProjectName', 'ReferenceID', 'OrderStatus', 'TotalAmount_Display', 'PaymentStatus']
-                        cols_orders_filtered = [col for col in cols_orders if col in orders_df.columns]
-                        st.dataframe(orders_df[cols_orders_filtered], use_container_width=True, hide_index=True)
+                        show_grid(orders_df, ['OrderID', 'OrderDate', 'ProjectName', 'ReferenceID', 'OrderStatus', 'TotalAmount', 'PaymentStatus'])
+                        pager_controls(detail_grids["Orders"], customer_360["Orders"], customer_totals['OrderCount'], "OrderID", CUSTOMER_DETAIL_PAGE_SIZE)
                     else:
                         st.info("No orders found for this customer.")
 
                     st.markdown("---")
                     st.markdown("### Invoice History")
-                    customer_invoices_rows = db.get_invoices_by_customer_id(cust_id)
-                    customer_invoices = db.rows_to_dicts(customer_invoices_rows) if customer_invoices_rows else []
-                    total_invoiced_amount = 0
+                    customer_invoices = db.rows_to_dicts(customer_360["Invoices"])
                     if customer_invoices:
                         invoices_df = pd.DataFrame(customer_invoices)
-                        invoices_df['TotalAmount_Display'] = invoices_df['TotalAmount'].apply(lambda x: f"Rs. {x:,.2f}" if pd.notnull(x) else "Rs. 0.00")
-                        invoices_df['IssueDate_Display'] = pd.to_datetime(invoices_df['IssueDate'], errors='coerce').dt.strftime('%Y-%m-%d').fillna('N/A')
-                        
-                        if 'PaymentDate' in invoices_df.columns:
-                            invoices_df['PaymentDate_Display'] = pd.to_datetime(invoices_df['PaymentDate'], errors='coerce').dt.strftime('%Y-%m-%d').fillna('N/A')
-                        else:
-                            invoices_df['PaymentDate_Display'] = 'N/A'
-                        
-                        cols_invoices = ['InvoiceReferenceID', 'ProjectName', 'TotalAmount_Display', 'Status', 'IssueDate_Display', 'PaymentDate_Display']
-                        cols_invoices_filtered = [col for col in cols_invoices if col in invoices_df.columns]
-                        st.dataframe(invoices_df[cols_invoices_filtered], use_container_width=True, hide_index=True)
-                        
-                        if 'TotalAmount' in invoices_df.columns and 'Status' in invoices_df.columns:
-                            paid_invoices_sum = invoices_df.loc[invoices_df['Status'] == 'Paid', 'TotalAmount'].sum()
-                            total_invoiced_amount = paid_invoices_sum if pd.notnull(paid_invoices_sum) else 0.0
-                        st.metric("Total Amount from Paid Invoices for this Customer", f"Rs. {total_invoiced_amount:,.2f}")
+                        show_grid(invoices_df, ['InvoiceReferenceID', 'ProjectName', 'TotalAmount', 'Status', 'IssueDate', 'PaymentDate'])
+                        pager_controls(detail_grids["Invoices"], customer_360["Invoices"], customer_totals['InvoiceCount'], "InvoiceID", CUSTOMER_DETAIL_PAGE_SIZE)
+                        st.metric("Total Amount from Paid Invoices for this Customer", f"Rs. {customer_totals['PaidInvoiceTotal']:,.2f}")
                     else:
                         st.info("No invoices found for this customer.")
 
                     st.markdown("---")
                     st.markdown("### Associated Projects")
-                    customer_projects_rows = db.get_projects_by_customer_id(cust_id)
-                    customer_projects = db.rows_to_dicts(customer_projects_rows) if customer_projects_rows else []
+                    customer_projects = db.rows_to_dicts(customer_360["Projects"])
                     if customer_projects:
                         projects_df = pd.DataFrame(customer_projects)
-                        projects_df['Budget_Display'] = projects_df['Budget'].apply(lambda x: f"Rs. {x:,.2f}" if pd.notnull(x) else "Rs. 0.00")
-                        cols_projects = ['ProjectID', 'ProjectName', 'Status', 'StartDate', 'EndDate', 'Budget_Display']
-                        cols_projects_filtered = [col for col in cols_projects if col in projects_df.columns]
-                        st.dataframe(projects_df[cols_projects_filtered], use_container_width=True, hide_index=True)
+                        show_grid(projects_df, ['ProjectID', 'ProjectName', 'Status', 'StartDate', 'EndDate', 'Budget'])
+                        pager_controls(detail_grids["Projects"], customer_360["Projects"], customer_totals['ProjectCount'], "ProjectID", CUSTOMER_DETAIL_PAGE_SIZE)
                     else:
                         st.info("No projects associated with this customer.")
                 else:
@@ -384,9 +523,13 @@ elif choice == "Supplier Management":
     if action_sup == "View All":
         st.subheader("Existing Suppliers")
         search_term_sup = st.text_input("Search Suppliers (Name, Contact, Email)", key="search_sup_view")
-        suppliers_list_rows = db.get_all_suppliers(search_term=search_term_sup)
-        if suppliers_list_rows:
-            st.dataframe(db.rows_to_dicts(suppliers_list_rows), use_container_width=True, hide_index=True)
+        df_suppliers = paginated_rows(
+            "supplier_grid",
+            lambda limit, after: db.fetch_frame("suppliers", search_term=search_term_sup, limit=limit, after=after),
+            db.count_suppliers(search_term=search_term_sup), "SupplierID", filter_signature=search_term_sup)
+        if not df_suppliers.empty:
+            export_controls("supplier_grid", "suppliers", query_name="suppliers", search_term=search_term_sup)
+            st.dataframe(df_suppliers.drop(columns=['SearchRank'], errors='ignore'), use_container_width=True, hide_index=True)
         else:
             st.info("No suppliers found.")
 
@@ -409,7 +552,7 @@ elif choice == "Supplier Management":
 
     elif action_sup == "Edit Supplier":
         st.subheader("Edit Supplier")
-        suppliers_list_edit_rows = db.get_all_suppliers()
+        suppliers_list_edit_rows = db.get_reference_list("Suppliers")
         if not suppliers_list_edit_rows:
             st.info("No suppliers to edit.")
         else:
@@ -443,7 +586,7 @@ elif choice == "Supplier Management":
 
     elif action_sup == "Delete Supplier":
         st.subheader("Delete Supplier")
-        suppliers_list_del_rows = db.get_all_suppliers()
+        suppliers_list_del_rows = db.get_reference_list("Suppliers")
         if not suppliers_list_del_rows: st.info("No suppliers to delete.")
         else:
             suppliers_list_del = db.rows_to_dicts(suppliers_list_del_rows)
@@ -465,12 +608,12 @@ elif choice == "Supplier Services":
     st.header("🛠️ Supplier Services Management")
     action_ss = st.selectbox("Action", ["View All Services", "Add New Service", "Edit Service", "Delete Service"], key="ss_action")
 
-    all_suppliers_ss_rows = db.get_all_suppliers()
+    all_suppliers_ss_rows = db.get_reference_list("Suppliers")
     all_suppliers_ss = db.rows_to_dicts(all_suppliers_ss_rows) if all_suppliers_ss_rows else []
     supplier_map_ss = {"Select Supplier*": None}
     supplier_map_ss.update({f"{s['SupplierName']} (ID: {s['SupplierID']})": s['SupplierID'] for s in all_suppliers_ss})
 
-    all_projects_ss_rows = db.get_all_projects()
+    all_projects_ss_rows = db.get_reference_list("Projects")
     all_projects_ss = db.rows_to_dicts(all_projects_ss_rows) if all_projects_ss_rows else []
     project_map_ss = {"None (General Service)": None}
     project_map_ss.update({f"{p['ProjectName']} (ID: {p['ProjectID']})": p['ProjectID'] for p in all_projects_ss})
@@ -480,35 +623,41 @@ elif choice == "Supplier Services":
     if action_ss == "View All Services":
         st.subheader("Recorded Supplier Services")
         search_term_ss = st.text_input("Search Services (Name, Type, Supplier, Project, Desc.)", key="search_ss_view")
-        services_list_rows = db.get_all_supplier_services(search_term=search_term_ss)
-        services_list = db.rows_to_dicts(services_list_rows) if services_list_rows else []
-        if services_list:
-            df_services = pd.DataFrame(services_list)
-            if 'Cost' in df_services.columns:
-                 df_services['Cost_Display'] = df_services['Cost'].apply(lambda x: f"Rs. {x:,.2f}")
-
-            cols_to_show = ['ServiceID', 'ServiceName', 'ServiceType', 'SupplierName', 'ProjectName',
-                            'ServiceDate', 'Cost_Display', 'Description', 'IsExpenseLogged']
-            cols_to_show_filtered = [col for col in cols_to_show if col in df_services.columns]
-            st.dataframe(df_services[cols_to_show_filtered], use_container_width=True, hide_index=True)
-
-            for service_row_dict in services_list: 
-                if service_row_dict.get('ReceiptPath') and os.path.exists(service_row_dict['ReceiptPath']):
-                    with st.expander(f"View Receipt for Service ID: {service_row_dict['ServiceID']}"):
-                        try:
-                            if service_row_dict['ReceiptPath'].lower().endswith(('.png', '.jpg', '.jpeg')):
-                                receipt_image = Image.open(service_row_dict['ReceiptPath'])
-                                st.image(receipt_image, caption=f"Receipt for {service_row_dict['ServiceName']}", width=300)
-                            else:
-                                with open(service_row_dict['ReceiptPath'], "rb") as fp:
-                                    st.download_button(
-                                        label=f"Download Receipt ({os.path.basename(service_row_dict['ReceiptPath'])})",
-                                        data=fp,
-                                        file_name=os.path.basename(service_row_dict['ReceiptPath']),
-                                        mime="application/octet-stream"
-                                    )
-                        except Exception as e:
-                            st.warning(f"Could not load/display receipt: {e}")
+        df_services = paginated_rows(
+            "service_grid",
+            lambda limit, after: db.fetch_frame("supplier_services", columns=['ServiceName', 'ServiceType', 'SupplierName', 'ProjectName', 'ServiceDate', 'Cost', 'Description', 'IsExpenseLogged', 'ReceiptPath'],
+                                                search_term=search_term_ss, limit=limit, after=after),
+            db.count_supplier_services(search_term=search_term_ss), "ServiceID", filter_signature=search_term_ss)
+        if not df_services.empty:
+            export_controls("service_grid", "supplier_services", query_name="supplier_services", search_term=search_term_ss)
+            receipts_on_disk = existing_files(df_services['ReceiptPath'])
+            df_services['HasReceipt'] = df_services['ReceiptPath'].isin(receipts_on_disk)
+            show_grid(df_services, ['ServiceID', 'ServiceName', 'ServiceType', 'SupplierName', 'ProjectName',
+                                    'ServiceDate', 'Cost', 'Description', 'IsExpenseLogged', 'HasReceipt'],
+                      key="service_grid_table", on_select="rerun", selection_mode="single-row")
+
+            # Only the selected service's receipt is read from disk.
+            selected_service = selected_grid_row("service_grid_table", df_services)
+            if selected_service is None:
+                st.caption("Select a service to preview its receipt.")
+            elif selected_service.get('ReceiptPath') not in receipts_on_disk:
+                st.caption(f"No receipt on file for Service ID: {selected_service['ServiceID']}.")
+            else:
+                st.markdown(f"**Receipt for Service ID: {selected_service['ServiceID']}**")
+                try:
+                    receipt_thumb = thumbnail_path(selected_service['ReceiptPath'])
+                    if receipt_thumb:
+                        st.image(receipt_thumb, caption=f"Receipt for {selected_service['ServiceName']}", width=300)
+                    else:
+                        with open(selected_service['ReceiptPath'], "rb") as fp:
+                            st.download_button(
+                                label=f"Download Receipt ({os.path.basename(selected_service['ReceiptPath'])})",
+                                data=fp,
+                                file_name=os.path.basename(selected_service['ReceiptPath']),
+                                mime="application/octet-stream"
+                            )
+                except Exception as e:
+                    st.warning(f"Could not load/display receipt: {e}")
         else:
             st.info("No supplier services recorded yet.")
 
@@ -627,8 +776,9 @@ elif choice == "Supplier Services":
                         st.write("Current Receipt:")
                         current_receipt_path = service_data.get('ReceiptPath')
                         if current_receipt_path and os.path.exists(current_receipt_path):
-                            if current_receipt_path.lower().endswith(('.png','.jpg','.jpeg')):
-                                st.image(Image.open(current_receipt_path), width=150)
+                            current_receipt_thumb = thumbnail_path(current_receipt_path)
+                            if current_receipt_thumb:
+                                st.image(current_receipt_thumb, width=150)
                             else:
                                 st.download_button(label=f"Download Current Receipt", data=open(current_receipt_path, "rb").read(), file_name=os.path.basename(current_receipt_path), mime="application/octet-stream", key=f"dl_btn_{service_id_to_edit}" )
                         else: st.text("No receipt on file.")
@@ -685,7 +835,7 @@ elif choice == "Material Management":
     st.header("🧱 Material Management")
     action_mat = st.selectbox("Action", ["View All", "Add New", "Edit Material", "Delete Material"], key="mat_action")
     
-    suppliers_for_mat_rows = db.get_all_suppliers()
+    suppliers_for_mat_rows = db.get_reference_list("Suppliers")
     suppliers_for_mat = db.rows_to_dicts(suppliers_for_mat_rows) if suppliers_for_mat_rows else []
     supplier_map_mat = {"None (No Supplier)": None}
     supplier_map_mat.update({f"{s['SupplierName']} (ID: {s['SupplierID']})": s['SupplierID'] for s in suppliers_for_mat})
@@ -693,12 +843,15 @@ elif choice == "Material Management":
     if action_mat == "View All":
         st.subheader("Existing Materials")
         search_term_mat = st.text_input("Search Materials (Name, Category, Supplier)", key="search_mat_view") # Changed Type to Category
-        materials_list_rows = db.get_all_materials(search_term=search_term_mat) # Assumes get_all_materials can search by Category
-        if materials_list_rows: 
-            df_materials = pd.DataFrame(db.rows_to_dicts(materials_list_rows))
+        df_materials = paginated_rows(
+            "material_grid",
+            lambda limit, after: db.fetch_frame("materials", search_term=search_term_mat, limit=limit, after=after),
+            db.count_materials(search_term=search_term_mat), "MaterialID", filter_signature=search_term_mat)
+        if not df_materials.empty: 
+            export_controls("material_grid", "materials", query_name="materials", search_term=search_term_mat)
             # Ensure columns like SupplierName are present if expected from db function
-            cols_to_show_mat = [col for col in df_materials.columns if col != 'SupplierID'] # Example: hide raw ID if name shown
-            st.dataframe(df_materials[cols_to_show_mat], use_container_width=True, hide_index=True)
+            cols_to_show_mat = [col for col in df_materials.columns if col not in ('SupplierID', 'SearchRank')] # Example: hide raw ID if name shown
+            show_grid(df_materials, cols_to_show_mat)
         else: 
             st.info("No materials found.")
 
@@ -725,7 +878,7 @@ elif choice == "Material Management":
 
     elif action_mat == "Edit Material":
         st.subheader("Edit Material")
-        materials_list_edit_rows = db.get_all_materials()
+        materials_list_edit_rows = db.get_reference_list("Materials")
         if not materials_list_edit_rows: 
             st.info("No materials to edit.")
         else:
@@ -762,12 +915,17 @@ elif choice == "Material Management":
                                     st.success("Material updated!")
                                     st.rerun()
                                 except Exception as e: st.error(f"Error: {e}")
+                    with st.expander("Stock movement history"):
+                        mat_movements = db.get_stock_movements("Material", mat_id_to_edit)
+                        if mat_movements:
+                            show_grid(pd.DataFrame(db.rows_to_dicts(mat_movements)), ['MovementDate', 'QuantityChange', 'Reason', 'ReferenceType', 'ReferenceID', 'Notes'])
+                        else: st.caption("No stock movements recorded.")
                 else:
                     st.error(f"Could not load data for material ID {mat_id_to_edit}")
 
     elif action_mat == "Delete Material":
         st.subheader("Delete Material")
-        materials_list_del_rows = db.get_all_materials()
+        materials_list_del_rows = db.get_reference_list("Materials")
         if not materials_list_del_rows: 
             st.info("No materials to delete.")
         else:
@@ -791,7 +949,7 @@ elif choice == "Product Management":
     st.header("📦 Product Management (Inventory)")
     action_prod = st.selectbox("Action", ["View All", "Add New", "Edit Product", "Delete Product"], key="prod_action_key_main")
     
-    suppliers_for_prod_rows = db.get_all_suppliers()
+    suppliers_for_prod_rows = db.get_reference_list("Suppliers")
     suppliers_for_prod = db.rows_to_dicts(suppliers_for_prod_rows) if suppliers_for_prod_rows else []
     supplier_map_prod = {"None (No Supplier)": None}
     supplier_map_prod.update({f"{s['SupplierName']} (ID: {s['SupplierID']})": s['SupplierID'] for s in suppliers_for_prod})
@@ -799,10 +957,12 @@ elif choice == "Product Management":
     if action_prod == "View All":
         st.subheader("Existing Products")
         search_term_prod = st.text_input("Search Products (Name, SKU, Category, Supplier)", key="search_prod_view_main")
-        products_list_rows = db.get_all_products(search_term=search_term_prod) # Assumes get_all_products joins with suppliers for SupplierName
-        if products_list_rows:
-            products_list = db.rows_to_dicts(products_list_rows)
-            df_products = pd.DataFrame(products_list)
+        df_products = paginated_rows(
+            "product_grid",
+            lambda limit, after: db.fetch_frame("products", search_term=search_term_prod, limit=limit, after=after),
+            db.count_products(search_term=search_term_prod), "ProductID", filter_signature=search_term_prod)
+        if not df_products.empty:
+            export_controls("product_grid", "products", query_name="products", search_term=search_term_prod)
             
             final_cols_prod_view = []
             default_prod_cols = ['ProductID', 'ProductName', 'SKU', 'Category', 'SellingPrice', 'QuantityInStock', 'SupplierName', 'Description', 'MaterialType', 'Dimensions', 'CostPrice', 'ReorderLevel']
@@ -810,18 +970,25 @@ elif choice == "Product Management":
                 if col in df_products.columns:
                     final_cols_prod_view.append(col)
             for col in df_products.columns: # Add any other existing columns not explicitly listed or in ImagePath/SupplierID
-                if col not in final_cols_prod_view and col not in ['ImagePath', 'SupplierID']:
+                if col not in final_cols_prod_view and col not in ['ImagePath', 'SupplierID', 'SearchRank']:
                      final_cols_prod_view.append(col)
 
-            st.dataframe(df_products[final_cols_prod_view], use_container_width=True, hide_index=True)
-
-            for prod_row_dict_main in products_list: 
-                if prod_row_dict_main.get('ImagePath') and os.path.exists(prod_row_dict_main['ImagePath']):
-                    with st.expander(f"{prod_row_dict_main['ProductName']} - Image"):
-                        try: 
-                            st.image(Image.open(prod_row_dict_main['ImagePath']), caption=prod_row_dict_main['ProductName'], width=200)
-                        except Exception as e_img: 
-                            st.warning(f"Could not load image for {prod_row_dict_main['ProductName']}: {e_img}")
+            images_on_disk = existing_files(df_products['ImagePath'])
+            df_products['HasImage'] = df_products['ImagePath'].isin(images_on_disk)
+            final_cols_prod_view.append('HasImage')
+            show_grid(df_products, final_cols_prod_view, key="product_grid_table", on_select="rerun", selection_mode="single-row")
+
+            # Only the selected product's image is read from disk.
+            selected_product = selected_grid_row("product_grid_table", df_products)
+            if selected_product is None:
+                st.caption("Select a product to preview its image.")
+            elif selected_product.get('ImagePath') not in images_on_disk:
+                st.caption(f"No image on file for {selected_product['ProductName']}.")
+            else:
+                try: 
+                    st.image(thumbnail_path(selected_product['ImagePath']) or selected_product['ImagePath'], caption=selected_product['ProductName'], width=200)
+                except Exception as e_img: 
+                    st.warning(f"Could not load image for {selected_product['ProductName']}: {e_img}")
         else: 
             st.info("No products found.")
             
@@ -861,7 +1028,7 @@ elif choice == "Product Management":
 
     elif action_prod == "Edit Product":
         st.subheader("Edit Product")
-        products_list_edit_rows = db.get_all_products()
+        products_list_edit_rows = db.get_reference_list("Products")
         if not products_list_edit_rows: 
             st.info("No products to edit.")
         else:
@@ -899,7 +1066,7 @@ elif choice == "Product Management":
                         current_image_path_edit = prod_data_edit_main.get('ImagePath')
                         if current_image_path_edit and os.path.exists(current_image_path_edit):
                             try: 
-                                st.image(Image.open(current_image_path_edit), width=150)
+                                st.image(thumbnail_path(current_image_path_edit) or current_image_path_edit, width=150)
                             except Exception: 
                                 st.text("Could not load current image.")
                         else: 
@@ -928,12 +1095,17 @@ elif choice == "Product Management":
                                     st.rerun()
                                 except Exception as e_upd_prod: 
                                     st.error(f"Error updating: {e_upd_prod}")
+                    with st.expander("Stock movement history"):
+                        prod_movements = db.get_stock_movements("Product", prod_id_to_edit_main)
+                        if prod_movements:
+                            show_grid(pd.DataFrame(db.rows_to_dicts(prod_movements)), ['MovementDate', 'QuantityChange', 'Reason', 'ReferenceType', 'ReferenceID', 'Notes'])
+                        else: st.caption("No stock movements recorded.")
                 else:
                     st.error(f"Could not load data for product ID {prod_id_to_edit_main}")
 
     elif action_prod == "Delete Product":
         st.subheader("Delete Product")
-        products_list_del_rows = db.get_all_products()
+        products_list_del_rows = db.get_reference_list("Products")
         if not products_list_del_rows: 
             st.info("No products to delete.")
         else:
@@ -956,7 +1128,7 @@ elif choice == "Project Management":
     st.header("🛠️ Project Management")
     action_proj = st.selectbox("Action", ["View All", "Add New", "Edit Project", "Delete Project"], key="proj_action_main_key")
     
-    customers_for_proj_rows = db.get_all_customers()
+    customers_for_proj_rows = db.get_reference_list("Customers")
     customers_for_proj = db.rows_to_dicts(customers_for_proj_rows) if customers_for_proj_rows else []
     customer_map_proj = {"Select Customer*": None} 
     customer_map_proj.update({f"{c['CustomerName']} (ID: {c['CustomerID']})": c['CustomerID'] for c in customers_for_proj})
@@ -966,16 +1138,14 @@ elif choice == "Project Management":
     if action_proj == "View All":
         st.subheader("Existing Projects")
         search_term_proj = st.text_input("Search Projects (Name, Customer, Status)", key="search_proj_view_main_key")
-        projects_list_rows = db.get_all_projects(search_term=search_term_proj) 
-        if projects_list_rows:
-            projects_list = db.rows_to_dicts(projects_list_rows)
-            df_projects = pd.DataFrame(projects_list)
-            if 'Budget' in df_projects.columns:
-                df_projects['Budget_Display'] = df_projects['Budget'].apply(lambda x: f"Rs. {x:,.2f}" if pd.notnull(x) else "N/A")
-            
-            cols_to_show = ['ProjectID', 'ProjectName', 'CustomerName', 'StartDate', 'EndDate', 'Status', 'Budget_Display', 'Description']
-            cols_filtered = [col for col in cols_to_show if col in df_projects.columns]
-            st.dataframe(df_projects[cols_filtered], use_container_width=True, hide_index=True)
+        df_projects = paginated_rows(
+            "project_grid",
+            lambda limit, after: db.fetch_frame("projects", columns=['ProjectName', 'CustomerName', 'StartDate', 'EndDate', 'Status', 'Budget', 'Description'],
+                                                search_term=search_term_proj, limit=limit, after=after),
+            db.count_projects(search_term=search_term_proj), "ProjectID", filter_signature=search_term_proj)
+        if not df_projects.empty:
+            export_controls("project_grid", "projects", query_name="projects", search_term=search_term_proj)
+            show_grid(df_projects, ['ProjectID', 'ProjectName', 'CustomerName', 'StartDate', 'EndDate', 'Status', 'Budget', 'Description'])
         else:
             st.info("No projects found.")
 
@@ -1010,7 +1180,7 @@ elif choice == "Project Management":
 
     elif action_proj == "Edit Project":
         st.subheader("Edit Project")
-        projects_list_edit_rows = db.get_all_projects()
+        projects_list_edit_rows = db.get_reference_list("Projects")
         if not projects_list_edit_rows: 
             st.info("No projects to edit.")
         else:
@@ -1107,7 +1277,7 @@ elif choice == "Project Management":
                             if sel_cat_proj_mat and sel_cat_proj_mat != "All":
                                 materials_options_rows = db.get_materials_by_category(sel_cat_proj_mat)
                             else:
-                                materials_options_rows = db.get_all_materials()
+                                materials_options_rows = db.get_reference_list("Materials")
                             
                             available_materials = db.rows_to_dicts(materials_options_rows) if materials_options_rows else []
                             
@@ -1134,8 +1304,7 @@ elif choice == "Project Management":
                                             st.warning(f"Needed quantity ({qty_needed_proj_add}) for {mat_details['MaterialName']} exceeds stock ({current_stock}). Proceeding will result in negative theoretical stock.")
                                         
                                         try:
-                                            db.add_material_to_project(proj_id_to_edit_main_page, mat_id_to_add_proj_val, qty_needed_proj_add, cost_at_time, notes_proj_mat_add)
-                                            db.update_material_stock(mat_id_to_add_proj_val, -qty_needed_proj_add) # Deduct stock
+                                            db.add_material_to_project(proj_id_to_edit_main_page, mat_id_to_add_proj_val, qty_needed_proj_add, cost_at_time, notes_proj_mat_add, deduct_stock=True)
                                             st.success(f"Added {qty_needed_proj_add} of {mat_details['MaterialName']} to project. Stock updated.")
                                             st.rerun()
                                         except Exception as e: st.error(f"Error: {e}")
@@ -1148,7 +1317,7 @@ elif choice == "Project Management":
                     project_services_rows = db.get_services_for_project(proj_id_to_edit_main_page)
                     project_services_list = db.rows_to_dicts(project_services_rows) if project_services_rows else []
                     if project_services_list:
-                        st.dataframe(project_services_list, use_container_width=True, hide_index=True)
+                        show_grid(pd.DataFrame(project_services_list))
                     else:
                         st.info("No supplier services currently linked to this project.")
                     # TODO: Add UI to link existing or new supplier service to this project.
@@ -1159,7 +1328,7 @@ elif choice == "Project Management":
     elif action_proj == "Delete Project":
         # ... (Delete Project code as before) ...
         st.subheader("Delete Project")
-        projects_list_del_rows = db.get_all_projects()
+        projects_list_del_rows = db.get_reference_list("Projects")
         if not projects_list_del_rows: 
             st.info("No projects to delete.")
         else:
@@ -1185,25 +1354,22 @@ elif choice == "Sales Book (Orders)":
     
     if action_order_main == "View All Orders":
         st.subheader("Existing Orders")
-        all_db_orders_rows = db.get_all_orders()
-        if all_db_orders_rows:
-            all_db_orders_main = db.rows_to_dicts(all_db_orders_rows)
-            df_orders = pd.DataFrame(all_db_orders_main)
-            if 'TotalAmount' in df_orders.columns:
-                df_orders['TotalAmount_Display'] = df_orders['TotalAmount'].apply(lambda x: f"Rs. {x:,.2f}" if pd.notnull(x) else "N/A")
-            
-            cols_to_show = ['OrderID', 'OrderDate', 'CustomerName', 'ProjectName', 'ReferenceID', 'OrderStatus', 'TotalAmount_Display', 'PaymentStatus']
-            cols_filtered = [col for col in cols_to_show if col in df_orders.columns]
-            st.dataframe(df_orders[cols_filtered], use_container_width=True, hide_index=True)
-
-            order_ids_for_view_main = [o['OrderID'] for o in all_db_orders_main] 
+        df_orders = paginated_rows(
+            "order_grid",
+            lambda limit, after: db.fetch_frame("orders", columns=['OrderDate', 'CustomerName', 'ProjectName', 'ReferenceID', 'OrderStatus', 'TotalAmount', 'PaymentStatus'], limit=limit, after=after),
+            db.count_orders(), "OrderID")
+        if not df_orders.empty:
+            export_controls("order_grid", "orders", query_name="orders")
+            show_grid(df_orders, ['OrderID', 'OrderDate', 'CustomerName', 'ProjectName', 'ReferenceID', 'OrderStatus', 'TotalAmount', 'PaymentStatus'])
+
+            order_ids_for_view_main = df_orders['OrderID'].tolist()
             if order_ids_for_view_main:
                 selected_order_id_view_main = st.selectbox("Select Order ID to view items", order_ids_for_view_main, key="view_order_items_select_db_main_key", index=None, placeholder="Choose an order...")
                 if selected_order_id_view_main:
                     items_for_order_rows = db.get_order_items_by_order_id(selected_order_id_view_main)
                     if items_for_order_rows:
                         st.write(f"Items for Order ID: {selected_order_id_view_main}")
-                        st.dataframe(db.rows_to_dicts(items_for_order_rows), use_container_width=True, hide_index=True)
+                        show_grid(pd.DataFrame(db.rows_to_dicts(items_for_order_rows)))
                     else: 
                         st.info("No items found for this order.")
         else: 
@@ -1212,12 +1378,12 @@ elif choice == "Sales Book (Orders)":
     elif action_order_main == "Create New Order":
         # ... (Create Order Form as before, ensuring product stock check is robust) ...
         st.subheader("Create New Order")
-        customers_for_order_rows = db.get_all_customers()
+        customers_for_order_rows = db.get_reference_list("Customers")
         customers_for_order_main = db.rows_to_dicts(customers_for_order_rows) if customers_for_order_rows else []
         customer_map_order_main = {"Select Customer*": None}
         customer_map_order_main.update({f"{c['CustomerName']} (ID: {c['CustomerID']})": c['CustomerID'] for c in customers_for_order_main})
         
-        projects_for_order_rows = db.get_all_projects()
+        projects_for_order_rows = db.get_reference_list("Projects")
         projects_for_order_main = db.rows_to_dicts(projects_for_order_rows) if projects_for_order_rows else []
         project_map_order_main = {"None (No Project)": None}
         project_map_order_main.update({f"{p.get('ProjectName','Unnamed Project')} (ID: {p['ProjectID']})": p['ProjectID'] for p in projects_for_order_main})
@@ -1225,7 +1391,8 @@ elif choice == "Sales Book (Orders)":
         order_status_options_main = ["Pending", "Confirmed", "Processing", "Shipped", "Delivered", "Cancelled"]
         payment_status_options_main = ["Unpaid", "Partially Paid", "Paid", "Refunded"]
         
-        with st.form("add_order_form_db_main_key", clear_on_submit=False): # clear_on_submit=False to keep item list
+        # Not an st.form: the "➕ Add" item button has to rerun the page, which st.button cannot do inside a form.
+        with st.container():
             o_order_date_main = st.date_input("Order Date", datetime.now().date())
             selected_cust_name_order_main = st.selectbox("Customer*", list(customer_map_order_main.keys()), key="order_cust_db_select_main_key", index=0)
             o_customer_id_main = customer_map_order_main.get(selected_cust_name_order_main)
@@ -1251,7 +1418,7 @@ elif choice == "Sales Book (Orders)":
             st.markdown("---"); st.subheader("Order Items")
             # st.session_state.current_order_items_main initialized globally
             
-            products_for_items_rows = db.get_all_products()
+            products_for_items_rows = db.get_reference_list("Products")
             products_for_items_order_main = db.rows_to_dicts(products_for_items_rows) if products_for_items_rows else []
             product_map_order_items_main = {"Select Product*": None}
             product_map_order_items_main.update({f"{p['ProductName']} (ID: {p['ProductID']}, Price: Rs. {p.get('SellingPrice', 0.0):.2f}, Stock: {p.get('QuantityInStock',0)})": p['ProductID'] for p in products_for_items_order_main})
@@ -1298,14 +1465,11 @@ elif choice == "Sales Book (Orders)":
                 temp_items_df_main = pd.DataFrame(st.session_state.current_order_items_main)
                 # Add remove button for items in session state
                 # For now, just display:
-                temp_items_df_main['UnitPriceAtSale_Display'] = temp_items_df_main['UnitPriceAtSale'].apply(lambda x: f"Rs. {x:,.2f}")
-                temp_items_df_main['Discount_Display'] = temp_items_df_main['Discount'].apply(lambda x: f"Rs. {x:,.2f}")
-                temp_items_df_main['LineTotal_Display'] = temp_items_df_main['LineTotal'].apply(lambda x: f"Rs. {x:,.2f}")
-                st.dataframe(temp_items_df_main[['ProductName', 'QuantitySold', 'UnitPriceAtSale_Display', 'Discount_Display', 'LineTotal_Display']], use_container_width=True, hide_index=True)
+                show_grid(temp_items_df_main, ['ProductName', 'QuantitySold', 'UnitPriceAtSale', 'Discount', 'LineTotal'])
                 current_total_amount_numeric_main = sum(item['LineTotal'] for item in st.session_state.current_order_items_main)
                 st.metric("Calculated Order Total", f"Rs. {current_total_amount_numeric_main:,.2f}")
             
-            submitted_order_db_main = st.form_submit_button("💾 Create Order")
+            submitted_order_db_main = st.button("💾 Create Order", key="order_create_button_key_main")
             if submitted_order_db_main:
                 if not o_customer_id_main: 
                     st.error("Customer is required.")
@@ -1314,18 +1478,23 @@ elif choice == "Sales Book (Orders)":
                 else:
                     final_shipping_address_main_val = st.session_state.get("order_ship_addr_main_input_key_create", initial_shipping_address_main) # Get value from widget state
                     try:
-                        new_order_id_main = db.add_order(
-                            o_order_date_main.strftime("%Y-%m-%d"), o_customer_id_main, o_project_id_main,
-                            o_order_status_main, 0.0, o_payment_status_main, # TotalAmount will be updated
-                            final_shipping_address_main_val, o_notes_main, o_reference_id_main
+                        # Header, lines, stock decrements and total are written in one transaction.
+                        new_order_id_main = db.create_order_with_items(
+                            {
+                                'OrderDate': o_order_date_main.strftime("%Y-%m-%d"), 'CustomerID': o_customer_id_main,
+                                'ProjectID': o_project_id_main, 'OrderStatus': o_order_status_main,
+                                'PaymentStatus': o_payment_status_main, 'ShippingAddress': final_shipping_address_main_val,
+                                'Notes': o_notes_main, 'ReferenceID': o_reference_id_main,
+                            },
+                            st.session_state.current_order_items_main,
                         )
-                        for item_data_main in st.session_state.current_order_items_main:
-                            db.add_order_item(new_order_id_main, item_data_main['ProductID'], item_data_main['QuantitySold'], item_data_main['UnitPriceAtSale'], item_data_main['Discount'])
-                            db.update_product_stock(item_data_main['ProductID'], -item_data_main['QuantitySold']) 
-                        db.update_order_total(new_order_id_main) 
                         st.success(f"Order (ID: {new_order_id_main}) created successfully!")
                         st.session_state.current_order_items_main = [] 
                         st.rerun()
+                    except db.StockShortageError as e_stock:
+                        st.error("Order not created: not enough stock. No items were saved and stock is unchanged.")
+                        for shortage in e_stock.shortages:
+                            st.warning(f"Line {shortage['Line'] + 1}: {shortage['ProductName']} needs {shortage['Requested']} in total, only {shortage['Available']} in stock.")
                     except Exception as e_ord_add: 
                         st.error(f"Error creating order: {e_ord_add}")
 
@@ -1346,12 +1515,12 @@ elif choice == "Sales Book (Orders)":
                 order_data = dict(order_data_row) if order_data_row else None
 
                 if order_data:
-                    customers_for_order_edit_rows = db.get_all_customers()
+                    customers_for_order_edit_rows = db.get_reference_list("Customers")
                     customers_for_order_edit = db.rows_to_dicts(customers_for_order_edit_rows) if customers_for_order_edit_rows else []
                     customer_map_order_edit = {"Select Customer*": None}
                     customer_map_order_edit.update({f"{c['CustomerName']} (ID: {c['CustomerID']})": c['CustomerID'] for c in customers_for_order_edit})
                     
-                    projects_for_order_edit_rows = db.get_all_projects()
+                    projects_for_order_edit_rows = db.get_reference_list("Projects")
                     projects_for_order_edit = db.rows_to_dicts(projects_for_order_edit_rows) if projects_for_order_edit_rows else []
                     project_map_order_edit = {"None (No Project)": None}
                     project_map_order_edit.update({f"{p.get('ProjectName','Unnamed Project')} (ID: {p['ProjectID']})": p['ProjectID'] for p in projects_for_order_edit})
@@ -1403,7 +1572,6 @@ elif choice == "Sales Book (Orders)":
                                         o_project_id_edit, o_order_status_edit, o_payment_status_edit,
                                         o_shipping_address_edit, o_notes_edit, o_reference_id_edit
                                     )
-                                    # Note: db.update_order_total(order_id_to_edit) might be needed if anything affecting total changed.
                                     st.success(f"Order (ID: {order_id_to_edit}) basic info updated!")
                                     st.rerun()
                                 except Exception as e_ord_edit:
@@ -1417,7 +1585,7 @@ elif choice == "Invoice Tracking":
     action_inv = st.selectbox("Action", ["View All Invoices", "Create New Invoice", "Edit Invoice"], key="inv_action")
     invoice_status_options = ["Draft", "Sent", "Paid", "Overdue", "Cancelled"]
     
-    all_projects_inv_rows = db.get_all_projects() 
+    all_projects_inv_rows = db.get_reference_list("Projects") 
     all_projects_inv = db.rows_to_dicts(all_projects_inv_rows) if all_projects_inv_rows else []
     project_map_inv = {"Select Project*": None}
     project_map_inv.update({f"{p.get('ProjectName','Unnamed Project')} (ID: {p['ProjectID']}, Cust: {p.get('CustomerName', 'N/A')})": p['ProjectID'] for p in all_projects_inv})
@@ -1426,22 +1594,14 @@ elif choice == "Invoice Tracking":
         # ... (View Invoices code, using hide_index=True for dataframes) ...
         st.subheader("All Invoices")
         search_term_inv = st.text_input("Search Invoices (Ref ID, Project, Customer)", key="search_inv_view")
-        invoices_list_rows = db.get_all_invoices(search_term=search_term_inv) 
-        if invoices_list_rows:
-            invoices_list = db.rows_to_dicts(invoices_list_rows)
-            df_invoices = pd.DataFrame(invoices_list)
-            df_invoices['TotalAmount_Display'] = df_invoices['TotalAmount'].apply(lambda x: f"Rs. {x:,.2f}" if pd.notnull(x) else "N/A")
-            df_invoices['IssueDate_Display'] = pd.to_datetime(df_invoices['IssueDate'], errors='coerce').dt.strftime('%Y-%m-%d').fillna('N/A')
-            df_invoices['DueDate_Display'] = pd.to_datetime(df_invoices['DueDate'], errors='coerce').dt.strftime('%Y-%m-%d').fillna('N/A')
-            
-            if 'PaymentDate' in df_invoices.columns:
-                df_invoices['PaymentDate_Display'] = pd.to_datetime(df_invoices['PaymentDate'], errors='coerce').dt.strftime('%Y-%m-%d').fillna('N/A')
-            else:
-                df_invoices['PaymentDate_Display'] = 'N/A'
-
-            cols_to_show = ['InvoiceID', 'InvoiceReferenceID', 'ProjectName', 'CustomerName', 'TotalAmount_Display', 'Status', 'IssueDate_Display', 'DueDate_Display', 'PaymentDate_Display', 'Notes']
-            cols_filtered = [col for col in cols_to_show if col in df_invoices.columns]
-            st.dataframe(df_invoices[cols_filtered], use_container_width=True, hide_index=True)
+        df_invoices = paginated_rows(
+            "invoice_grid",
+            lambda limit, after: db.fetch_frame("invoices", columns=['InvoiceReferenceID', 'ProjectName', 'CustomerName', 'TotalAmount', 'Status', 'IssueDate', 'DueDate', 'PaymentDate', 'Notes'],
+                                                search_term=search_term_inv, limit=limit, after=after),
+            db.count_invoices(search_term=search_term_inv), "InvoiceID", filter_signature=search_term_inv)
+        if not df_invoices.empty:
+            export_controls("invoice_grid", "invoices", query_name="invoices", search_term=search_term_inv)
+            show_grid(df_invoices, ['InvoiceID', 'InvoiceReferenceID', 'ProjectName', 'CustomerName', 'TotalAmount', 'Status', 'IssueDate', 'DueDate', 'PaymentDate', 'Notes'])
         else:
             st.info("No invoices found.")
 
@@ -1570,7 +1730,7 @@ elif choice == "Invoice Tracking":
 elif choice == "Expense Tracking":
     # ... (Expense Tracking code as before) ...
     st.header("💸 Expense Tracking")
-    projects_for_exp_rows = db.get_all_projects()
+    projects_for_exp_rows = db.get_reference_list("Projects")
     projects_for_exp_main = db.rows_to_dicts(projects_for_exp_rows) if projects_for_exp_rows else []
     project_map_exp_main_scope = {"None (No Project)": None}
     project_map_exp_main_scope.update({f"{p.get('ProjectName','Unnamed Project')} (ID: {p['ProjectID']})": p['ProjectID'] for p in projects_for_exp_main})
@@ -1578,16 +1738,13 @@ elif choice == "Expense Tracking":
     action_exp_main_page = st.selectbox("Action", ["View All", "Add New (Manual)"], key="exp_action_main_page_key")
     if action_exp_main_page == "View All":
         st.subheader("Recorded Expenses")
-        all_db_expenses_rows = db.get_all_expenses() 
-        if all_db_expenses_rows:
-            all_db_expenses_main_page = db.rows_to_dicts(all_db_expenses_rows)
-            df_expenses_main_page = pd.DataFrame(all_db_expenses_main_page)
-            if 'Amount' in df_expenses_main_page.columns: 
-                df_expenses_main_page['Amount_Display'] = df_expenses_main_page['Amount'].apply(lambda x: f"Rs. {x:,.2f}" if pd.notnull(x) else "N/A")
-            
-            cols_exp_disp_main = ['ExpenseID', 'ExpenseDate', 'Description', 'Category', 'Amount_Display', 'Vendor', 'ProjectName', 'ReceiptReference', 'SupplierServiceName'] 
-            cols_exp_disp_filt_main = [col for col in cols_exp_disp_main if col in df_expenses_main_page.columns]
-            st.dataframe(df_expenses_main_page[cols_exp_disp_filt_main], use_container_width=True, hide_index=True)
+        df_expenses_main_page = paginated_rows(
+            "expense_grid",
+            lambda limit, after: db.fetch_frame("expenses", columns=['ExpenseDate', 'Description', 'Category', 'Amount', 'Vendor', 'ProjectName', 'ReceiptReference', 'SupplierServiceName'], limit=limit, after=after),
+            db.count_expenses(), "ExpenseID")
+        if not df_expenses_main_page.empty:
+            export_controls("expense_grid", "expenses", query_name="expenses")
+            show_grid(df_expenses_main_page, ['ExpenseID', 'ExpenseDate', 'Description', 'Category', 'Amount', 'Vendor', 'ProjectName', 'ReceiptReference', 'SupplierServiceName'])
         else: 
             st.info("No expenses recorded yet.")
     elif action_exp_main_page == "Add New (Manual)":
@@ -1613,24 +1770,56 @@ elif choice == "Expense Tracking":
                     except Exception as e_exp_add: 
                         st.error(f"Error adding manual expense: {e_exp_add}")
 
+elif choice == "Bulk Import":
+    st.header("📥 Bulk Import")
+    import_entity_label = st.selectbox("Import", list(IMPORT_ENTITIES), key="bulk_import_entity")
+    import_entity = IMPORT_ENTITIES[import_entity_label]
+    import_columns = db.get_import_columns(import_entity)
+    st.caption(f"Columns: {', '.join(import_columns)}. Suppliers and projects are matched by name; dates are YYYY-MM-DD.")
+    st.download_button("Download CSV Template", data=",".join(import_columns) + "\n",
+                       file_name=f"{import_entity}_template.csv", mime="text/csv", key="bulk_import_template")
+    import_file = st.file_uploader("CSV or Excel file", type=["csv", "xlsx"], key=f"bulk_import_file_{import_entity}")
+    if import_file and st.button(f"Import {import_entity_label}", key="bulk_import_run"):
+        import_progress = st.empty()
+        try:
+            import_result = db.import_records(
+                import_entity, read_import_chunks(import_file),
+                on_chunk=lambda inserted, rejected: import_progress.caption(f"Imported {inserted:,} rows, rejected {rejected:,} so far..."))
+        except Exception as e_import:
+            st.error(f"Import stopped: {e_import}")
+        else:
+            # Kept in the session so the error report survives the rerun its download button causes.
+            st.session_state.bulk_import_result = {"Entity": import_entity_label, "Inserted": import_result["Inserted"],
+                                                   "Rejected": import_result["Rejected"],
+                                                   "ErrorsCSV": import_result["Errors"].to_csv(index=False).encode("utf-8")}
+        import_progress.empty()
+    last_import = st.session_state.get("bulk_import_result")
+    if last_import:
+        st.success(f"{last_import['Entity']}: imported {last_import['Inserted']:,} rows.")
+        if last_import["Rejected"]:
+            st.warning(f"{last_import['Rejected']:,} rows were rejected and not imported.")
+            st.download_button("Download Error Report", data=last_import["ErrorsCSV"],
+                               file_name=f"{last_import['Entity'].lower()}_import_errors.csv", mime="text/csv", key="bulk_import_errors")
+
 elif choice == "Reports":
     # ... (Reports code as before) ...
     st.header("📈 Reports")
     st.info("Reporting section provides basic summaries. More detailed visualizations and queries can be added.")
     report_type_main = st.selectbox("Select Report Type (Basic Examples)", 
                                     ["Overall Financial Summary", "Project Profitability (Simplified)", 
-                                     "Sales by Product (Placeholder)", "Inventory Status (Placeholder)"])
+                                     "Sales by Product", "Inventory Status"])
     if report_type_main == "Overall Financial Summary":
-        all_invoices_rep_rows = db.get_all_invoices()
-        all_invoices_rep = db.rows_to_dicts(all_invoices_rep_rows) if all_invoices_rep_rows else []
-        
-        expenses_main_rep_rows = db.get_all_expenses()
-        expenses_main_rep = db.rows_to_dicts(expenses_main_rep_rows) if expenses_main_rep_rows else []
-
-        total_revenue_from_paid_invoices_rep = sum(inv['TotalAmount'] for inv in all_invoices_rep if inv.get('Status') == 'Paid' and inv.get('TotalAmount'))
-        total_operational_expenses_main_rep = sum(e['Amount'] for e in expenses_main_rep if e.get('Amount') and e.get('Category') != 'COGS')
-        total_cogs_expenses_rep = sum(e['Amount'] for e in expenses_main_rep if e.get('Amount') and e.get('Category') == 'COGS')
-
+        col_fin_from, col_fin_to, col_fin_gran = st.columns(3)
+        fin_date_from = col_fin_from.date_input("From", datetime.now().date().replace(month=1, day=1), key="fin_rep_from")
+        fin_date_to = col_fin_to.date_input("To", datetime.now().date(), key="fin_rep_to")
+        fin_granularity = col_fin_gran.selectbox("Group by", ["day", "week", "month", "quarter"], index=2,
+                                                 format_func=str.title, key="fin_rep_granularity")
+        # Grouped in SQL; whole closed months come from the cached monthly rollups.
+        df_financial = pd.DataFrame(db.get_financial_summary(fin_date_from, fin_date_to, fin_granularity),
+                                    columns=["Period", "Revenue", "COGS", "GrossProfit", "OperatingExpenses", "NetOperatingIncome"])
+        total_revenue_from_paid_invoices_rep = df_financial['Revenue'].sum()
+        total_cogs_expenses_rep = df_financial['COGS'].sum()
+        total_operational_expenses_main_rep = df_financial['OperatingExpenses'].sum()
 
         st.metric("Total Revenue (from Paid Invoices)", f"Rs. {total_revenue_from_paid_invoices_rep:,.2f}")
         st.metric("Total Cost of Goods Sold (COGS)", f"Rs. {total_cogs_expenses_rep:,.2f}")
@@ -1639,69 +1828,118 @@ elif choice == "Reports":
         st.metric("Total Operational Expenses (excl. COGS)", f"Rs. {total_operational_expenses_main_rep:,.2f}")
         net_operating_income = gross_profit - total_operational_expenses_main_rep
         st.metric("Net Operating Income", f"Rs. {net_operating_income:,.2f}")
+
+        if not df_financial.empty:
+            st.markdown(f"#### By {fin_granularity.title()}")
+            st.line_chart(df_financial.set_index("Period")[["Revenue", "COGS", "OperatingExpenses", "NetOperatingIncome"]])
+            show_grid(df_financial, labels={"Period": f"{fin_granularity.title()} Starting", "GrossProfit": "Gross Profit",
+                                            "OperatingExpenses": "Operational Expenses", "NetOperatingIncome": "Net Operating Income"})
+            export_controls("financial_report", f"financial_summary_{fin_granularity}", frame=df_financial)
+        else:
+            st.info("No paid invoices or expenses in the selected period.")
         st.caption("Note: This summary relies on accurate 'Paid' invoice statuses and categorized expenses (especially 'COGS'). Supplier service costs are included if logged as expenses.")
 
     elif report_type_main == "Project Profitability (Simplified)":
         st.subheader("Project Profitability (Simplified)")
-        projects_rep_rows = db.get_all_projects()
-        if projects_rep_rows:
-            projects_rep = db.rows_to_dicts(projects_rep_rows)
-            report_data = []
-            for proj in projects_rep:
-                proj_id = proj['ProjectID']
-                project_name = proj.get('ProjectName', f"Project ID {proj_id}")
-                
-                invoices_for_proj_rows = db.get_invoices_by_project_id(proj_id) 
-                invoices_for_proj = db.rows_to_dicts(invoices_for_proj_rows) if invoices_for_proj_rows else []
-                revenue_for_proj = sum(inv['TotalAmount'] for inv in invoices_for_proj if inv.get('Status') == 'Paid' and inv.get('TotalAmount'))
-                
-                # Costs for project: manual expenses + supplier services linked + project materials cost
-                total_project_cost = 0
-                
-                # Manual expenses linked to project
-                manual_expenses_for_proj_rows = db.get_expenses_by_project_id(proj_id) 
-                manual_expenses_for_proj = db.rows_to_dicts(manual_expenses_for_proj_rows) if manual_expenses_for_proj_rows else []
-                total_project_cost += sum(exp['Amount'] for exp in manual_expenses_for_proj if exp.get('Amount'))
-
-                # Supplier services linked to project (if not already covered by auto-logged expenses)
-                # This might double count if supplier services auto-log to Expenses table AND are also linked to project.
-                # For simplicity, let's assume they are distinct or db.get_expenses_by_project_id filters out auto-logged service expenses.
-                # A better approach is to ensure supplier services costs are consistently logged as 'Expenses' with category 'COGS' or 'Service Costs'.
-                # For now, let's sum supplier service costs linked to project directly.
-                services_for_proj_rows = db.get_services_for_project(proj_id)
-                services_for_proj = db.rows_to_dicts(services_for_proj_rows) if services_for_proj_rows else []
-                total_project_cost += sum(serv.get('Cost', 0.0) for serv in services_for_proj if not serv.get('IsExpenseLogged')) # Add only if not already logged as an expense
-
-                # Project Materials cost
-                project_mats_rows = db.get_materials_for_project(proj_id)
-                project_mats = db.rows_to_dicts(project_mats_rows) if project_mats_rows else []
-                total_project_cost += sum(pm.get('QuantityUsed',0) * pm.get('CostPerUnitAtTimeOfUse',0) for pm in project_mats)
-
-                profit_for_proj = revenue_for_proj - total_project_cost
-                report_data.append({
-                    "Project Name": project_name,
-                    "Total Revenue (Paid Invoices)": revenue_for_proj,
-                    "Total Estimated Costs": total_project_cost,
-                    "Estimated Profit/Loss": profit_for_proj
-                })
-            
-            if report_data:
-                df_report = pd.DataFrame(report_data)
-                df_report["Total Revenue (Paid Invoices)"] = df_report["Total Revenue (Paid Invoices)"].apply(lambda x: f"Rs. {x:,.2f}")
-                df_report["Total Estimated Costs"] = df_report["Total Estimated Costs"].apply(lambda x: f"Rs. {x:,.2f}")
-                df_report["Estimated Profit/Loss"] = df_report["Estimated Profit/Loss"].apply(lambda x: f"Rs. {x:,.2f}")
-                st.dataframe(df_report, use_container_width=True, hide_index=True)
-            else:
-                st.info("No project data with financial transactions to report on.")
+        filter_profit_by_date = st.checkbox("Filter by date range", key="profit_rep_date_filter")
+        profit_date_from, profit_date_to = None, None
+        if filter_profit_by_date:
+            col_profit_from, col_profit_to = st.columns(2)
+            profit_date_from = col_profit_from.date_input("From", datetime.now().date() - timedelta(days=365), key="profit_rep_from")
+            profit_date_to = col_profit_to.date_input("To", datetime.now().date(), key="profit_rep_to")
+        # Revenue = Paid invoices; costs = project expenses + supplier services not already logged as expenses + materials used.
+        profitability_rows = db.get_project_profitability(
+            profit_date_from.strftime("%Y-%m-%d") if profit_date_from else None,
+            profit_date_to.strftime("%Y-%m-%d") if profit_date_to else None,
+        )
+        if profitability_rows:
+            df_report = pd.DataFrame(db.rows_to_dicts(profitability_rows))
+            show_grid(df_report, ["ProjectName", "Revenue", "TotalCost", "Profit"], labels={
+                "ProjectName": "Project Name",
+                "Revenue": "Total Revenue (Paid Invoices)",
+                "TotalCost": "Total Estimated Costs",
+                "Profit": "Estimated Profit/Loss",
+            })
+            export_controls("profitability_report", "project_profitability", frame=df_report)
         else:
             st.info("No projects available for reporting.")
     
-    elif report_type_main == "Sales by Product (Placeholder)":
-        st.info("This report is a placeholder and needs implementation (e.g., querying OrderItems and Products).")
-
-    elif report_type_main == "Inventory Status (Placeholder)":
-        st.info("This report is a placeholder and needs implementation (e.g., querying Products for stock levels, reorder points).")
+    elif report_type_main == "Sales by Product":
+        st.subheader("Sales by Product")
+        col_sales_from, col_sales_to, col_sales_cat, col_sales_top = st.columns(4)
+        sales_date_from = col_sales_from.date_input("From", datetime.now().date() - timedelta(days=365), key="sales_rep_from")
+        sales_date_to = col_sales_to.date_input("To", datetime.now().date(), key="sales_rep_to")
+        sales_category = col_sales_cat.selectbox("Category", ["All Categories"] + db.get_distinct_product_categories(), key="sales_rep_category")
+        sales_top_n = col_sales_top.number_input("Top N (0 = all)", min_value=0, value=20, step=5, key="sales_rep_top_n")
+        # Read from the daily per-product sales table, not by grouping OrderItems.
+        sales_rows = db.get_sales_by_product(
+            sales_date_from.strftime("%Y-%m-%d"), sales_date_to.strftime("%Y-%m-%d"),
+            None if sales_category == "All Categories" else sales_category, sales_top_n or None)
+        if sales_rows:
+            df_sales = pd.DataFrame(db.rows_to_dicts(sales_rows))
+            col_units, col_gross, col_net = st.columns(3)
+            col_units.metric("Units Sold", f"{int(df_sales['Quantity'].sum()):,}")
+            col_gross.metric("Gross Sales", f"Rs. {df_sales['Gross'].sum():,.2f}")
+            col_net.metric("Net Sales", f"Rs. {df_sales['Net'].sum():,.2f}")
+            show_grid(df_sales, ['ProductName', 'SKU', 'Category', 'Quantity', 'Gross', 'Discount', 'Net'],
+                      labels={'ProductName': 'Product', 'Quantity': 'Units Sold', 'Gross': 'Gross Sales', 'Net': 'Net Sales'})
+            export_controls("sales_report", "sales_by_product", frame=df_sales)
+        else:
+            st.info("No sales in the selected period.")
+
+    elif report_type_main == "Inventory Status":
+        st.subheader("Inventory Status")
+        db.refresh_inventory_velocity() # Only reads the days that entered or left the window since the last refresh
+        st.caption(f"Velocity and days of cover use consumption (sales and project usage) over the last {db.VELOCITY_WINDOW_DAYS} full days.")
+        low_stock_rows = db.get_low_stock_products()
+        df_inventory = pd.DataFrame(db.rows_to_dicts(db.get_inventory_status()))
+        if not df_inventory.empty:
+            df_inventory['BelowReorder'] = df_inventory['BelowReorder'].astype(bool)
+            is_product = df_inventory['ItemType'] == 'Product'
+            col_prod_val, col_mat_val, col_low = st.columns(3)
+            col_prod_val.metric("Product Stock Value (at cost)", f"Rs. {df_inventory.loc[is_product, 'StockValue'].sum():,.2f}")
+            col_mat_val.metric("Material Stock Value (at cost)", f"Rs. {df_inventory.loc[~is_product, 'StockValue'].sum():,.2f}")
+            col_low.metric("Products at/below Reorder Level", f"{len(low_stock_rows):,}")
+
+        st.markdown("#### ⚠️ Low-Stock Alerts")
+        if low_stock_rows:
+            show_grid(pd.DataFrame(db.rows_to_dicts(low_stock_rows)), ['ProductName', 'SKU', 'Category', 'QuantityInStock', 'ReorderLevel', 'DailyVelocity', 'DaysOfCover'],
+                      labels={'ProductName': 'Product', 'DailyVelocity': 'Units/Day', 'DaysOfCover': 'Days of Cover'})
+        else:
+            st.success("No products are at or below their reorder level.")
+
+        st.markdown("#### Stock by Item")
+        if not df_inventory.empty:
+            inventory_item_type = st.radio("Show", ["All", "Product", "Material"], horizontal=True, key="inv_rep_item_type")
+            if inventory_item_type != "All":
+                df_inventory = df_inventory[df_inventory['ItemType'] == inventory_item_type]
+            show_grid(df_inventory, ['ItemType', 'ItemName', 'SKU', 'Category', 'QuantityInStock', 'ReorderLevel', 'UnitCost', 'StockValue', 'DailyVelocity', 'DaysOfCover', 'BelowReorder'],
+                      labels={'ItemType': 'Type', 'ItemName': 'Item', 'DailyVelocity': 'Units/Day', 'DaysOfCover': 'Days of Cover', 'BelowReorder': 'Reorder?'})
+            export_controls("inventory_report", "inventory_status", frame=df_inventory)
+        else:
+            st.info("No products or materials recorded yet.")
 
 
 st.sidebar.markdown("---")
 st.sidebar.info("BACHAT-Management System")
+
+# --- Performance panel ---
+# Only shown when database.py profiling is on (DIYI_PROFILE=1). Covers the db
+# calls this rerun made; export downloads are built later on their own thread.
+if db.profiling_enabled():
+    profile = db.get_profile()
+    with st.sidebar.expander("⏱️ Performance", expanded=False):
+        col_calls, col_time = st.columns(2)
+        col_calls.metric("DB Calls", f"{profile['Calls']:,}")
+        col_time.metric("DB Time", f"{profile['Seconds'] * 1000:,.1f} ms")
+        col_rows, col_bytes = st.columns(2)
+        col_rows.metric("Rows", f"{profile['Rows']:,}")
+        col_bytes.metric("Memory", f"{profile['Bytes'] / 1024:,.1f} KB")
+        if profile['Functions']:
+            df_profile = pd.DataFrame(profile['Functions'])
+            df_profile['Seconds'] *= 1000
+            df_profile['MaxSeconds'] *= 1000
+            st.dataframe(df_profile, hide_index=True, use_container_width=True,
+                         column_config={'Seconds': st.column_config.NumberColumn("ms", format="%.1f"),
+                                        'MaxSeconds': st.column_config.NumberColumn("Max ms", format="%.1f"),
+                                        'Bytes': st.column_config.NumberColumn("Bytes", format="%d")})
@@ -0,0 +1,10 @@
+"""Benchmarks for the data layer and the Streamlit pages.
+
+Run from the repository root:
+
+    python -m benchmarks --scale 100k --output bench.json
+    python -m benchmarks --scale 100k --baseline bench.json --threshold 0.25
+
+The database is filled by datagen.py and kept between runs (one file per scale
+and seed), so only the first run at a scale pays for seeding. See `python -m benchmarks --help`.
+"""
@@ -0,0 +1,94 @@
+import argparse
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import database as db  # noqa: E402
+import datagen  # noqa: E402
+from benchmarks import cases, pages, report  # noqa: E402
+
+SCALES = {"1k": 1_000, "100k": 100_000, "1m": 1_000_000}  # Seeded orders; datagen scales the other tables
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Time db.* calls and page renders.")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="1k", help="number of seeded orders")
+    parser.add_argument("--seed", type=int, default=0, help="random seed for the generated data")
+    parser.add_argument("--db", help="database file (default: one per scale and seed in the temp directory)")
+    parser.add_argument("--reseed", action="store_true", help="delete and reseed the database first")
+    parser.add_argument("--repeat", type=int, default=20, help="timed runs per db case")
+    parser.add_argument("--page-repeat", type=int, default=3, help="timed renders per page")
+    parser.add_argument("--no-pages", action="store_true", help="skip the AppTest page renders")
+    parser.add_argument("--only", help="run only cases whose name contains this text")
+    parser.add_argument("--output", help="write the results JSON here")
+    parser.add_argument("--baseline", help="results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown before failing (0.25 = 25%%)")
+    parser.add_argument("--metric", choices=["p50_ms", "p95_ms", "mean_ms"], default="p50_ms",
+                        help="statistic compared against the baseline")
+    return parser.parse_args(argv)
+
+
+def prepare_database(args):
+    path = args.db or os.path.join(tempfile.gettempdir(), f"diyi_bench_{args.scale}_seed{args.seed}.db")
+    if args.reseed:
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+    fresh = not os.path.exists(path)
+    db.configure(db_file=path)
+    if fresh:
+        print(f"Seeding {args.scale} orders into {path} ...", flush=True)
+        datagen.generate(SCALES[args.scale], seed=args.seed)
+    db.init_db()
+    conn = db.get_connection()
+    counts = {table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+              for table in ("Customers", "Products", "Projects", "Orders", "OrderItems", "Invoices", "Expenses")}
+    return path, counts
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    os.chdir(ROOT)  # app.py resolves images/ and data/ relative to the working directory
+    path, counts = prepare_database(args)
+    wanted = (lambda name: args.only.lower() in name.lower()) if args.only else (lambda name: True)
+
+    results = {}
+    db_cases = cases.db_cases(cases.sample_ids())
+    untimed = cases.untimed_app_functions([name for name, _ in db_cases])
+    if untimed:
+        print(f"Warning: app.py calls db functions no case times: {', '.join(untimed)}", flush=True)
+    for name, fn in db_cases:
+        if wanted(f"db.{name}"):
+            results[f"db.{name}"] = report.summarize(report.time_call(fn, args.repeat))
+            print(f"{'db.' + name:<45} p50 {results['db.' + name]['p50_ms']:>10.2f} ms   "
+                  f"p95 {results['db.' + name]['p95_ms']:>10.2f} ms", flush=True)
+    if not args.no_pages:
+        for module in pages.sidebar_modules():
+            if wanted(f"page.{module}"):
+                samples = [pages.render_module(module) for _ in range(args.page_repeat)]
+                results[f"page.{module}"] = report.summarize(samples)
+                print(f"{'page.' + module:<45} p50 {results['page.' + module]['p50_ms']:>10.2f} ms   "
+                      f"p95 {results['page.' + module]['p95_ms']:>10.2f} ms", flush=True)
+
+    document = report.result_document(args.scale, counts, results)
+    if args.output:
+        report.save(document, args.output)
+        print(f"Results written to {args.output}")
+    if args.baseline:
+        rows = report.compare(document, report.load(args.baseline), args.threshold, args.metric)
+        regressions = [row for row in rows if row[4]]
+        print(f"\nAgainst {args.baseline} ({args.metric}, threshold +{args.threshold:.0%}):")
+        for name, before, after, ratio, regressed in rows:
+            print(f"{'REGRESSED' if regressed else 'ok':<10} {name:<45} {before:>10.2f} -> {after:>10.2f} ms  x{ratio:.2f}")
+        if regressions:
+            print(f"{len(regressions)} case(s) regressed.")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
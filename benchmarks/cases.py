@@ -0,0 +1,142 @@
+"""The data-layer calls app.py makes, with the arguments it makes them with.
+
+Each case is (name, callable), named after the db function it times. Arguments
+that need existing rows (a busy customer, a project with materials, an order
+with lines) are picked once from the seeded database by sample_ids(). Every db
+function app.py calls is either timed here or listed in NOT_TIMED;
+untimed_app_functions() names the ones that are neither.
+"""
+import io
+import os
+import re
+from datetime import date, timedelta
+
+import database as db
+
+GRID_PAGE_SIZE = 50  # The View All grids' default "Rows per page"
+APP_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+
+# Writes that can't be repeated against the same rows, and bookkeeping that isn't data access.
+NOT_TIMED = {
+    "add_customer", "add_expense", "add_invoice", "add_material", "add_material_to_project", "add_product",
+    "add_project", "add_supplier", "add_supplier_service", "create_order_with_items", "import_records",
+    "delete_customer", "delete_material", "delete_product", "delete_project", "delete_supplier",
+    "delete_supplier_service", "remove_material_from_project", "update_customer", "update_invoice",
+    "update_material", "update_order_basic_info", "update_product", "update_project", "update_supplier",
+    "update_supplier_service", "update_supplier_service_receipt_path",
+    "init_db", "rows_to_dicts", "reset_profile", "get_profile", "profiling_enabled",
+}
+
+
+def sample_ids():
+    """IDs and search terms for the cases, chosen from the rows the database actually has."""
+    conn = db.get_connection()
+
+    def busiest(sql):
+        row = conn.execute(sql).fetchone()
+        return row[0] if row else None
+
+    return {
+        "customer_id": busiest("SELECT CustomerID FROM Orders GROUP BY CustomerID ORDER BY COUNT(*) DESC LIMIT 1"),
+        "project_id": busiest("SELECT ProjectID FROM ProjectMaterials GROUP BY ProjectID ORDER BY COUNT(*) DESC LIMIT 1"),
+        "order_id": busiest("SELECT OrderID FROM OrderItems GROUP BY OrderID ORDER BY COUNT(*) DESC LIMIT 1"),
+        "supplier_id": busiest("SELECT SupplierID FROM SupplierServices GROUP BY SupplierID ORDER BY COUNT(*) DESC LIMIT 1"),
+        "service_id": busiest("SELECT MAX(ServiceID) FROM SupplierServices"),
+        "material_id": busiest("SELECT MaterialID FROM ProjectMaterials GROUP BY MaterialID ORDER BY COUNT(*) DESC LIMIT 1"),
+        "product_id": busiest("SELECT ItemID FROM StockMovements WHERE ItemType = 'Product' "
+                              "GROUP BY ItemID ORDER BY COUNT(*) DESC LIMIT 1"),
+        "invoice_id": busiest("SELECT MAX(InvoiceID) FROM Invoices"),
+        "material_category": busiest("SELECT Category FROM Materials GROUP BY Category ORDER BY COUNT(*) DESC LIMIT 1"),
+        "invoice_search": "INV",
+        "customer_search": "Khan",
+        "product_search": "Sofa",
+    }
+
+
+def _export(query_name, file_format="csv"):
+    return db.export_frames(db.iter_frame_batches(query_name), io.BytesIO(), file_format)
+
+
+def db_cases(ids):
+    today = date.today()
+    year_ago = (today - timedelta(days=365)).isoformat()
+    page = {"limit": GRID_PAGE_SIZE}
+    return [
+        # Dashboard
+        ("get_dashboard_kpis", db.get_dashboard_kpis),
+        ("get_all_orders(limit=5)", lambda: db.get_all_orders(limit=5)),
+        ("get_recent_invoices", lambda: db.get_recent_invoices(limit=5)),
+        # Grids and their counts
+        ("fetch_frame(customers)", lambda: db.fetch_frame("customers", **page)),
+        ("fetch_frame(customers, search)", lambda: db.fetch_frame("customers", search_term=ids["customer_search"], **page)),
+        ("count_customers(search)", lambda: db.count_customers(search_term=ids["customer_search"])),
+        ("fetch_frame(products, search)", lambda: db.fetch_frame("products", search_term=ids["product_search"], **page)),
+        ("count_products", db.count_products),
+        ("fetch_frame(suppliers)", lambda: db.fetch_frame("suppliers", **page)),
+        ("count_suppliers", db.count_suppliers),
+        ("fetch_frame(supplier_services)", lambda: db.fetch_frame("supplier_services", **page)),
+        ("count_supplier_services", db.count_supplier_services),
+        ("fetch_frame(materials)", lambda: db.fetch_frame("materials", **page)),
+        ("count_materials", db.count_materials),
+        ("fetch_frame(products)", lambda: db.fetch_frame("products", **page)),
+        ("fetch_frame(projects)", lambda: db.fetch_frame("projects", **page)),
+        ("count_projects", db.count_projects),
+        ("fetch_frame(orders)", lambda: db.fetch_frame("orders", **page)),
+        ("count_orders", db.count_orders),
+        ("fetch_frame(invoices)", lambda: db.fetch_frame("invoices", **page)),
+        ("get_all_invoices(search)", lambda: db.get_all_invoices(search_term=ids["invoice_search"], **page)),
+        ("count_invoices(search)", lambda: db.count_invoices(search_term=ids["invoice_search"])),
+        ("fetch_frame(expenses)", lambda: db.fetch_frame("expenses", **page)),
+        ("count_expenses", db.count_expenses),
+        # Select boxes and edit forms
+        ("get_reference_list(Customers)", lambda: db.get_reference_list("Customers")),
+        ("get_reference_list(Products)", lambda: db.get_reference_list("Products")),
+        ("get_reference_list(Suppliers)", lambda: db.get_reference_list("Suppliers")),
+        ("get_reference_list(Projects)", lambda: db.get_reference_list("Projects")),
+        ("get_reference_list(Materials)", lambda: db.get_reference_list("Materials")),
+        ("get_distinct_product_categories", db.get_distinct_product_categories),
+        ("get_distinct_material_categories", db.get_distinct_material_categories),
+        ("get_import_columns", lambda: db.get_import_columns("products")),
+        ("get_all_orders", db.get_all_orders),
+        ("get_all_supplier_services", db.get_all_supplier_services),
+        ("get_order_by_id", lambda: db.get_order_by_id(ids["order_id"])),
+        ("get_customer_by_id", lambda: db.get_customer_by_id(ids["customer_id"])),
+        ("get_supplier_by_id", lambda: db.get_supplier_by_id(ids["supplier_id"])),
+        ("get_supplier_service_by_id", lambda: db.get_supplier_service_by_id(ids["service_id"])),
+        ("get_material_by_id", lambda: db.get_material_by_id(ids["material_id"])),
+        ("get_product_by_id", lambda: db.get_product_by_id(ids["product_id"])),
+        ("get_order_items_by_order_id", lambda: db.get_order_items_by_order_id(ids["order_id"])),
+        ("get_invoice_by_id", lambda: db.get_invoice_by_id(ids["invoice_id"])),
+        ("get_next_invoice_reference_id", db.get_next_invoice_reference_id),
+        ("get_materials_by_category", lambda: db.get_materials_by_category(ids["material_category"])),
+        ("get_stock_movements", lambda: db.get_stock_movements("Product", ids["product_id"])),
+        # Detail views
+        ("get_customer_360", lambda: db.get_customer_360(ids["customer_id"])),
+        ("get_project_by_id", lambda: db.get_project_by_id(ids["project_id"])),
+        ("get_materials_for_project", lambda: db.get_materials_for_project(ids["project_id"])),
+        ("get_services_for_project", lambda: db.get_services_for_project(ids["project_id"])),
+        # Writes that are safe to repeat
+        ("update_order_total", lambda: db.update_order_total(ids["order_id"])),
+        ("refresh_inventory_velocity", db.refresh_inventory_velocity),
+        # Reports
+        ("get_financial_summary(month)", lambda: db.get_financial_summary(year_ago, today.isoformat(), "month")),
+        ("get_financial_summary(day)", lambda: db.get_financial_summary(year_ago, today.isoformat(), "day")),
+        ("get_project_profitability", db.get_project_profitability),
+        ("get_sales_by_product", lambda: db.get_sales_by_product(year_ago, today.isoformat(), top_n=20)),
+        ("get_inventory_status", db.get_inventory_status),
+        ("get_low_stock_products", db.get_low_stock_products),
+        # Exports (iter_frame_batches + export_frames)
+        ("export_frames(orders, csv)", lambda: _export("orders")),
+        ("export_frames(invoices, csv)", lambda: _export("invoices")),
+        ("export_frames(expenses, csv)", lambda: _export("expenses")),
+    ] + ([("export_frames(orders, parquet)", lambda: _export("orders", "parquet"))] if "parquet" in db.EXPORT_FORMATS else [])
+
+
+def untimed_app_functions(case_names):
+    """db functions app.py calls that neither a case nor NOT_TIMED accounts for."""
+    with open(APP_FILE, encoding="utf-8") as handle:
+        called = set(re.findall(r"\bdb\.([a-z_]+)\(", handle.read()))
+    timed = {name.split("(")[0] for name in case_names}
+    if "export_frames" in timed:
+        timed.add("iter_frame_batches")
+    return sorted(called - timed - NOT_TIMED)
@@ -0,0 +1,31 @@
+"""Headless page renders through Streamlit's AppTest.
+
+Each sample starts a fresh AppTest session, lets the first run (Dashboard)
+finish, then times the rerun that switches the sidebar to the module.
+"""
+import os
+import time
+
+from streamlit.testing.v1 import AppTest
+
+APP_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+RENDER_TIMEOUT_S = 600
+
+
+def sidebar_modules():
+    at = AppTest.from_file(APP_FILE, default_timeout=RENDER_TIMEOUT_S)
+    at.run()
+    return list(at.sidebar.radio[0].options)
+
+
+def render_module(module):
+    """Seconds to render `module`; raises if the script raised."""
+    at = AppTest.from_file(APP_FILE, default_timeout=RENDER_TIMEOUT_S)
+    at.run()
+    radio = at.sidebar.radio[0]
+    started = time.perf_counter()
+    radio.set_value(module).run()
+    elapsed = time.perf_counter() - started
+    if at.exception:
+        raise RuntimeError(f"{module}: {at.exception[0].message}")
+    return elapsed
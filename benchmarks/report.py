@@ -0,0 +1,68 @@
+"""Timing statistics, the JSON result file and comparison against a baseline."""
+import json
+import platform
+import sqlite3
+import statistics
+import time
+from datetime import datetime
+
+
+def time_call(fn, repeat, warmup=1):
+    """Wall-clock seconds for `repeat` calls of fn() after `warmup` untimed ones."""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def summarize(samples):
+    ordered = sorted(samples)
+    p95 = ordered[min(len(ordered) - 1, round(0.95 * (len(ordered) - 1)))]
+    return {
+        "runs": len(samples),
+        "p50_ms": round(statistics.median(ordered) * 1000, 3),
+        "p95_ms": round(p95 * 1000, 3),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 3),
+        "min_ms": round(ordered[0] * 1000, 3),
+    }
+
+
+def result_document(scale, counts, results):
+    return {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "scale": scale,
+        "rows": counts,
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "results": results,
+    }
+
+
+def load(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save(document, path):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(document, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def compare(current, baseline, threshold, metric="p50_ms"):
+    """Rows of (name, baseline, current, ratio, regressed) for the cases present in both documents.
+
+    A case regresses when its `metric` grew by more than `threshold` (0.25 = 25%).
+    """
+    rows = []
+    for name, result in sorted(current["results"].items()):
+        before = baseline["results"].get(name)
+        if not before or not before.get(metric):
+            continue
+        ratio = result[metric] / before[metric]
+        rows.append((name, before[metric], result[metric], ratio, ratio > 1 + threshold))
+    return rows
@@ -1,1642 +1,2884 @@
-import streamlit as st
-import pandas as pd
-from datetime import datetime, timedelta
+import functools
+import hashlib
+import inspect
+import json
+import logging
+import logging.handlers
 import os
-import database as db
-from PIL import Image
-
-# This MUST be the first Streamlit command in your app
-st.set_page_config(layout="wide")
-
-# Initialize the database (creates files and tables if they don't exist)
-# This MUST run after page config but before any other Streamlit elements
-db.init_db()
-
-st.title("🛋️ DYI Furniture Management System")
-
-def save_uploaded_receipt(uploaded_file, service_id):
-    if uploaded_file is not None:
-        file_extension = os.path.splitext(uploaded_file.name)[1]
-        if not os.path.exists(db.RECEIPT_DIR):
-            os.makedirs(db.RECEIPT_DIR)
-        filename = f"service_{service_id}_receipt{file_extension}"
-        receipt_path = os.path.join(db.RECEIPT_DIR, filename)
-        with open(receipt_path, "wb") as f:
-            f.write(uploaded_file.getbuffer())
-        return receipt_path
-    return None
-
-def save_uploaded_product_image(uploaded_file, product_id_or_sku):
-    if uploaded_file is not None:
-        file_extension = os.path.splitext(uploaded_file.name)[1]
-        if not os.path.exists(db.IMAGE_DIR):
-            os.makedirs(db.IMAGE_DIR)
-        filename = f"product_{product_id_or_sku}{file_extension}"
-        img_path = os.path.join(db.IMAGE_DIR, filename)
-        with open(img_path, "wb") as f:
-            f.write(uploaded_file.getbuffer())
-        return img_path
-    return None
-
-st.sidebar.header("Navigation")
-modules = [
-    "Dashboard", "Customer Management", "Supplier Management",
-    "Supplier Services",
-    "Material Management", "Product Management", "Project Management",
-    "Sales Book (Orders)", "Invoice Tracking",
-    "Expense Tracking", "Reports"
-]
-choice = st.sidebar.radio("Go to", modules)
-
-if 'selected_customer_id_for_detail_view' not in st.session_state:
-    st.session_state.selected_customer_id_for_detail_view = None
-if 'customer_management_action_view' not in st.session_state:
-    st.session_state.customer_management_action_view = "List"
-if 'active_selection_for_button_cust_id' not in st.session_state:
-    st.session_state.active_selection_for_button_cust_id = None
-if 'active_selection_for_button_cust_name' not in st.session_state:
-    st.session_state.active_selection_for_button_cust_name = None
-if 'current_order_items_main' not in st.session_state:
-    st.session_state.current_order_items_main = []
-
-if choice == "Dashboard":
-    st.header("📊 Dashboard")
-    customers = db.get_all_customers()
-    products = db.get_all_products()
-    suppliers = db.get_all_suppliers()
-    materials = db.get_all_materials()
+import re
+import sqlite3
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+
+# --- Configuration ---
+# The database path and busy timeout can be overridden from the environment so
+# the same module serves the Streamlit app, scripts and load tests.
+DB_FILE = os.environ.get("DIYI_DB_PATH", os.path.join("data", "diyi.db"))
+IMAGE_DIR = "images"
+RECEIPT_DIR = os.path.join(IMAGE_DIR, "receipts")
+BUSY_TIMEOUT_MS = int(os.environ.get("DIYI_DB_BUSY_TIMEOUT_MS", "5000"))
+STATEMENT_CACHE_SIZE = 256  # Compiled statements kept per connection
+MAX_IDLE_CONNECTIONS = 8
+VELOCITY_WINDOW_DAYS = 30  # Consumption history behind days-of-cover
+PROFILE_DB_CALLS = os.environ.get("DIYI_PROFILE", "") == "1"  # Opt-in per-rerun call profiling, see enable_profiling()
+SLOW_QUERY_MS = float(os.environ.get("DIYI_SLOW_QUERY_MS") or 0)  # Log statements at least this slow; 0 = off
+SLOW_QUERY_LOG = os.environ.get("DIYI_SLOW_QUERY_LOG")  # Defaults to slow_queries.jsonl next to DB_FILE
+SLOW_QUERY_LOG_BYTES = 5 * 1024 * 1024  # Rotated at this size...
+SLOW_QUERY_LOG_BACKUPS = 3  # ...keeping this many older files (.1, .2, ...)
+
+
+# --- Connection management ---
+# Every Streamlit script thread keeps one reused connection instead of a
+# connect/close per call. When the thread goes away its thread-local storage is
+# torn down and the connection is handed back to a small idle pool, so the next
+# script thread picks up an already-configured connection.
+
+_local = threading.local()
+_pool_lock = threading.Lock()
+_idle_connections = []
+_pool_generation = 0
+
+
+class _ThreadConnection:
+    def __init__(self, conn, generation):
+        self.conn = conn
+        self.generation = generation
+
+    def __del__(self):
+        try:
+            _release_connection(self.conn, self.generation)
+        except Exception:
+            pass
+
+
+def _open_connection():
+    db_dir = os.path.dirname(DB_FILE)
+    if db_dir and not os.path.exists(db_dir):
+        os.makedirs(db_dir)
+    conn = sqlite3.connect(
+        DB_FILE,
+        timeout=BUSY_TIMEOUT_MS / 1000.0,
+        isolation_level=None,  # Transactions are managed explicitly in transaction()
+        check_same_thread=False,  # Pooled connections move between script threads
+        cached_statements=STATEMENT_CACHE_SIZE,
+        factory=_LoggedConnection if SLOW_QUERY_MS > 0 else sqlite3.Connection,
+    )
+    conn.row_factory = sqlite3.Row
+    conn.execute(f"PRAGMA busy_timeout = {int(BUSY_TIMEOUT_MS)}")
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute("PRAGMA foreign_keys = ON")
+    return conn
+
+
+def _release_connection(conn, generation):
+    with _pool_lock:
+        if generation == _pool_generation and len(_idle_connections) < MAX_IDLE_CONNECTIONS and not conn.in_transaction:
+            _idle_connections.append(conn)
+            return
+    conn.close()
+
+
+def get_connection():
+    """Returns the calling thread's connection, taking one from the idle pool or opening it on first use."""
+    holder = getattr(_local, "holder", None)
+    if holder is not None and holder.generation == _pool_generation:
+        return holder.conn
+    with _pool_lock:
+        generation = _pool_generation
+        conn = _idle_connections.pop() if _idle_connections else None
+    if conn is None:
+        conn = _open_connection()
+    _local.holder = _ThreadConnection(conn, generation)
+    return conn
+
+
+def configure(db_file=None, busy_timeout_ms=None, slow_query_ms=None, slow_query_log=None):
+    """Points the module at another database file, busy timeout and/or slow-query log, dropping pooled connections."""
+    global DB_FILE, BUSY_TIMEOUT_MS, SLOW_QUERY_MS, SLOW_QUERY_LOG
+    if db_file is not None:
+        DB_FILE = db_file
+    if busy_timeout_ms is not None:
+        BUSY_TIMEOUT_MS = int(busy_timeout_ms)
+    if slow_query_ms is not None:
+        SLOW_QUERY_MS = float(slow_query_ms)
+    if slow_query_log is not None:
+        SLOW_QUERY_LOG = slow_query_log
+    _close_slow_query_log()
+    close_all_connections()
+
+
+def close_all_connections():
+    global _pool_generation
+    with _pool_lock:
+        _pool_generation += 1
+        idle, _idle_connections[:] = list(_idle_connections), []
+    for conn in idle:
+        conn.close()
+    holder = getattr(_local, "holder", None)
+    if holder is not None:
+        _local.holder = None
+
+
+@contextmanager
+def transaction():
+    """Runs the block in one write transaction; nested calls join the outer one."""
+    conn = get_connection()
+    if conn.in_transaction:
+        yield conn
+        return
+    _local.pending_invalidations = set()
+    conn.execute("BEGIN IMMEDIATE")
     try:
-        projects_rows = db.get_all_projects()
-        projects = db.rows_to_dicts(projects_rows) if projects_rows else []
-    except Exception as e:
-        st.error(f"Error loading project data for Dashboard: {e}")
-        st.warning("The Dashboard might be incomplete. This could be due to a database schema issue (e.g., missing 'Projects.CustomerID'). Please check `database.py`.")
-        projects = []
-
-    expenses_rows = db.get_all_expenses()
-    expenses = db.rows_to_dicts(expenses_rows) if expenses_rows else []
-    services_rows = db.get_all_supplier_services()
-    services_count = len(services_rows) if services_rows else 0
-    invoices_rows = db.get_all_invoices()
-    invoices = db.rows_to_dicts(invoices_rows) if invoices_rows else []
-
-    col1, col2, col3, col4 = st.columns(4)
-    col1.metric("Total Customers", len(db.rows_to_dicts(customers)) if customers else 0)
-    col2.metric("Total Products", len(db.rows_to_dicts(products)) if products else 0)
-    col3.metric("Total Suppliers", len(db.rows_to_dicts(suppliers)) if suppliers else 0)
-    col4.metric("Total Materials", len(db.rows_to_dicts(materials)) if materials else 0)
-
-    col5, col6, col7, col8 = st.columns(4)
-    col5.metric("Total Projects", len(projects) if projects else 0)
-
-    total_revenue_from_invoices = sum(inv['TotalAmount'] for inv in invoices if inv.get('Status') == 'Paid' and inv.get('TotalAmount'))
-    col6.metric("Total Sales Revenue (from Paid Invoices)", f"Rs. {total_revenue_from_invoices:,.2f}")
-
-    total_expenses_val = sum(e['Amount'] for e in expenses if e.get('Amount'))
-    col7.metric("Total Expenses", f"Rs. {total_expenses_val:,.2f}")
-    col8.metric("Total Supplier Services Logged", services_count)
-
-    st.subheader("Recent Orders")
-    recent_orders_rows = db.get_all_orders(limit=5)
-    if recent_orders_rows:
-        st.dataframe(db.rows_to_dicts(recent_orders_rows), use_container_width=True)
-    else:
-        st.info("No orders yet.")
-
-    st.subheader("Recent Invoices")
-    if invoices:
-        recent_invoices_df = pd.DataFrame(invoices)
-        if not recent_invoices_df.empty:
-            recent_invoices_df['IssueDate'] = pd.to_datetime(recent_invoices_df['IssueDate'])
-            if 'PaymentDate' in recent_invoices_df.columns:
-                recent_invoices_df['PaymentDate_Display'] = pd.to_datetime(recent_invoices_df['PaymentDate'], errors='coerce').dt.strftime('%Y-%m-%d').fillna('N/A')
-            else:
-                recent_invoices_df['PaymentDate_Display'] = 'N/A'
-
-            recent_invoices_df = recent_invoices_df.sort_values(by='IssueDate', ascending=False).head(5)
-
-            cols_recent_inv_display = ['InvoiceReferenceID', 'CustomerName', 'ProjectName', 'TotalAmount', 'Status', 'IssueDate']
-            if 'PaymentDate_Display' in recent_invoices_df.columns:
-                cols_recent_inv_display.append('PaymentDate_Display')
-
-            final_cols_recent_inv = [col for col in cols_recent_inv_display if col in recent_invoices_df.columns]
-            st.dataframe(recent_invoices_df[final_cols_recent_inv], use_container_width=True, hide_index=True)
-        else:
-            st.info("No invoices yet.")
+        yield conn
+    except BaseException:
+        conn.execute("ROLLBACK")
+        _local.pending_invalidations = None
+        raise
     else:
-        st.info("No invoices yet.")
+        conn.execute("COMMIT")
+        tables, _local.pending_invalidations = _local.pending_invalidations, None
+        _bump_table_versions(tables)
+
+
+@contextmanager
+def read_transaction():
+    """Runs several reads against one consistent snapshot; inside a write transaction it joins that one."""
+    conn = get_connection()
+    if conn.in_transaction:
+        yield conn
+        return
+    conn.execute("BEGIN")
+    try:
+        yield conn
+    finally:
+        conn.execute("COMMIT")
 
-elif choice == "Customer Management":
-    st.header("👥 Customer Management")
 
-    if 'customer_management_action_view' not in st.session_state:
-        st.session_state.customer_management_action_view = "List"
+def _fetch_all(sql, params=()):
+    return get_connection().execute(sql, params).fetchall()
 
-    if st.session_state.customer_management_action_view == "List":
-        action = st.selectbox("Action", ["View All Customers", "Add New", "Edit Customer", "Delete Customer"], key="cust_action_selector")
 
-        if action == "View All Customers":
-            st.subheader("Existing Customers")
-            search_term_cust = st.text_input("Search Customers (by Name, Email, or Ref ID)", key="search_cust_view_all")
-            customers_list_rows = db.get_all_customers(search_term=search_term_cust)
+def _fetch_one(sql, params=()):
+    return get_connection().execute(sql, params).fetchone()
 
-            if customers_list_rows:
-                customers_dicts = db.rows_to_dicts(customers_list_rows)
-                if not customers_dicts:
-                    st.info("No customers found or added yet.")
-                else:
-                    df_customers = pd.DataFrame(customers_dicts)
-                    cols_to_show = ['CustomerID', 'CustomerName', 'Email', 'Phone', 'ReferenceID', 'BillingAddress', 'ShippingAddress', 'Notes']
-                    cols_to_show_filtered = [col for col in cols_to_show if col in df_customers.columns]
-
-                    st.dataframe(df_customers[cols_to_show_filtered],
-                                 use_container_width=True,
-                                 key="customer_df_main_list",
-                                 on_select="rerun",
-                                 selection_mode="single-row",
-                                 hide_index=True)
-
-                    dataframe_selection_state = st.session_state.get("customer_df_main_list", None)
-
-                    if dataframe_selection_state and dataframe_selection_state.selection.rows:
-                        selected_row_index = dataframe_selection_state.selection.rows[0]
-                        if not df_customers.empty and selected_row_index < len(df_customers):
-                            st.session_state.active_selection_for_button_cust_id = df_customers.iloc[selected_row_index]['CustomerID']
-                            st.session_state.active_selection_for_button_cust_name = df_customers.iloc[selected_row_index]['CustomerName']
-                        else:
-                            st.session_state.active_selection_for_button_cust_id = None
-                            st.session_state.active_selection_for_button_cust_name = None
-                    else:
-                        if not (dataframe_selection_state and dataframe_selection_state.selection.rows):
-                             st.session_state.active_selection_for_button_cust_id = None
-                             st.session_state.active_selection_for_button_cust_name = None
-
-                    if st.session_state.active_selection_for_button_cust_id is not None:
-                        cust_id_for_btn = st.session_state.active_selection_for_button_cust_id
-                        cust_name_for_btn = str(st.session_state.active_selection_for_button_cust_name) if st.session_state.active_selection_for_button_cust_name is not None else "N/A"
-
-                        if st.button(f"View Details for {cust_name_for_btn} (ID: {cust_id_for_btn})", key=f"view_detail_btn_for_{cust_id_for_btn}"):
-                            st.session_state.selected_customer_id_for_detail_view = cust_id_for_btn
-                            st.session_state.customer_management_action_view = "Details"
-                            st.session_state.active_selection_for_button_cust_id = None
-                            st.session_state.active_selection_for_button_cust_name = None
-                            st.rerun()
-            else:
-                st.info("No customers found or added yet.")
-        elif action == "Add New":
-            st.subheader("Add New Customer")
-            with st.form("add_customer_form", clear_on_submit=True):
-                name = st.text_input("Customer Name*")
-                email = st.text_input("Email")
-                phone = st.text_input("Phone")
-                reference_id = st.text_input("Reference ID (Optional, e.g., CUST-001)")
-                bill_addr = st.text_area("Billing Address")
-                ship_addr = st.text_area("Shipping Address (if different)")
-                notes = st.text_area("Notes")
-                submitted = st.form_submit_button("Add Customer")
-                if submitted:
-                    if not name: st.error("Customer Name is required.")
-                    else:
-                        try:
-                            db.add_customer(name, email, phone, reference_id, bill_addr, ship_addr or bill_addr, notes)
-                            st.success("Customer added successfully!")
-                        except Exception as e: st.error(f"Error: {e}")
-
-        elif action == "Edit Customer":
-            st.subheader("Edit Customer")
-            customers_list_edit_rows = db.get_all_customers()
-            if not customers_list_edit_rows:
-                st.info("No customers to edit.")
-            else:
-                customers_list_edit = db.rows_to_dicts(customers_list_edit_rows)
-                customer_options_edit = {f"{c['CustomerName']} (ID: {c['CustomerID']})": c['CustomerID'] for c in customers_list_edit}
-                selected_cust_disp_edit = st.selectbox("Select Customer to Edit", list(customer_options_edit.keys()), key="edit_cust_select_list_view", index=None, placeholder="Select a customer...")
-                if selected_cust_disp_edit:
-                    cust_id_to_edit = customer_options_edit[selected_cust_disp_edit]
-                    cust_data_edit_row = db.get_customer_by_id(cust_id_to_edit)
-
-                    if cust_data_edit_row:
-                        cust_data_edit = dict(cust_data_edit_row)
-
-                        if cust_data_edit:
-                            with st.form(f"edit_customer_form_list_view_{cust_id_to_edit}"):
-                                name = st.text_input("Customer Name*", value=cust_data_edit.get('CustomerName',''))
-                                email = st.text_input("Email", value=cust_data_edit.get('Email',''))
-                                phone = st.text_input("Phone", value=cust_data_edit.get('Phone',''))
-                                st.text_input("Reference ID (Current)", value=cust_data_edit.get('ReferenceID', 'N/A'), disabled=True)
-                                new_reference_id = st.text_input("Update Reference ID (Optional)", value=cust_data_edit.get('ReferenceID', ''))
-                                bill_addr = st.text_area("Billing Address", value=cust_data_edit.get('BillingAddress',''))
-                                ship_addr = st.text_area("Shipping Address", value=cust_data_edit.get('ShippingAddress',''))
-                                notes = st.text_area("Notes", value=cust_data_edit.get('Notes',''))
-                                updated = st.form_submit_button("Update Customer")
-                                if updated:
-                                    if not name: st.error("Customer name is required.")
-                                    else:
-                                        try:
-                                            db.update_customer(cust_id_to_edit, name, email, phone, new_reference_id, bill_addr, ship_addr, notes)
-                                            st.success("Customer updated successfully!")
-                                            st.rerun()
-                                        except Exception as e: st.error(f"Error: {e}")
-                        else:
-                            st.error("Failed to load customer data for editing.")
-                    else:
-                        st.error(f"Could not find customer with ID {cust_id_to_edit} to edit.")
-
-        elif action == "Delete Customer":
-            st.subheader("Delete Customer")
-            customers_list_del_rows = db.get_all_customers()
-            if not customers_list_del_rows:
-                st.info("No customers to delete.")
-            else:
-                customers_list_del = db.rows_to_dicts(customers_list_del_rows)
-                customer_options_del = {f"{c['CustomerName']} (ID: {c['CustomerID']})": c['CustomerID'] for c in customers_list_del}
-                selected_cust_disp_del = st.selectbox("Select Customer to Delete", list(customer_options_del.keys()), key="del_cust_select_list_view", index=None, placeholder="Select a customer...")
-                if selected_cust_disp_del:
-                    cust_id_to_del = customer_options_del[selected_cust_disp_del]
-                    st.warning(f"Are you sure you want to delete {selected_cust_disp_del}? This might fail if the customer has associated records (orders, projects, invoices).")
-                    if st.button("Confirm Delete", key=f"confirm_del_cust_list_view_{cust_id_to_del}"):
-                        try:
-                            db.delete_customer(cust_id_to_del)
-                            st.success(f"Customer {selected_cust_disp_del} deleted successfully!")
-                            st.session_state.selected_customer_id_for_detail_view = None
-                            st.session_state.active_selection_for_button_cust_id = None
-                            st.session_state.active_selection_for_button_cust_name = None
-                            st.rerun()
-                        except Exception as e:
-                            st.error(f"Error deleting customer: {e}")
-
-    elif st.session_state.customer_management_action_view == "Details":
-        if st.button("⬅️ Back to Customer List"):
-            st.session_state.customer_management_action_view = "List"
-            st.session_state.selected_customer_id_for_detail_view = None
-            st.rerun()
-
-        st.subheader("View Customer Details")
-        if st.session_state.selected_customer_id_for_detail_view:
-            cust_id = st.session_state.selected_customer_id_for_detail_view
-            customer_data_row = db.get_customer_by_id(cust_id)
-
-            if customer_data_row:
-                customer_data = dict(customer_data_row)
-
-                if customer_data:
-                    st.markdown(f"### Profile: {customer_data.get('CustomerName', 'N/A')}")
-                    col1, col2 = st.columns(2)
-                    with col1:
-                        st.text_input("Reference ID", customer_data.get('ReferenceID', 'N/A'), disabled=True, key=f"detail_ref_{cust_id}")
-                        st.text_input("Email", customer_data.get('Email', 'N/A'), disabled=True, key=f"detail_email_{cust_id}")
-                        st.text_input("Phone", customer_data.get('Phone', 'N/A'), disabled=True, key=f"detail_phone_{cust_id}")
-                    with col2:
-                        st.text_area("Billing Address", customer_data.get('BillingAddress', 'N/A'), disabled=True, height=100, key=f"detail_bill_{cust_id}")
-                        st.text_area("Shipping Address", customer_data.get('ShippingAddress', 'N/A'), disabled=True, height=100, key=f"detail_ship_{cust_id}")
-                    st.text_area("Notes", customer_data.get('Notes', 'N/A'), disabled=True, height=100, key=f"detail_notes_{cust_id}")
-
-                    st.markdown("---")
-                    st.markdown("### Order History")
-                    customer_orders_rows = db.get_orders_by_customer_id(cust_id)
-                    customer_orders = db.rows_to_dicts(customer_orders_rows) if customer_orders_rows else []
-                    if customer_orders:
-                        orders_df = pd.DataFrame(customer_orders)
-                        orders_df['TotalAmount_Display'] = orders_df['TotalAmount'].apply(lambda x: f"Rs. {x:,.2f}" if pd.notnull(x) else "Rs. 0.00")
-                        cols_orders = ['OrderID', 'OrderDate', 'ProjectName', 'ReferenceID', 'OrderStatus', 'TotalAmount_Display', 'PaymentStatus']
-                        cols_orders_filtered = [col for col in cols_orders if col in orders_df.columns]
-                        st.dataframe(orders_df[cols_orders_filtered], use_container_width=True, hide_index=True)
-                    else:
-                        st.info("No orders found for this customer.")
-
-                    st.markdown("---")
-                    st.markdown("### Invoice History")
-                    customer_invoices_rows = db.get_invoices_by_customer_id(cust_id)
-                    customer_invoices = db.rows_to_dicts(customer_invoices_rows) if customer_invoices_rows else []
-                    total_invoiced_amount = 0
-                    if customer_invoices:
-                        invoices_df = pd.DataFrame(customer_invoices)
-                        invoices_df['TotalAmount_Display'] = invoices_df['TotalAmount'].apply(lambda x: f"Rs. {x:,.2f}" if pd.notnull(x) else "Rs. 0.00")
-                        invoices_df['IssueDate_Display'] = pd.to_datetime(invoices_df['IssueDate'], errors='coerce').dt.strftime('%Y-%m-%d').fillna('N/A')
-
-                        if 'PaymentDate' in invoices_df.columns:
-                            invoices_df['PaymentDate_Display'] = pd.to_datetime(invoices_df['PaymentDate'], errors='coerce').dt.strftime('%Y-%m-%d').fillna('N/A')
-                        else:
-                            invoices_df['PaymentDate_Display'] = 'N/A'
-
-                        cols_invoices = ['InvoiceReferenceID', 'ProjectName', 'TotalAmount_Display', 'Status', 'IssueDate_Display', 'PaymentDate_Display']
-                        cols_invoices_filtered = [col for col in cols_invoices if col in invoices_df.columns]
-                        st.dataframe(invoices_df[cols_invoices_filtered], use_container_width=True, hide_index=True)
-
-                        if 'TotalAmount' in invoices_df.columns and 'Status' in invoices_df.columns:
-                            paid_invoices_sum = invoices_df.loc[invoices_df['Status'] == 'Paid', 'TotalAmount'].sum()
-                            total_invoiced_amount = paid_invoices_sum if pd.notnull(paid_invoices_sum) else 0.0
-                        st.metric("Total Amount from Paid Invoices for this Customer", f"Rs. {total_invoiced_amount:,.2f}")
-                    else:
-                        st.info("No invoices found for this customer.")
-
-                    st.markdown("---")
-                    st.markdown("### Associated Projects")
-                    customer_projects_rows = db.get_projects_by_customer_id(cust_id)
-                    customer_projects = db.rows_to_dicts(customer_projects_rows) if customer_projects_rows else []
-                    if customer_projects:
-                        projects_df = pd.DataFrame(customer_projects)
-                        projects_df['Budget_Display'] = projects_df['Budget'].apply(lambda x: f"Rs. {x:,.2f}" if pd.notnull(x) else "Rs. 0.00")
-                        cols_projects = ['ProjectID', 'ProjectName', 'Status', 'StartDate', 'EndDate', 'Budget_Display']
-                        cols_projects_filtered = [col for col in cols_projects if col in projects_df.columns]
-                        st.dataframe(projects_df[cols_projects_filtered], use_container_width=True, hide_index=True)
-                    else:
-                        st.info("No projects associated with this customer.")
-                else:
-                    st.warning("Could not process customer data. The customer may have been deleted or data is malformed.")
-                    st.session_state.customer_management_action_view = "List"
-                    st.session_state.selected_customer_id_for_detail_view = None
-                    st.rerun()
-            else:
-                st.warning("Could not fetch customer data (customer might be deleted).")
-                st.session_state.customer_management_action_view = "List"
-                st.session_state.selected_customer_id_for_detail_view = None
-                st.rerun()
-        else:
-            st.info("No customer selected for details. Please select one from the list.")
-            st.session_state.customer_management_action_view = "List"
-            st.rerun()
-
-elif choice == "Supplier Management":
-    st.header("🚚 Supplier Management")
-    action_sup = st.selectbox("Action", ["View All", "Add New", "Edit Supplier", "Delete Supplier"], key="sup_action")
-
-    if action_sup == "View All":
-        st.subheader("Existing Suppliers")
-        search_term_sup = st.text_input("Search Suppliers (Name, Contact, Email)", key="search_sup_view")
-        suppliers_list_rows = db.get_all_suppliers(search_term=search_term_sup)
-        if suppliers_list_rows:
-            st.dataframe(db.rows_to_dicts(suppliers_list_rows), use_container_width=True, hide_index=True)
-        else:
-            st.info("No suppliers found.")
-
-    elif action_sup == "Add New":
-        st.subheader("Add New Supplier")
-        with st.form("add_supplier_form", clear_on_submit=True):
-            s_name = st.text_input("Supplier Name*")
-            s_contact = st.text_input("Contact Person")
-            s_email = st.text_input("Email")
-            s_phone = st.text_input("Phone")
-            s_address = st.text_area("Address")
-            submitted = st.form_submit_button("Add Supplier")
-            if submitted:
-                if not s_name: st.error("Supplier Name is required.")
-                else:
-                    try:
-                        db.add_supplier(s_name, s_contact, s_email, s_phone, s_address)
-                        st.success("Supplier added!")
-                    except Exception as e: st.error(f"Error: {e}")
-
-    elif action_sup == "Edit Supplier":
-        st.subheader("Edit Supplier")
-        suppliers_list_edit_rows = db.get_all_suppliers()
-        if not suppliers_list_edit_rows:
-            st.info("No suppliers to edit.")
-        else:
-            suppliers_list_edit = db.rows_to_dicts(suppliers_list_edit_rows)
-            supplier_options = {f"{s['SupplierName']} (ID: {s['SupplierID']})": s['SupplierID'] for s in suppliers_list_edit}
-            selected_sup_disp = st.selectbox("Select Supplier", list(supplier_options.keys()), key="edit_sup_select", index=None, placeholder="Select a supplier...")
-            if selected_sup_disp:
-                sup_id_to_edit = supplier_options[selected_sup_disp]
-                sup_data_row = db.get_supplier_by_id(sup_id_to_edit)
-                sup_data = dict(sup_data_row) if sup_data_row else None
-                if sup_data:
-                    with st.form(f"edit_supplier_form_{sup_id_to_edit}"):
-                        st.write(f"Editing Supplier ID: {sup_data['SupplierID']}")
-                        s_name = st.text_input("Supplier Name*", value=sup_data.get('SupplierName',''))
-                        s_contact = st.text_input("Contact Person", value=sup_data.get('ContactPerson',''))
-                        s_email = st.text_input("Email", value=sup_data.get('Email',''))
-                        s_phone = st.text_input("Phone", value=sup_data.get('Phone',''))
-                        s_address = st.text_area("Address", value=sup_data.get('Address',''))
-                        updated = st.form_submit_button("Update Supplier")
-                        if updated:
-                            if not s_name: st.error("Supplier Name is required.")
-                            else:
-                                try:
-                                    db.update_supplier(sup_id_to_edit, s_name, s_contact, s_email, s_phone, s_address)
-                                    st.success("Supplier updated!")
-                                    st.rerun()
-                                except Exception as e: st.error(f"Error: {e}")
-                else:
-                    st.error(f"Could not load data for supplier ID {sup_id_to_edit}")
 
-    elif action_sup == "Delete Supplier":
-        st.subheader("Delete Supplier")
-        suppliers_list_del_rows = db.get_all_suppliers()
-        if not suppliers_list_del_rows: st.info("No suppliers to delete.")
-        else:
-            suppliers_list_del = db.rows_to_dicts(suppliers_list_del_rows)
-            supplier_options_del = {f"{s['SupplierName']} (ID: {s['SupplierID']})": s['SupplierID'] for s in suppliers_list_del}
-            selected_sup_disp_del = st.selectbox("Select Supplier to Delete", list(supplier_options_del.keys()), key="del_sup_select", index=None, placeholder="Select a supplier...")
-            if selected_sup_disp_del:
-                sup_id_to_del = supplier_options_del[selected_sup_disp_del]
-                st.warning(f"Are you sure you want to delete {selected_sup_disp_del}? This may affect product/material/service records by setting their supplier to 'None'.")
-                if st.button("Confirm Delete", key=f"confirm_del_sup_{sup_id_to_del}"):
-                    try:
-                        db.delete_supplier(sup_id_to_del)
-                        st.success(f"Supplier {selected_sup_disp_del} deleted!")
-                        st.rerun()
-                    except Exception as e: st.error(f"Error deleting supplier: {e}")
-
-elif choice == "Supplier Services":
-    st.header("🛠️ Supplier Services Management")
-    action_ss = st.selectbox("Action", ["View All Services", "Add New Service", "Edit Service", "Delete Service"], key="ss_action")
-
-    all_suppliers_ss_rows = db.get_all_suppliers()
-    all_suppliers_ss = db.rows_to_dicts(all_suppliers_ss_rows) if all_suppliers_ss_rows else []
-    supplier_map_ss = {"Select Supplier*": None}
-    supplier_map_ss.update({f"{s['SupplierName']} (ID: {s['SupplierID']})": s['SupplierID'] for s in all_suppliers_ss})
-
-    all_projects_ss_rows = db.get_all_projects()
-    all_projects_ss = db.rows_to_dicts(all_projects_ss_rows) if all_projects_ss_rows else []
-    project_map_ss = {"None (General Service)": None}
-    project_map_ss.update({f"{p['ProjectName']} (ID: {p['ProjectID']})": p['ProjectID'] for p in all_projects_ss})
-
-    service_type_options = ["Paint Work", "Wood Cutting", "Polishing", "Stitching", "Assembly", "Transportation", "Consultation", "Other"]
-
-    if action_ss == "View All Services":
-        st.subheader("Recorded Supplier Services")
-        search_term_ss = st.text_input("Search Services (Name, Type, Supplier, Project, Desc.)", key="search_ss_view")
-        services_list_rows = db.get_all_supplier_services(search_term=search_term_ss)
-        services_list = db.rows_to_dicts(services_list_rows) if services_list_rows else []
-        if services_list:
-            df_services = pd.DataFrame(services_list)
-            if 'Cost' in df_services.columns:
-                 df_services['Cost_Display'] = df_services['Cost'].apply(lambda x: f"Rs. {x:,.2f}")
-
-            cols_to_show = ['ServiceID', 'ServiceName', 'ServiceType', 'SupplierName', 'ProjectName',
-                            'ServiceDate', 'Cost_Display', 'Description', 'IsExpenseLogged']
-            cols_to_show_filtered = [col for col in cols_to_show if col in df_services.columns]
-            st.dataframe(df_services[cols_to_show_filtered], use_container_width=True, hide_index=True)
-
-            for service_row_dict in services_list:
-                if service_row_dict.get('ReceiptPath') and os.path.exists(service_row_dict['ReceiptPath']):
-                    with st.expander(f"View Receipt for Service ID: {service_row_dict['ServiceID']}"):
-                        try:
-                            if service_row_dict['ReceiptPath'].lower().endswith(('.png', '.jpg', '.jpeg')):
-                                receipt_image = Image.open(service_row_dict['ReceiptPath'])
-                                st.image(receipt_image, caption=f"Receipt for {service_row_dict['ServiceName']}", width=300)
-                            else:
-                                with open(service_row_dict['ReceiptPath'], "rb") as fp:
-                                    st.download_button(
-                                        label=f"Download Receipt ({os.path.basename(service_row_dict['ReceiptPath'])})",
-                                        data=fp,
-                                        file_name=os.path.basename(service_row_dict['ReceiptPath']),
-                                        mime="application/octet-stream"
-                                    )
-                        except Exception as e:
-                            st.warning(f"Could not load/display receipt: {e}")
-        else:
-            st.info("No supplier services recorded yet.")
-
-    elif action_ss == "Add New Service":
-        st.subheader("Add New Supplier Service")
-        with st.form("add_supplier_service_form", clear_on_submit=True):
-            selected_supplier_name_ss = st.selectbox("Supplier*", list(supplier_map_ss.keys()), key="add_ss_supplier", index=0)
-            ss_supplier_id = supplier_map_ss.get(selected_supplier_name_ss)
-
-            selected_project_name_ss = st.selectbox("Associated Project (Optional)", list(project_map_ss.keys()), key="add_ss_project", index=0)
-            ss_project_id = project_map_ss.get(selected_project_name_ss)
-
-            ss_service_name = st.text_input("Service Name/Title*", help="e.g., Custom painting for chair X, Polishing dining table set")
-            ss_service_type_selected = st.selectbox("Service Type*", service_type_options, key="add_ss_type")
-            ss_service_type_final = ss_service_type_selected
-            if ss_service_type_selected == "Other":
-                ss_service_type_other = st.text_input("Specify Other Service Type", key="add_ss_type_other")
-                if ss_service_type_other.strip(): ss_service_type_final = ss_service_type_other.strip()
-
-            ss_service_date = st.date_input("Service Date*", datetime.now().date())
-            ss_cost = st.number_input("Service Cost (Rs.)*", min_value=0.0, format="%.2f")
-            ss_receipt_upload = st.file_uploader("Upload Receipt (Optional)", type=['png', 'jpg', 'jpeg', 'pdf'])
-            ss_description = st.text_area("Description/Notes")
-
-            submitted = st.form_submit_button("Add Service")
-            if submitted:
-                if not ss_supplier_id or not ss_service_name or not ss_service_type_final or ss_cost < 0:
-                    st.error("Supplier, Service Name, Service Type, and a valid Cost are required.")
-                else:
-                    try:
-                        new_service_id, expense_auto_logged = db.add_supplier_service(
-                            ss_supplier_id, ss_project_id, ss_service_name, ss_service_type_final,
-                            ss_service_date.strftime("%Y-%m-%d"), ss_cost,
-                            None,
-                            ss_description
-                        )
-
-                        if new_service_id and ss_receipt_upload:
-                            receipt_file_path = save_uploaded_receipt(ss_receipt_upload, new_service_id)
-                            if receipt_file_path:
-                                db.update_supplier_service_receipt_path(new_service_id, receipt_file_path)
-                                st.success(f"Service (ID: {new_service_id}) added with receipt!")
-                            else:
-                                st.warning(f"Service (ID: {new_service_id}) added, but receipt upload failed.")
-                        elif new_service_id:
-                             st.success(f"Service (ID: {new_service_id}) added!")
-
-                        if expense_auto_logged:
-                            st.info("This service cost has been automatically logged as an expense.")
-                        elif new_service_id and ss_cost > 0:
-                            st.warning("Service added. If an expense was expected to be auto-logged, please verify in Expense Tracking.")
-
-                    except Exception as e:
-                        st.error(f"Error adding service: {e}")
-
-    elif action_ss == "Edit Service":
-        st.subheader("Edit Supplier Service")
-        services_list_edit_rows = db.get_all_supplier_services()
-        services_list_edit = db.rows_to_dicts(services_list_edit_rows) if services_list_edit_rows else []
-        if not services_list_edit: st.info("No services to edit.")
-        else:
-            service_options = {f"{s['ServiceName']} by {s.get('SupplierName', 'N/A')} (ID: {s['ServiceID']})": s['ServiceID'] for s in services_list_edit}
-            selected_service_disp = st.selectbox("Select Service to Edit", list(service_options.keys()), key="edit_ss_select", index=None, placeholder="Select a service...")
-
-            if selected_service_disp:
-                service_id_to_edit = service_options[selected_service_disp]
-                service_data_row = db.get_supplier_service_by_id(service_id_to_edit)
-                service_data = dict(service_data_row) if service_data_row else None
-
-                if service_data:
-                    with st.form(f"edit_supplier_service_form_{service_id_to_edit}"):
-                        st.write(f"Editing Service ID: {service_data['ServiceID']}")
-
-                        current_supplier_id_ss = service_data['SupplierID']
-                        supplier_keys_list = list(supplier_map_ss.keys())
-                        try:
-                            supplier_index = supplier_keys_list.index(next(k for k,v in supplier_map_ss.items() if v == current_supplier_id_ss))
-                        except (StopIteration, ValueError): supplier_index = 0
-                        selected_supplier_name_ss_edit = st.selectbox("Supplier*", supplier_keys_list, index=supplier_index, key=f"edit_ss_supplier_{service_id_to_edit}")
-                        ss_supplier_id_edit = supplier_map_ss.get(selected_supplier_name_ss_edit)
-
-                        current_project_id_ss = service_data.get('ProjectID')
-                        project_keys_list = list(project_map_ss.keys())
-                        try:
-                            project_index = project_keys_list.index(next(k for k,v in project_map_ss.items() if v == current_project_id_ss))
-                        except (StopIteration, ValueError): project_index = 0
-                        selected_project_name_ss_edit = st.selectbox("Associated Project (Optional)", project_keys_list, index=project_index, key=f"edit_ss_project_{service_id_to_edit}")
-                        ss_project_id_edit = project_map_ss.get(selected_project_name_ss_edit)
-
-                        ss_service_name_edit = st.text_input("Service Name/Title*", value=service_data.get('ServiceName',''))
-
-                        current_service_type_edit_val = service_data.get('ServiceType','')
-                        ss_service_type_form_val = current_service_type_edit_val if current_service_type_edit_val in service_type_options else "Other"
-
-                        try:
-                            ss_service_type_form_index = service_type_options.index(ss_service_type_form_val)
-                        except ValueError:
-                            ss_service_type_form_index = service_type_options.index("Other")
-
-                        ss_service_type_selected_edit = st.selectbox("Service Type*", service_type_options, index=ss_service_type_form_index, key=f"edit_ss_type_sel_{service_id_to_edit}")
-
-                        ss_service_type_other_val_edit = current_service_type_edit_val if ss_service_type_form_val == "Other" and current_service_type_edit_val not in service_type_options else ""
-                        ss_service_type_other_input_edit = st.text_input("Specify Other Service Type", value=ss_service_type_other_val_edit, key=f"edit_ss_type_other_input_{service_id_to_edit}")
-
-                        ss_service_type_final_edit = ss_service_type_selected_edit
-                        if ss_service_type_selected_edit == "Other" and ss_service_type_other_input_edit.strip():
-                             ss_service_type_final_edit = ss_service_type_other_input_edit.strip()
-
-                        ss_service_date_val = datetime.strptime(service_data['ServiceDate'], "%Y-%m-%d").date() if service_data.get('ServiceDate') else datetime.now().date()
-                        ss_service_date_edit = st.date_input("Service Date*", value=ss_service_date_val)
-                        ss_cost_edit = st.number_input("Service Cost (Rs.)*", value=float(service_data.get('Cost', 0.0)), min_value=0.0, format="%.2f")
-                        ss_is_expense_logged_edit = bool(service_data.get('IsExpenseLogged', False))
-
-                        st.write("Current Receipt:")
-                        current_receipt_path = service_data.get('ReceiptPath')
-                        if current_receipt_path and os.path.exists(current_receipt_path):
-                            if current_receipt_path.lower().endswith(('.png','.jpg','.jpeg')):
-                                st.image(Image.open(current_receipt_path), width=150)
-                            else:
-                                st.download_button(label=f"Download Current Receipt", data=open(current_receipt_path, "rb").read(), file_name=os.path.basename(current_receipt_path), mime="application/octet-stream", key=f"dl_btn_{service_id_to_edit}" )
-                        else: st.text("No receipt on file.")
-
-                        ss_new_receipt_upload = st.file_uploader("Upload New Receipt (Optional - replaces old)", type=['png', 'jpg', 'jpeg', 'pdf'], key=f"edit_ss_receipt_{service_id_to_edit}")
-                        ss_description_edit = st.text_area("Description/Notes", value=service_data.get('Description', ''))
-
-                        updated = st.form_submit_button("Update Service")
-                        if updated:
-                            if not ss_supplier_id_edit or not ss_service_name_edit or not ss_service_type_final_edit or ss_cost_edit < 0:
-                                st.error("Supplier, Name, Type, Cost are required.")
-                            else:
-                                receipt_path_to_save = current_receipt_path
-                                if ss_new_receipt_upload:
-                                    if current_receipt_path and os.path.exists(current_receipt_path):
-                                        try: os.remove(current_receipt_path)
-                                        except Exception as e_del: st.warning(f"Could not remove old receipt {current_receipt_path}: {e_del}")
-                                    receipt_path_to_save = save_uploaded_receipt(ss_new_receipt_upload, service_id_to_edit)
-
-                                try:
-                                    db.update_supplier_service(
-                                        service_id_to_edit, ss_supplier_id_edit, ss_project_id_edit, ss_service_name_edit,
-                                        ss_service_type_final_edit, ss_service_date_edit.strftime("%Y-%m-%d"), ss_cost_edit,
-                                        receipt_path_to_save, ss_description_edit, ss_is_expense_logged_edit
-                                    )
-                                    st.success("Service updated! Note: If cost or critical details changed, associated expense may need manual review/adjustment if it was auto-logged.")
-                                    st.rerun()
-                                except Exception as e: st.error(f"Error updating service: {e}")
-                else:
-                    st.error(f"Could not load data for service ID {service_id_to_edit}")
+def _fetch_value(sql, params=(), default=None):
+    row = get_connection().execute(sql, params).fetchone()
+    if row is None or row[0] is None:
+        return default
+    return row[0]
 
-    elif action_ss == "Delete Service":
-        st.subheader("Delete Supplier Service")
-        services_list_del_rows = db.get_all_supplier_services()
-        services_list_del = db.rows_to_dicts(services_list_del_rows) if services_list_del_rows else []
-        if not services_list_del: st.info("No services to delete.")
-        else:
-            service_options_del = {f"{s['ServiceName']} by {s.get('SupplierName','N/A')} (ID: {s['ServiceID']})": s['ServiceID'] for s in services_list_del}
-            selected_service_disp_del = st.selectbox("Select Service to Delete", list(service_options_del.keys()), key="del_ss_select", index=None, placeholder="Select a service...")
-            if selected_service_disp_del:
-                service_id_to_del = service_options_del[selected_service_disp_del]
-                st.warning(f"Are you sure you want to delete this service (ID: {service_id_to_del})? This will also delete its receipt file. The auto-logged expense will NOT be automatically deleted and may require manual action.")
-                if st.button("Confirm Delete", key=f"confirm_del_ss_{service_id_to_del}"):
-                    try:
-                        db.delete_supplier_service(service_id_to_del)
-                        st.success("Service deleted successfully!")
-                        st.rerun()
-                    except Exception as e: st.error(f"Error deleting service: {e}")
-
-elif choice == "Material Management":
-    st.header("🧱 Material Management")
-    action_mat = st.selectbox("Action", ["View All", "Add New", "Edit Material", "Delete Material"], key="mat_action")
-
-    suppliers_for_mat_rows = db.get_all_suppliers()
-    suppliers_for_mat = db.rows_to_dicts(suppliers_for_mat_rows) if suppliers_for_mat_rows else []
-    supplier_map_mat = {"None (No Supplier)": None}
-    supplier_map_mat.update({f"{s['SupplierName']} (ID: {s['SupplierID']})": s['SupplierID'] for s in suppliers_for_mat})
-
-    if action_mat == "View All":
-        st.subheader("Existing Materials")
-        search_term_mat = st.text_input("Search Materials (Name, Category, Supplier)", key="search_mat_view")
-        materials_list_rows = db.get_all_materials(search_term=search_term_mat)
-        if materials_list_rows:
-            df_materials = pd.DataFrame(db.rows_to_dicts(materials_list_rows))
-            cols_to_show_mat = [col for col in df_materials.columns if col != 'SupplierID']
-            st.dataframe(df_materials[cols_to_show_mat], use_container_width=True, hide_index=True)
-        else:
-            st.info("No materials found.")
-
-    elif action_mat == "Add New":
-        st.subheader("Add New Material")
-        with st.form("add_material_form_page", clear_on_submit=True):
-            m_name = st.text_input("Material Name*")
-            m_category = st.text_input("Category (e.g., Wood, Fabric, Finishing)")
-            m_subtype = st.text_input("Sub-Type (e.g., Oak, Velvet, Varnish) (Optional)")
-            m_unit = st.text_input("Unit of Measure (e.g., m, kg, piece)")
-            m_cost_unit = st.number_input("Cost Per Unit (Rs.)", min_value=0.0, format="%.2f")
-            m_qty = st.number_input("Quantity In Stock", format="%.2f", min_value=0.0)
-            selected_sup_name_mat = st.selectbox("Primary Supplier (Optional)", list(supplier_map_mat.keys()), key="add_mat_supplier_page", index=0)
-            m_supplier_id = supplier_map_mat.get(selected_sup_name_mat)
-            submitted = st.form_submit_button("Add Material")
-            if submitted:
-                if not m_name: st.error("Material Name required.")
-                else:
-                    try:
-                        db.add_material(m_name, m_category, m_subtype, m_unit, m_cost_unit, m_qty, m_supplier_id)
-                        st.success("Material added!")
-                    except Exception as e: st.error(f"Error: {e}")
-
-    elif action_mat == "Edit Material":
-        st.subheader("Edit Material")
-        materials_list_edit_rows = db.get_all_materials()
-        if not materials_list_edit_rows:
-            st.info("No materials to edit.")
-        else:
-            materials_list_edit = db.rows_to_dicts(materials_list_edit_rows)
-            material_options = {f"{m['MaterialName']} (ID: {m['MaterialID']})": m['MaterialID'] for m in materials_list_edit}
-            selected_mat_disp = st.selectbox("Select Material", list(material_options.keys()), key="edit_mat_select_page", index=None, placeholder="Select a material...")
-            if selected_mat_disp:
-                mat_id_to_edit = material_options[selected_mat_disp]
-                mat_data_row = db.get_material_by_id(mat_id_to_edit)
-                mat_data = dict(mat_data_row) if mat_data_row else None
-                if mat_data:
-                    with st.form(f"edit_material_form_page_{mat_id_to_edit}"):
-                        m_name = st.text_input("Material Name*", value=mat_data.get('MaterialName',''))
-                        m_category = st.text_input("Category", value=mat_data.get('Category',''))
-                        m_subtype = st.text_input("Sub-Type", value=mat_data.get('SubType',''))
-                        m_unit = st.text_input("Unit of Measure", value=mat_data.get('UnitOfMeasure',''))
-                        m_cost_unit = st.number_input("Cost Per Unit (Rs.)", value=float(mat_data.get('CostPerUnit',0.0)), min_value=0.0, format="%.2f")
-                        m_qty = st.number_input("Quantity In Stock", value=float(mat_data.get('QuantityInStock',0.0)), format="%.2f", min_value=0.0)
-                        current_supplier_id = mat_data.get('SupplierID')
-                        material_supplier_keys_list = list(supplier_map_mat.keys())
-                        try:
-                            mat_supplier_index = material_supplier_keys_list.index(next(k for k,v in supplier_map_mat.items() if v == current_supplier_id))
-                        except (StopIteration, ValueError):
-                            mat_supplier_index = 0
-                        selected_sup_name_mat_edit = st.selectbox("Primary Supplier (Optional)", material_supplier_keys_list, index=mat_supplier_index, key="edit_mat_supplier_page")
-                        m_supplier_id_edit = supplier_map_mat.get(selected_sup_name_mat_edit)
-                        updated = st.form_submit_button("Update Material")
-                        if updated:
-                            if not m_name: st.error("Material Name required.")
-                            else:
-                                try:
-                                    db.update_material(mat_id_to_edit, m_name, m_category, m_subtype, m_unit, m_cost_unit, m_qty, m_supplier_id_edit)
-                                    st.success("Material updated!")
-                                    st.rerun()
-                                except Exception as e: st.error(f"Error: {e}")
-                else:
-                    st.error(f"Could not load data for material ID {mat_id_to_edit}")
 
-    elif action_mat == "Delete Material":
-        st.subheader("Delete Material")
-        materials_list_del_rows = db.get_all_materials()
-        if not materials_list_del_rows:
-            st.info("No materials to delete.")
-        else:
-            materials_list_del = db.rows_to_dicts(materials_list_del_rows)
-            material_options_del = {f"{m['MaterialName']} (ID: {m['MaterialID']})": m['MaterialID'] for m in materials_list_del}
-            selected_mat_disp_del = st.selectbox("Select Material to Delete", list(material_options_del.keys()), key="del_mat_select_page", index=None, placeholder="Select a material...")
-            if selected_mat_disp_del:
-                mat_id_to_del = material_options_del[selected_mat_disp_del]
-                st.warning(f"Are you sure you want to delete {selected_mat_disp_del}? This material might be used in existing project records (ProjectMaterials table), potentially causing issues or breaking links if not handled by DB constraints (e.g., ON DELETE SET NULL).")
-                if st.button("Confirm Delete", key=f"confirm_del_mat_page_{mat_id_to_del}"):
-                    try:
-                        db.delete_material(mat_id_to_del)
-                        st.success(f"Material {selected_mat_disp_del} deleted!")
-                        st.rerun()
-                    except Exception as e: st.error(f"Error deleting material: {e}. Check if it's linked in projects.")
-
-elif choice == "Product Management":
-    st.header("📦 Product Management (Inventory)")
-    action_prod = st.selectbox("Action", ["View All", "Add New", "Edit Product", "Delete Product"], key="prod_action_key_main")
-
-    suppliers_for_prod_rows = db.get_all_suppliers()
-    suppliers_for_prod = db.rows_to_dicts(suppliers_for_prod_rows) if suppliers_for_prod_rows else []
-    supplier_map_prod = {"None (No Supplier)": None}
-    supplier_map_prod.update({f"{s['SupplierName']} (ID: {s['SupplierID']})": s['SupplierID'] for s in suppliers_for_prod})
-
-    if action_prod == "View All":
-        st.subheader("Existing Products")
-        search_term_prod = st.text_input("Search Products (Name, SKU, Category, Supplier)", key="search_prod_view_main")
-        products_list_rows = db.get_all_products(search_term=search_term_prod)
-        if products_list_rows:
-            products_list = db.rows_to_dicts(products_list_rows)
-            df_products = pd.DataFrame(products_list)
-
-            final_cols_prod_view = []
-            default_prod_cols = ['ProductID', 'ProductName', 'SKU', 'Category', 'SellingPrice', 'QuantityInStock', 'SupplierName', 'Description', 'MaterialType', 'Dimensions', 'CostPrice', 'ReorderLevel']
-            for col in default_prod_cols:
-                if col in df_products.columns:
-                    final_cols_prod_view.append(col)
-            for col in df_products.columns:
-                if col not in final_cols_prod_view and col not in ['ImagePath', 'SupplierID']:
-                     final_cols_prod_view.append(col)
-
-            st.dataframe(df_products[final_cols_prod_view], use_container_width=True, hide_index=True)
-
-            for prod_row_dict_main in products_list:
-                if prod_row_dict_main.get('ImagePath') and os.path.exists(prod_row_dict_main['ImagePath']):
-                    with st.expander(f"{prod_row_dict_main['ProductName']} - Image"):
-                        try:
-                            st.image(Image.open(prod_row_dict_main['ImagePath']), caption=prod_row_dict_main['ProductName'], width=200)
-                        except Exception as e_img:
-                            st.warning(f"Could not load image for {prod_row_dict_main['ProductName']}: {e_img}")
-        else:
-            st.info("No products found.")
-
-    elif action_prod == "Add New":
-        st.subheader("Add New Product")
-        with st.form("add_product_form_main", clear_on_submit=False):
-            p_name = st.text_input("Product Name*")
-            p_sku = st.text_input("SKU (Unique)")
-            p_desc = st.text_area("Description")
-            p_cat = st.text_input("Category (e.g., Sofa, Table)")
-            p_mat_type_prod = st.text_input("Primary Material Type (e.g., Wood, Fabric)")
-            p_dims = st.text_input("Dimensions (L x W x H)")
-            p_cost = st.number_input("Cost Price (Rs.)", min_value=0.0, format="%.2f")
-            p_sell = st.number_input("Selling Price (Rs.)", min_value=0.0, format="%.2f")
-            p_qty = st.number_input("Quantity In Stock", min_value=0, step=1)
-            p_reorder = st.number_input("Reorder Level", min_value=0, step=1)
-            selected_sup_name_prod_add = st.selectbox("Supplier (if applicable)", list(supplier_map_prod.keys()), key="add_prod_supplier_main", index=0)
-            p_supplier_id_add = supplier_map_prod.get(selected_sup_name_prod_add)
-            p_uploaded_image_add = st.file_uploader("Product Image", type=["png", "jpg", "jpeg"], key="add_prod_img_main")
-            submitted_add_prod = st.form_submit_button("Add Product")
-            if submitted_add_prod:
-                if not p_name or not p_sku:
-                    st.error("Product Name and SKU required.")
-                else:
-                    p_image_path_add = None
-                    if p_uploaded_image_add:
-                        p_image_path_add = save_uploaded_product_image(p_uploaded_image_add, p_sku)
-                    try:
-                        db.add_product(p_name, p_sku, p_desc, p_cat, p_mat_type_prod, p_dims, p_cost, p_sell, p_qty, p_reorder, p_supplier_id_add, p_image_path_add)
-                        st.success(f"Product '{p_name}' added!")
-                        st.rerun()
-                    except Exception as e_add_prod:
-                        st.error(f"Error adding product: {e_add_prod}")
-                        if p_image_path_add and os.path.exists(p_image_path_add):
-                            try: os.remove(p_image_path_add)
-                            except OSError as e_os_remove: st.warning(f"Failed to remove uploaded image after error: {e_os_remove}")
-
-    elif action_prod == "Edit Product":
-        st.subheader("Edit Product")
-        products_list_edit_rows = db.get_all_products()
-        if not products_list_edit_rows:
-            st.info("No products to edit.")
-        else:
-            products_list_edit_main = db.rows_to_dicts(products_list_edit_rows)
-            product_options_edit_main = {f"{p['ProductName']} (SKU: {p.get('SKU','N/A')}, ID: {p['ProductID']})": p['ProductID'] for p in products_list_edit_main}
-            selected_prod_disp_edit_main = st.selectbox("Select Product to Edit", list(product_options_edit_main.keys()), key="edit_prod_select_key_main_page", index=None, placeholder="Select a product...")
-            if selected_prod_disp_edit_main:
-                prod_id_to_edit_main = product_options_edit_main[selected_prod_disp_edit_main]
-                prod_data_row = db.get_product_by_id(prod_id_to_edit_main)
-                prod_data_edit_main = dict(prod_data_row) if prod_data_row else None
-
-                if prod_data_edit_main:
-                    with st.form(f"edit_product_form_main_page_{prod_id_to_edit_main}"):
-                        p_name_edit = st.text_input("Product Name*", value=prod_data_edit_main.get('ProductName',''))
-                        p_sku_edit = st.text_input("SKU (Unique)", value=prod_data_edit_main.get('SKU',''), help="Changing SKU might affect image linkage if SKU is part of filename.")
-                        p_desc_edit = st.text_area("Description", value=prod_data_edit_main.get('Description',''))
-                        p_cat_edit = st.text_input("Category", value=prod_data_edit_main.get('Category',''))
-                        p_mat_type_prod_edit = st.text_input("Primary Material Type", value=prod_data_edit_main.get('MaterialType',''))
-                        p_dims_edit = st.text_input("Dimensions", value=prod_data_edit_main.get('Dimensions',''))
-                        p_cost_edit = st.number_input("Cost Price (Rs.)", value=float(prod_data_edit_main.get('CostPrice',0.0)), min_value=0.0, format="%.2f")
-                        p_sell_edit = st.number_input("Selling Price (Rs.)", value=float(prod_data_edit_main.get('SellingPrice',0.0)), min_value=0.0, format="%.2f")
-                        p_qty_edit = st.number_input("Quantity In Stock", value=int(prod_data_edit_main.get('QuantityInStock',0)), min_value=0, step=1)
-                        p_reorder_edit = st.number_input("Reorder Level", value=int(prod_data_edit_main.get('ReorderLevel',0)), min_value=0, step=1)
-
-                        current_sup_id_prod_edit = prod_data_edit_main.get('SupplierID')
-                        product_supplier_keys_list = list(supplier_map_prod.keys())
-                        try:
-                            prod_supplier_index = product_supplier_keys_list.index(next(k for k,v in supplier_map_prod.items() if v == current_sup_id_prod_edit))
-                        except (StopIteration,ValueError):
-                            prod_supplier_index = 0
-                        selected_sup_name_prod_edit_page = st.selectbox("Supplier", product_supplier_keys_list, index=prod_supplier_index, key="edit_prod_supplier_main_page")
-                        p_supplier_id_edit = supplier_map_prod.get(selected_sup_name_prod_edit_page)
-
-                        st.write("Current Image:")
-                        current_image_path_edit = prod_data_edit_main.get('ImagePath')
-                        if current_image_path_edit and os.path.exists(current_image_path_edit):
-                            try:
-                                st.image(Image.open(current_image_path_edit), width=150)
-                            except Exception:
-                                st.text("Could not load current image.")
-                        else:
-                            st.text("No image on file.")
-
-                        p_new_uploaded_image_edit = st.file_uploader("Upload New Image (Optional - replaces old)", type=["png", "jpg", "jpeg"], key=f"edit_img_upload_main_page_{prod_id_to_edit_main}")
-
-                        updated_prod = st.form_submit_button("Update Product")
-                        if updated_prod:
-                            if not p_name_edit or not p_sku_edit:
-                                st.error("Name and SKU required.")
-                            else:
-                                image_path_to_save_edit = current_image_path_edit
-                                if p_new_uploaded_image_edit:
-                                    new_image_filename_base = p_sku_edit
-                                    if current_image_path_edit and os.path.exists(current_image_path_edit):
-                                        try:
-                                            os.remove(current_image_path_edit)
-                                            st.caption(f"Old image {os.path.basename(current_image_path_edit)} removed.")
-                                        except Exception as e_del_img:
-                                            st.warning(f"Old image removal issue: {e_del_img}")
-                                    image_path_to_save_edit = save_uploaded_product_image(p_new_uploaded_image_edit, new_image_filename_base)
-                                try:
-                                    db.update_product(prod_id_to_edit_main, p_name_edit, p_sku_edit, p_desc_edit, p_cat_edit, p_mat_type_prod_edit, p_dims_edit, p_cost_edit, p_sell_edit, p_qty_edit, p_reorder_edit, p_supplier_id_edit, image_path_to_save_edit)
-                                    st.success("Product updated!")
-                                    st.rerun()
-                                except Exception as e_upd_prod:
-                                    st.error(f"Error updating: {e_upd_prod}")
-                else:
-                    st.error(f"Could not load data for product ID {prod_id_to_edit_main}")
+def _page_query(select_sql, key_column, descending=False, filters=(), params=(), limit=None, after=None):
+    """SQL and parameters for one keyset page ordered by key_column.
 
-    elif action_prod == "Delete Product":
-        st.subheader("Delete Product")
-        products_list_del_rows = db.get_all_products()
-        if not products_list_del_rows:
-            st.info("No products to delete.")
-        else:
-            products_list_del_main = db.rows_to_dicts(products_list_del_rows)
-            product_options_del_main = {f"{p['ProductName']} (SKU: {p.get('SKU','N/A')}, ID: {p['ProductID']})": p['ProductID'] for p in products_list_del_main}
-            selected_prod_disp_del_main = st.selectbox("Select Product to Delete", list(product_options_del_main.keys()), key="del_prod_select_key_main_page", index=None, placeholder="Select a product...")
-            if selected_prod_disp_del_main:
-                prod_id_to_del_main = product_options_del_main[selected_prod_disp_del_main]
-                st.warning(f"Are you sure you want to delete {selected_prod_disp_del_main}? This cannot be undone and will also delete its image file (if linked and db.delete_product handles it).")
-                if st.button("Confirm Delete", key=f"confirm_del_prod_main_page_{prod_id_to_del_main}"):
-                    try:
-                        db.delete_product(prod_id_to_del_main)
-                        st.success("Product deleted successfully!")
-                        st.rerun()
-                    except Exception as e_del_prod_main:
-                        st.error(f"Error deleting product: {e_del_prod_main}")
-
-elif choice == "Project Management":
-    st.header("🛠️ Project Management")
-    action_proj = st.selectbox("Action", ["View All", "Add New", "Edit Project", "Delete Project"], key="proj_action_main_key")
-
-    customers_for_proj_rows = db.get_all_customers()
-    customers_for_proj = db.rows_to_dicts(customers_for_proj_rows) if customers_for_proj_rows else []
-    customer_map_proj = {"Select Customer*": None}
-    customer_map_proj.update({f"{c['CustomerName']} (ID: {c['CustomerID']})": c['CustomerID'] for c in customers_for_proj})
-
-    project_status_options = ["Planning", "In Progress", "On Hold", "Completed", "Cancelled"]
-
-    if action_proj == "View All":
-        st.subheader("Existing Projects")
-        search_term_proj = st.text_input("Search Projects (Name, Customer, Status)", key="search_proj_view_main_key")
-        projects_list_rows = db.get_all_projects(search_term=search_term_proj)
-        if projects_list_rows:
-            projects_list = db.rows_to_dicts(projects_list_rows)
-            df_projects = pd.DataFrame(projects_list)
-            if 'Budget' in df_projects.columns:
-                df_projects['Budget_Display'] = df_projects['Budget'].apply(lambda x: f"Rs. {x:,.2f}" if pd.notnull(x) else "N/A")
-
-            cols_to_show = ['ProjectID', 'ProjectName', 'CustomerName', 'StartDate', 'EndDate', 'Status', 'Budget_Display', 'Description']
-            cols_filtered = [col for col in cols_to_show if col in df_projects.columns]
-            st.dataframe(df_projects[cols_filtered], use_container_width=True, hide_index=True)
-        else:
-            st.info("No projects found.")
-
-    elif action_proj == "Add New":
-        st.subheader("Add New Project")
-        with st.form("add_project_form_main_key", clear_on_submit=True):
-            pr_name = st.text_input("Project Name*")
-            selected_cust_name_proj = st.selectbox("Customer*", list(customer_map_proj.keys()), index=0, key="add_proj_customer_main_key")
-            pr_customer_id = customer_map_proj.get(selected_cust_name_proj)
-
-            col_start_proj, col_end_proj = st.columns(2)
-            pr_start_date = col_start_proj.date_input("Start Date", datetime.now().date())
-            pr_end_date = col_end_proj.date_input("Expected End Date", (datetime.now() + timedelta(days=30)).date() )
-            pr_status = st.selectbox("Status", project_status_options)
-            pr_budget = st.number_input("Budget (Rs.)", min_value=0.0, format="%.2f")
-            pr_desc = st.text_area("Description")
-            submitted_proj = st.form_submit_button("Add Project")
-            if submitted_proj:
-                if not pr_name:
-                    st.error("Project Name required.")
-                elif not pr_customer_id:
-                    st.error("Customer is required for a project.")
-                else:
-                    try:
-                        db.add_project(pr_name, pr_customer_id,
-                                       pr_start_date.strftime("%Y-%m-%d") if pr_start_date else None,
-                                       pr_end_date.strftime("%Y-%m-%d") if pr_end_date else None,
-                                       pr_status, pr_budget, pr_desc)
-                        st.success("Project added!")
-                    except Exception as e_proj_add:
-                        st.error(f"Error adding project: {e_proj_add}")
-
-    elif action_proj == "Edit Project":
-        st.subheader("Edit Project")
-        projects_list_edit_rows = db.get_all_projects()
-        if not projects_list_edit_rows:
-            st.info("No projects to edit.")
-        else:
-            projects_list_edit_main = db.rows_to_dicts(projects_list_edit_rows)
-            project_options_edit_main_page = {f"{p.get('ProjectName','Unnamed Project')} (ID: {p['ProjectID']})": p['ProjectID'] for p in projects_list_edit_main}
-            selected_proj_disp_edit_main_page = st.selectbox("Select Project", list(project_options_edit_main_page.keys()), key="edit_proj_select_main_key", index=None, placeholder="Select a project...")
-
-            if selected_proj_disp_edit_main_page:
-                proj_id_to_edit_main_page = project_options_edit_main_page[selected_proj_disp_edit_main_page]
-                proj_data_row = db.get_project_by_id(proj_id_to_edit_main_page)
-                proj_data_main_page = dict(proj_data_row) if proj_data_row else None
-
-                if proj_data_main_page:
-                    with st.form(f"edit_project_form_main_page_{proj_id_to_edit_main_page}"):
-                        st.markdown(f"#### Editing Project: {proj_data_main_page.get('ProjectName', '')} (ID: {proj_id_to_edit_main_page})")
-                        pr_name_edit = st.text_input("Project Name*", value=proj_data_main_page.get('ProjectName',''))
-
-                        current_cust_id_proj_edit = proj_data_main_page.get('CustomerID')
-                        project_customer_keys_list = list(customer_map_proj.keys())
-                        try:
-                            proj_customer_index = project_customer_keys_list.index(next(k for k,v in customer_map_proj.items() if v == current_cust_id_proj_edit))
-                        except (StopIteration, ValueError):
-                            proj_customer_index = 0
-                        selected_cust_name_proj_edit_page = st.selectbox("Customer*", project_customer_keys_list, index=proj_customer_index, key="edit_proj_customer_main_page")
-                        pr_customer_id_edit = customer_map_proj.get(selected_cust_name_proj_edit_page)
-
-                        col_start_proj_edit, col_end_proj_edit = st.columns(2)
-                        pr_start_date_val_edit = datetime.strptime(proj_data_main_page['StartDate'], "%Y-%m-%d").date() if proj_data_main_page.get('StartDate') else None
-                        pr_end_date_val_edit = datetime.strptime(proj_data_main_page['EndDate'], "%Y-%m-%d").date() if proj_data_main_page.get('EndDate') else None
-
-                        pr_start_date_edit = col_start_proj_edit.date_input("Start Date", value=pr_start_date_val_edit)
-                        pr_end_date_edit = col_end_proj_edit.date_input("Expected End Date", value=pr_end_date_val_edit)
-
-                        current_status = proj_data_main_page.get('Status')
-                        pr_status_edit = st.selectbox("Status", project_status_options,
-                                                      index=project_status_options.index(current_status) if current_status in project_status_options else 0)
-                        pr_budget_edit = st.number_input("Budget (Rs.)", value=float(proj_data_main_page.get('Budget',0.0)), min_value=0.0, format="%.2f")
-                        pr_desc_edit = st.text_area("Description", value=proj_data_main_page.get('Description',''))
-
-                        submitted_update_project_details = st.form_submit_button("Update Project Core Details")
-                        if submitted_update_project_details:
-                            if not pr_name_edit:
-                                st.error("Project Name required.")
-                            elif not pr_customer_id_edit:
-                                st.error("Customer is required for a project.")
-                            else:
-                                try:
-                                    db.update_project(proj_id_to_edit_main_page, pr_name_edit, pr_customer_id_edit,
-                                                      pr_start_date_edit.strftime("%Y-%m-%d") if pr_start_date_edit else None,
-                                                      pr_end_date_edit.strftime("%Y-%m-%d") if pr_end_date_edit else None,
-                                                      pr_status_edit, pr_budget_edit, pr_desc_edit)
-                                    st.success("Project core details updated!")
-                                    st.rerun()
-                                except Exception as e_proj_edit:
-                                    st.error(f"Error updating project core details: {e_proj_edit}")
-
-                    st.markdown("---")
-                    st.subheader("Project Materials")
-                    project_materials_rows = db.get_materials_for_project(proj_id_to_edit_main_page)
-                    project_materials_list = db.rows_to_dicts(project_materials_rows) if project_materials_rows else []
-
-                    total_material_cost_for_project = 0
-                    if project_materials_list:
-                        df_proj_mats = pd.DataFrame(project_materials_list)
-                        df_proj_mats['LineCost'] = df_proj_mats['QuantityUsed'] * df_proj_mats['CostPerUnitAtTimeOfUse']
-                        total_material_cost_for_project = df_proj_mats['LineCost'].sum()
-
-                        cols_display_proj_mat = ['MaterialName', 'QuantityUsed', 'UnitOfMeasure', 'CostPerUnitAtTimeOfUse', 'LineCost']
-                        for index, row in df_proj_mats.iterrows():
-                            col1, col2, col3, col4, col5, col_btn = st.columns([3,1,1,1,1,1])
-                            col1.write(row['MaterialName'])
-                            col2.write(f"{row['QuantityUsed']} {row['UnitOfMeasure']}")
-                            col3.write(f"Rs. {row['CostPerUnitAtTimeOfUse']:.2f}")
-                            col4.write(f"Rs. {row['LineCost']:.2f}")
-                            if col_btn.button("Remove", key=f"remove_proj_mat_{row['ProjectMaterialID']}_{proj_id_to_edit_main_page}"):
-                                try:
-                                    db.remove_material_from_project(row['ProjectMaterialID'])
-                                    st.success(f"Removed {row['MaterialName']} from project. Stock adjusted.")
-                                    st.rerun()
-                                except Exception as e_remove:
-                                    st.error(f"Error removing material: {e_remove}")
-                        st.markdown(f"**Total Material Cost for Project: Rs. {total_material_cost_for_project:,.2f}**")
-                    else:
-                        st.info("No materials assigned to this project yet.")
-
-                    with st.expander("Add New Material to Project", expanded=False):
-                        with st.form(f"add_material_to_project_form_{proj_id_to_edit_main_page}", clear_on_submit=True):
-                            material_categories = db.get_distinct_material_categories()
-                            sel_cat_proj_mat = st.selectbox("Filter by Material Category", ["All"] + material_categories, key=f"cat_mat_proj_add_{proj_id_to_edit_main_page}")
-
-                            if sel_cat_proj_mat and sel_cat_proj_mat != "All":
-                                materials_options_rows = db.get_materials_by_category(sel_cat_proj_mat)
-                            else:
-                                materials_options_rows = db.get_all_materials()
-
-                            available_materials = db.rows_to_dicts(materials_options_rows) if materials_options_rows else []
-
-                            mat_map_proj_add = {"Select Material*": None}
-                            for m in available_materials:
-                                display_txt = f"{m.get('MaterialName','N/A')} (Stock: {m.get('QuantityInStock',0)} {m.get('UnitOfMeasure','')}; Cost: {m.get('CostPerUnit',0):.2f}; Supplier: {m.get('SupplierName','N/A')})"
-                                mat_map_proj_add[display_txt] = m['MaterialID']
-
-                            selected_mat_disp_proj_add = st.selectbox("Select Specific Material*", list(mat_map_proj_add.keys()), key=f"sel_spec_mat_proj_add_{proj_id_to_edit_main_page}")
-                            mat_id_to_add_proj_val = mat_map_proj_add.get(selected_mat_disp_proj_add)
-
-                            qty_needed_proj_add = st.number_input("Quantity Needed*", min_value=0.01, format="%.2f", step=0.1, key=f"qty_needed_proj_add_{proj_id_to_edit_main_page}")
-                            notes_proj_mat_add = st.text_area("Notes (Optional)", key=f"notes_proj_mat_add_{proj_id_to_edit_main_page}")
-
-                            submitted_add_material_to_proj = st.form_submit_button("➕ Add Material to Project")
-                            if submitted_add_material_to_proj:
-                                if mat_id_to_add_proj_val and qty_needed_proj_add > 0:
-                                    mat_details_row = db.get_material_by_id(mat_id_to_add_proj_val)
-                                    mat_details = dict(mat_details_row) if mat_details_row else None
-                                    if mat_details:
-                                        cost_at_time = mat_details.get('CostPerUnit', 0.0)
-                                        current_stock = mat_details.get('QuantityInStock', 0.0)
-                                        if qty_needed_proj_add > current_stock:
-                                            st.warning(f"Needed quantity ({qty_needed_proj_add}) for {mat_details['MaterialName']} exceeds stock ({current_stock}). Proceeding will result in negative theoretical stock.")
-
-                                        try:
-                                            db.add_material_to_project(proj_id_to_edit_main_page, mat_id_to_add_proj_val, qty_needed_proj_add, cost_at_time, notes_proj_mat_add)
-                                            db.update_material_stock(mat_id_to_add_proj_val, -qty_needed_proj_add)
-                                            st.success(f"Added {qty_needed_proj_add} of {mat_details['MaterialName']} to project. Stock updated.")
-                                            st.rerun()
-                                        except Exception as e: st.error(f"Error: {e}")
-                                    else: st.error("Could not get material details.")
-                                else: st.error("Material and Quantity Needed are required.")
-
-                    st.markdown("---")
-                    st.subheader("Project Supplier Services")
-                    project_services_rows = db.get_services_for_project(proj_id_to_edit_main_page)
-                    project_services_list = db.rows_to_dicts(project_services_rows) if project_services_rows else []
-                    if project_services_list:
-                        st.dataframe(project_services_list, use_container_width=True, hide_index=True)
-                    else:
-                        st.info("No supplier services currently linked to this project.")
+    `after` is the key of the last row on the previous page, so every page is an index
+    range scan on the key instead of an OFFSET that re-reads all earlier rows.
+    """
+    filters = [f for f in filters if f]
+    params = tuple(params)
+    if after is not None:
+        filters.append(f"{key_column} {'<' if descending else '>'} ?")
+        params += (after,)
+    sql = select_sql
+    if filters:
+        sql += " WHERE " + " AND ".join(filters)
+    sql += f" ORDER BY {key_column} {'DESC' if descending else 'ASC'}"
+    if limit:
+        sql += " LIMIT ?"
+        params += (int(limit),)
+    return sql, params
 
-                else:
-                    st.error(f"Could not load data for project ID {proj_id_to_edit_main_page}")
 
-    elif action_proj == "Delete Project":
-        st.subheader("Delete Project")
-        projects_list_del_rows = db.get_all_projects()
-        if not projects_list_del_rows:
-            st.info("No projects to delete.")
-        else:
-            projects_list_del_main = db.rows_to_dicts(projects_list_del_rows)
-            project_options_del_main_page = {f"{p.get('ProjectName','Unnamed Project')} (ID: {p['ProjectID']})": p['ProjectID'] for p in projects_list_del_main}
-            selected_proj_disp_del_main_page = st.selectbox("Select Project to Delete", list(project_options_del_main_page.keys()), key="del_proj_select_main_key", index=None, placeholder="Select a project...")
-            if selected_proj_disp_del_main_page:
-                proj_id_to_del_main_page = project_options_del_main_page[selected_proj_disp_del_main_page]
-                st.warning(f"Are you sure you want to delete project '{selected_proj_disp_del_main_page}'? This will also delete associated project materials and might affect orders, invoices, or expenses linked to it (depending on DB constraints).")
-                if st.button("Confirm Delete Project", key=f"confirm_del_proj_main_page_{proj_id_to_del_main_page}"):
-                    try:
-                        db.delete_project(proj_id_to_del_main_page)
-                        st.success("Project deleted!")
-                        st.rerun()
-                    except Exception as e_del_proj_main:
-                        st.error(f"Error deleting project: {e_del_proj_main}")
-
-elif choice == "Sales Book (Orders)":
-    st.header("🛒 Sales Book (Orders)")
-    action_order_main = st.selectbox("Action", ["View All Orders", "Create New Order", "Edit Order (Basic Info)"], key="order_action_main_key")
-
-    if action_order_main == "View All Orders":
-        st.subheader("Existing Orders")
-        all_db_orders_rows = db.get_all_orders()
-        if all_db_orders_rows:
-            all_db_orders_main = db.rows_to_dicts(all_db_orders_rows)
-            df_orders = pd.DataFrame(all_db_orders_main)
-            if 'TotalAmount' in df_orders.columns:
-                df_orders['TotalAmount_Display'] = df_orders['TotalAmount'].apply(lambda x: f"Rs. {x:,.2f}" if pd.notnull(x) else "N/A")
-
-            cols_to_show = ['OrderID', 'OrderDate', 'CustomerName', 'ProjectName', 'ReferenceID', 'OrderStatus', 'TotalAmount_Display', 'PaymentStatus']
-            cols_filtered = [col for col in cols_to_show if col in df_orders.columns]
-            st.dataframe(df_orders[cols_filtered], use_container_width=True, hide_index=True)
-
-            order_ids_for_view_main = [o['OrderID'] for o in all_db_orders_main]
-            if order_ids_for_view_main:
-                selected_order_id_view_main = st.selectbox("Select Order ID to view items", order_ids_for_view_main, key="view_order_items_select_db_main_key", index=None, placeholder="Choose an order...")
-                if selected_order_id_view_main:
-                    items_for_order_rows = db.get_order_items_by_order_id(selected_order_id_view_main)
-                    if items_for_order_rows:
-                        st.write(f"Items for Order ID: {selected_order_id_view_main}")
-                        st.dataframe(db.rows_to_dicts(items_for_order_rows), use_container_width=True, hide_index=True)
-                    else:
-                        st.info("No items found for this order.")
-        else:
-            st.info("No orders recorded yet.")
-
-    elif action_order_main == "Create New Order":
-        st.subheader("Create New Order")
-        customers_for_order_rows = db.get_all_customers()
-        customers_for_order_main = db.rows_to_dicts(customers_for_order_rows) if customers_for_order_rows else []
-        customer_map_order_main = {"Select Customer*": None}
-        customer_map_order_main.update({f"{c['CustomerName']} (ID: {c['CustomerID']})": c['CustomerID'] for c in customers_for_order_main})
-
-        projects_for_order_rows = db.get_all_projects()
-        projects_for_order_main = db.rows_to_dicts(projects_for_order_rows) if projects_for_order_rows else []
-        project_map_order_main = {"None (No Project)": None}
-        project_map_order_main.update({f"{p.get('ProjectName','Unnamed Project')} (ID: {p['ProjectID']})": p['ProjectID'] for p in projects_for_order_main})
-
-        order_status_options_main = ["Pending", "Confirmed", "Processing", "Shipped", "Delivered", "Cancelled"]
-        payment_status_options_main = ["Unpaid", "Partially Paid", "Paid", "Refunded"]
-
-        with st.form("add_order_form_db_main_key", clear_on_submit=False):
-            o_order_date_main = st.date_input("Order Date", datetime.now().date())
-            selected_cust_name_order_main = st.selectbox("Customer*", list(customer_map_order_main.keys()), key="order_cust_db_select_main_key", index=0)
-            o_customer_id_main = customer_map_order_main.get(selected_cust_name_order_main)
-            selected_proj_name_order_main = st.selectbox("Associated Project (Optional)", list(project_map_order_main.keys()), key="order_proj_db_select_main_key", index=0)
-            o_project_id_main = project_map_order_main.get(selected_proj_name_order_main)
-
-            o_reference_id_main = st.text_input("Order Reference ID (Optional, e.g., ORD-XYZ-001)")
-
-            col_ord_stat1_main, col_ord_stat2_main = st.columns(2)
-            o_order_status_main = col_ord_stat1_main.selectbox("Order Status", order_status_options_main)
-            o_payment_status_main = col_ord_stat2_main.selectbox("Payment Status", payment_status_options_main)
-
-            initial_shipping_address_main = ""
-            if o_customer_id_main:
-                cust_details_row = db.get_customer_by_id(o_customer_id_main)
-                cust_details_for_addr_main = dict(cust_details_row) if cust_details_row else None
-                if cust_details_for_addr_main:
-                    initial_shipping_address_main = cust_details_for_addr_main.get('ShippingAddress') or cust_details_for_addr_main.get('BillingAddress', "")
-
-            o_shipping_address_main = st.text_area("Shipping Address", value=initial_shipping_address_main, key="order_ship_addr_main_input_key_create")
-            o_notes_main = st.text_area("Order Notes")
-
-            st.markdown("---"); st.subheader("Order Items")
-
-            products_for_items_rows = db.get_all_products()
-            products_for_items_order_main = db.rows_to_dicts(products_for_items_rows) if products_for_items_rows else []
-            product_map_order_items_main = {"Select Product*": None}
-            product_map_order_items_main.update({f"{p['ProductName']} (ID: {p['ProductID']}, Price: Rs. {p.get('SellingPrice', 0.0):.2f}, Stock: {p.get('QuantityInStock',0)})": p['ProductID'] for p in products_for_items_order_main})
-
-            item_cols_main = st.columns([3, 1, 1, 1, 0.5])
-            selected_prod_disp_item_main = item_cols_main[0].selectbox("Product*", list(product_map_order_items_main.keys()), key="order_item_prod_select_key_main_new", index=0)
-            qty_item_main = item_cols_main[1].number_input("Qty*", min_value=1, value=1, step=1, key="order_item_qty_val_main_new")
-
-            prod_id_for_price_main = product_map_order_items_main.get(selected_prod_disp_item_main)
-            default_unit_price_main = 0.0
-            if prod_id_for_price_main:
-                prod_details_row = db.get_product_by_id(prod_id_for_price_main)
-                prod_details_main = dict(prod_details_row) if prod_details_row else None
-                if prod_details_main:
-                    default_unit_price_main = float(prod_details_main.get('SellingPrice', 0.0))
-
-            unit_price_item_override_main = item_cols_main[2].number_input("Unit Price (Rs.)", min_value=0.0, value=default_unit_price_main, format="%.2f", key="order_item_price_val_main_new")
-            discount_item_val_main = item_cols_main[3].number_input("Discount (Rs.)", min_value=0.0, value=0.0, format="%.2f", key="order_item_disc_val_main_new")
-
-            if item_cols_main[4].button("➕ Add", key="order_add_item_button_key_main"):
-                if prod_id_for_price_main and qty_item_main > 0:
-                    prod_details_add_row = db.get_product_by_id(prod_id_for_price_main)
-                    prod_details_add_main = dict(prod_details_add_row) if prod_details_add_row else None
-
-                    if prod_details_add_main and prod_details_add_main.get('QuantityInStock', 0) < qty_item_main:
-                        st.warning(f"Not enough stock for {prod_details_add_main['ProductName']} (Available: {prod_details_add_main.get('QuantityInStock',0)}). Order item not added.")
-                    elif prod_details_add_main:
-                        st.session_state.current_order_items_main.append({
-                            'ProductID': prod_id_for_price_main,
-                            'ProductName': prod_details_add_main.get('ProductName','N/A'),
-                            'QuantitySold': qty_item_main,
-                            'UnitPriceAtSale': unit_price_item_override_main,
-                            'Discount': discount_item_val_main,
-                            'LineTotal': (unit_price_item_override_main * qty_item_main) - discount_item_val_main
-                        })
-                    else:
-                        st.error("Selected product details could not be fetched.")
-                else:
-                    st.warning("Please select a product and enter a valid quantity.")
-
-            if st.session_state.current_order_items_main:
-                st.markdown("**Items in this Order:**")
-                temp_items_df_main = pd.DataFrame(st.session_state.current_order_items_main)
-                temp_items_df_main['UnitPriceAtSale_Display'] = temp_items_df_main['UnitPriceAtSale'].apply(lambda x: f"Rs. {x:,.2f}")
-                temp_items_df_main['Discount_Display'] = temp_items_df_main['Discount'].apply(lambda x: f"Rs. {x:,.2f}")
-                temp_items_df_main['LineTotal_Display'] = temp_items_df_main['LineTotal'].apply(lambda x: f"Rs. {x:,.2f}")
-                st.dataframe(temp_items_df_main[['ProductName', 'QuantitySold', 'UnitPriceAtSale_Display', 'Discount_Display', 'LineTotal_Display']], use_container_width=True, hide_index=True)
-                current_total_amount_numeric_main = sum(item['LineTotal'] for item in st.session_state.current_order_items_main)
-                st.metric("Calculated Order Total", f"Rs. {current_total_amount_numeric_main:,.2f}")
-
-            submitted_order_db_main = st.form_submit_button("💾 Create Order")
-            if submitted_order_db_main:
-                if not o_customer_id_main:
-                    st.error("Customer is required.")
-                elif not st.session_state.current_order_items_main:
-                    st.error("Order must have at least one item.")
-                else:
-                    final_shipping_address_main_val = st.session_state.get("order_ship_addr_main_input_key_create", initial_shipping_address_main)
-                    try:
-                        new_order_id_main = db.add_order(
-                            o_order_date_main.strftime("%Y-%m-%d"), o_customer_id_main, o_project_id_main,
-                            o_order_status_main, 0.0, o_payment_status_main,
-                            final_shipping_address_main_val, o_notes_main, o_reference_id_main
-                        )
-                        for item_data_main in st.session_state.current_order_items_main:
-                            db.add_order_item(new_order_id_main, item_data_main['ProductID'], item_data_main['QuantitySold'], item_data_main['UnitPriceAtSale'], item_data_main['Discount'])
-                            db.update_product_stock(item_data_main['ProductID'], -item_data_main['QuantitySold'])
-                        db.update_order_total(new_order_id_main)
-                        st.success(f"Order (ID: {new_order_id_main}) created successfully!")
-                        st.session_state.current_order_items_main = []
-                        st.rerun()
-                    except Exception as e_ord_add:
-                        st.error(f"Error creating order: {e_ord_add}")
-
-    elif action_order_main == "Edit Order (Basic Info)":
-        st.subheader("Edit Order (Basic Info)")
-        all_orders_edit_rows = db.get_all_orders()
-        if not all_orders_edit_rows:
-            st.info("No orders to edit.")
-        else:
-            all_orders_edit = db.rows_to_dicts(all_orders_edit_rows)
-            order_options_edit = {f"Order ID {o['OrderID']} (Ref: {o.get('ReferenceID', 'N/A')}, Cust: {o.get('CustomerName', 'N/A')})": o['OrderID'] for o in all_orders_edit}
-            selected_order_key_edit = st.selectbox("Select Order to Edit", list(order_options_edit.keys()), key="edit_order_select", index=None, placeholder="Choose an order...")
-
-            if selected_order_key_edit:
-                order_id_to_edit = order_options_edit[selected_order_key_edit]
-                order_data_row = db.get_order_by_id(order_id_to_edit)
-                order_data = dict(order_data_row) if order_data_row else None
-
-                if order_data:
-                    customers_for_order_edit_rows = db.get_all_customers()
-                    customers_for_order_edit = db.rows_to_dicts(customers_for_order_edit_rows) if customers_for_order_edit_rows else []
-                    customer_map_order_edit = {"Select Customer*": None}
-                    customer_map_order_edit.update({f"{c['CustomerName']} (ID: {c['CustomerID']})": c['CustomerID'] for c in customers_for_order_edit})
-
-                    projects_for_order_edit_rows = db.get_all_projects()
-                    projects_for_order_edit = db.rows_to_dicts(projects_for_order_edit_rows) if projects_for_order_edit_rows else []
-                    project_map_order_edit = {"None (No Project)": None}
-                    project_map_order_edit.update({f"{p.get('ProjectName','Unnamed Project')} (ID: {p['ProjectID']})": p['ProjectID'] for p in projects_for_order_edit})
-
-                    order_status_options_edit = ["Pending", "Confirmed", "Processing", "Shipped", "Delivered", "Cancelled"]
-                    payment_status_options_edit = ["Unpaid", "Partially Paid", "Paid", "Refunded"]
-
-                    with st.form(f"edit_order_form_{order_id_to_edit}"):
-                        st.write(f"Editing Order ID: {order_id_to_edit}")
-                        o_order_date_edit = st.date_input("Order Date", value=datetime.strptime(order_data.get('OrderDate',''), "%Y-%m-%d").date() if order_data.get('OrderDate') else datetime.now().date())
-
-                        cust_keys_edit = list(customer_map_order_edit.keys())
-                        try:
-                            cust_idx_edit = cust_keys_edit.index(next((k for k, v in customer_map_order_edit.items() if v == order_data.get('CustomerID')), cust_keys_edit[0]))
-                        except (StopIteration, ValueError): cust_idx_edit = 0
-                        selected_cust_name_edit = st.selectbox("Customer*", cust_keys_edit, index=cust_idx_edit, key=f"order_cust_edit_{order_id_to_edit}")
-                        o_customer_id_edit = customer_map_order_edit.get(selected_cust_name_edit)
-
-                        proj_keys_edit = list(project_map_order_edit.keys())
-                        try:
-                            proj_idx_edit = proj_keys_edit.index(next((k for k, v in project_map_order_edit.items() if v == order_data.get('ProjectID')), proj_keys_edit[0]))
-                        except (StopIteration, ValueError): proj_idx_edit = 0
-                        selected_proj_name_edit = st.selectbox("Associated Project (Optional)", proj_keys_edit, index=proj_idx_edit, key=f"order_proj_edit_{order_id_to_edit}")
-                        o_project_id_edit = project_map_order_edit.get(selected_proj_name_edit)
-
-                        o_reference_id_edit = st.text_input("Order Reference ID", value=order_data.get('ReferenceID', ''))
-
-                        col_ord_stat1_edit, col_ord_stat2_edit = st.columns(2)
-                        current_order_status = order_data.get('OrderStatus')
-                        order_status_idx = order_status_options_edit.index(current_order_status) if current_order_status in order_status_options_edit else 0
-                        o_order_status_edit = col_ord_stat1_edit.selectbox("Order Status", order_status_options_edit, index=order_status_idx)
-
-                        current_payment_status = order_data.get('PaymentStatus')
-                        payment_status_idx = payment_status_options_edit.index(current_payment_status) if current_payment_status in payment_status_options_edit else 0
-                        o_payment_status_edit = col_ord_stat2_edit.selectbox("Payment Status", payment_status_options_edit, index=payment_status_idx)
-
-                        o_shipping_address_edit = st.text_area("Shipping Address", value=order_data.get('ShippingAddress', ''))
-                        o_notes_edit = st.text_area("Order Notes", value=order_data.get('Notes', ''))
-                        st.text_input("Total Amount (Calculated)", value=f"Rs. {order_data.get('TotalAmount', 0.0):,.2f}", disabled=True)
-
-                        submitted_edit_order = st.form_submit_button("💾 Update Order Info")
-                        if submitted_edit_order:
-                            if not o_customer_id_edit:
-                                st.error("Customer is required.")
-                            else:
-                                try:
-                                    db.update_order_basic_info(
-                                        order_id_to_edit, o_order_date_edit.strftime("%Y-%m-%d"), o_customer_id_edit,
-                                        o_project_id_edit, o_order_status_edit, o_payment_status_edit,
-                                        o_shipping_address_edit, o_notes_edit, o_reference_id_edit
-                                    )
-                                    st.success(f"Order (ID: {order_id_to_edit}) basic info updated!")
-                                    st.rerun()
-                                except Exception as e_ord_edit:
-                                    st.error(f"Error updating order: {e_ord_edit}")
-                else:
-                    st.error(f"Could not fetch order data for ID {order_id_to_edit}.")
-
-elif choice == "Invoice Tracking":
-    st.header("🧾 Invoice Tracking")
-    action_inv = st.selectbox("Action", ["View All Invoices", "Create New Invoice", "Edit Invoice"], key="inv_action")
-    invoice_status_options = ["Draft", "Sent", "Paid", "Overdue", "Cancelled"]
-
-    all_projects_inv_rows = db.get_all_projects()
-    all_projects_inv = db.rows_to_dicts(all_projects_inv_rows) if all_projects_inv_rows else []
-    project_map_inv = {"Select Project*": None}
-    project_map_inv.update({f"{p.get('ProjectName','Unnamed Project')} (ID: {p['ProjectID']}, Cust: {p.get('CustomerName', 'N/A')})": p['ProjectID'] for p in all_projects_inv})
-
-    if action_inv == "View All Invoices":
-        st.subheader("All Invoices")
-        search_term_inv = st.text_input("Search Invoices (Ref ID, Project, Customer)", key="search_inv_view")
-        invoices_list_rows = db.get_all_invoices(search_term=search_term_inv)
-        if invoices_list_rows:
-            invoices_list = db.rows_to_dicts(invoices_list_rows)
-            df_invoices = pd.DataFrame(invoices_list)
-            df_invoices['TotalAmount_Display'] = df_invoices['TotalAmount'].apply(lambda x: f"Rs. {x:,.2f}" if pd.notnull(x) else "N/A")
-            df_invoices['IssueDate_Display'] = pd.to_datetime(df_invoices['IssueDate'], errors='coerce').dt.strftime('%Y-%m-%d').fillna('N/A')
-            df_invoices['DueDate_Display'] = pd.to_datetime(df_invoices['DueDate'], errors='coerce').dt.strftime('%Y-%m-%d').fillna('N/A')
-
-            if 'PaymentDate' in df_invoices.columns:
-                df_invoices['PaymentDate_Display'] = pd.to_datetime(df_invoices['PaymentDate'], errors='coerce').dt.strftime('%Y-%m-%d').fillna('N/A')
-            else:
-                df_invoices['PaymentDate_Display'] = 'N/A'
-
-            cols_to_show = ['InvoiceID', 'InvoiceReferenceID', 'ProjectName', 'CustomerName', 'TotalAmount_Display', 'Status', 'IssueDate_Display', 'DueDate_Display', 'PaymentDate_Display', 'Notes']
-            cols_filtered = [col for col in cols_to_show if col in df_invoices.columns]
-            st.dataframe(df_invoices[cols_filtered], use_container_width=True, hide_index=True)
-        else:
-            st.info("No invoices found.")
-
-    elif action_inv == "Create New Invoice":
-        st.subheader("Create New Invoice for Project")
-        with st.form("add_invoice_form", clear_on_submit=True):
-            selected_project_key_inv = st.selectbox("Select Project to Invoice*", list(project_map_inv.keys()), key="inv_project_select", index=0)
-            inv_project_id = project_map_inv.get(selected_project_key_inv)
-
-            inv_ref_id_default = db.get_next_invoice_reference_id() if hasattr(db, 'get_next_invoice_reference_id') else f"INV-{datetime.now().strftime('%Y%m%d%H%M%S')}"
-            inv_ref_id = st.text_input("Invoice Reference ID*", value=inv_ref_id_default)
-
-            inv_issue_date = st.date_input("Issue Date*", datetime.now().date())
-            inv_due_date = st.date_input("Due Date*", datetime.now().date() + timedelta(days=30))
-
-            customer_id_for_inv = None
-            project_budget_for_inv = 0.0
-            customer_name_display = "N/A"
-            if inv_project_id:
-                project_data_row = db.get_project_by_id(inv_project_id)
-                project_data_inv = dict(project_data_row) if project_data_row else None
-                if project_data_inv:
-                    customer_id_for_inv = project_data_inv.get('CustomerID')
-                    project_budget_for_inv = float(project_data_inv.get('Budget', 0.0))
-                    if customer_id_for_inv:
-                        customer_details_row = db.get_customer_by_id(customer_id_for_inv)
-                        customer_details_inv = dict(customer_details_row) if customer_details_row else None
-                        if customer_details_inv:
-                            customer_name_display = customer_details_inv.get('CustomerName', 'N/A')
-
-            st.text_input("Customer (Auto-filled from Project)", value=customer_name_display, disabled=True)
-            inv_amount_default_value = max(project_budget_for_inv, 0.01)
-            inv_amount = st.number_input("Invoice Amount (Rs.)*", value=inv_amount_default_value, min_value=0.01, format="%.2f")
-            inv_status = st.selectbox("Status*", invoice_status_options, index=invoice_status_options.index("Draft") if "Draft" in invoice_status_options else 0)
-            inv_payment_date = st.date_input("Payment Date (if Paid)", value=None)
-            inv_notes = st.text_area("Notes / Invoice Line Items (Manual Entry)")
-
-            submitted = st.form_submit_button("Create Invoice")
-            if submitted:
-                if not inv_project_id or not inv_ref_id or not customer_id_for_inv:
-                    st.error("Project (which determines Customer) and Invoice Reference ID are required.")
-                else:
-                    try:
-                        db.add_invoice(
-                            inv_ref_id, inv_project_id, customer_id_for_inv,
-                            inv_issue_date.strftime("%Y-%m-%d"),
-                            inv_due_date.strftime("%Y-%m-%d"),
-                            inv_payment_date.strftime("%Y-%m-%d") if inv_payment_date else None,
-                            inv_amount, inv_status, inv_notes
-                        )
-                        st.success(f"Invoice {inv_ref_id} created successfully!")
-                    except Exception as e:
-                        st.error(f"Error creating invoice: {e}")
-
-    elif action_inv == "Edit Invoice":
-        st.subheader("Edit Invoice")
-        invoices_list_edit_rows = db.get_all_invoices()
-        if not invoices_list_edit_rows:
-            st.info("No invoices to edit.")
-        else:
-            invoices_list_edit = db.rows_to_dicts(invoices_list_edit_rows)
-            invoice_options_edit = {f"{inv.get('InvoiceReferenceID','N/A')} (Project: {inv.get('ProjectName', 'N/A')}, ID: {inv['InvoiceID']})": inv['InvoiceID'] for inv in invoices_list_edit}
-            selected_invoice_key_edit = st.selectbox("Select Invoice to Edit", list(invoice_options_edit.keys()), key="edit_invoice_select", index=None, placeholder="Choose an invoice...")
-
-            if selected_invoice_key_edit:
-                invoice_id_to_edit = invoice_options_edit[selected_invoice_key_edit]
-                invoice_data_row = db.get_invoice_by_id(invoice_id_to_edit)
-                invoice_data = dict(invoice_data_row) if invoice_data_row else None
-
-                if invoice_data:
-                    with st.form(f"edit_invoice_form_{invoice_id_to_edit}"):
-                        st.write(f"Editing Invoice: {invoice_data.get('InvoiceReferenceID','N/A')}")
-                        inv_ref_id_edit = st.text_input("Invoice Reference ID*", value=invoice_data.get('InvoiceReferenceID',''))
-
-                        project_name_display = "N/A"
-                        if invoice_data.get('ProjectID'):
-                            project_details_row = db.get_project_by_id(invoice_data['ProjectID'])
-                            project_details_for_edit = dict(project_details_row) if project_details_row else None
-                            if project_details_for_edit: project_name_display = project_details_for_edit.get('ProjectName', 'N/A')
-                        st.text_input("Project", value=project_name_display, disabled=True)
-
-                        customer_name_display_edit = "N/A"
-                        if invoice_data.get('CustomerID'):
-                            customer_details_row = db.get_customer_by_id(invoice_data['CustomerID'])
-                            customer_details_for_edit = dict(customer_details_row) if customer_details_row else None
-                            if customer_details_for_edit: customer_name_display_edit = customer_details_for_edit.get('CustomerName', 'N/A')
-                        st.text_input("Customer", value=customer_name_display_edit, disabled=True)
-
-                        inv_issue_date_edit = st.date_input("Issue Date*", value=datetime.strptime(invoice_data['IssueDate'], "%Y-%m-%d").date() if invoice_data.get('IssueDate') else datetime.now().date())
-                        inv_due_date_edit = st.date_input("Due Date*", value=datetime.strptime(invoice_data['DueDate'], "%Y-%m-%d").date() if invoice_data.get('DueDate') else datetime.now().date() + timedelta(days=30))
-
-                        inv_amount_edit_default_value = max(float(invoice_data.get('TotalAmount',0.0)), 0.01)
-                        inv_amount_edit = st.number_input("Invoice Amount (Rs.)*", value=inv_amount_edit_default_value, min_value=0.01, format="%.2f")
-
-                        current_inv_status = invoice_data.get('Status')
-                        current_status_index = invoice_status_options.index(current_inv_status) if current_inv_status in invoice_status_options else 0
-                        inv_status_edit = st.selectbox("Status*", invoice_status_options, index=current_status_index)
-
-                        inv_payment_date_val_edit = datetime.strptime(invoice_data['PaymentDate'], "%Y-%m-%d").date() if invoice_data.get('PaymentDate') else None
-                        inv_payment_date_edit = st.date_input("Payment Date (if Paid)", value=inv_payment_date_val_edit)
-
-                        inv_notes_edit = st.text_area("Notes / Invoice Line Items", value=invoice_data.get('Notes', ''))
-
-                        updated = st.form_submit_button("Update Invoice")
-                        if updated:
-                            if not inv_ref_id_edit:
-                                st.error("Invoice Reference ID is required.")
-                            else:
-                                try:
-                                    db.update_invoice(
-                                        invoice_id_to_edit, inv_ref_id_edit,
-                                        invoice_data['ProjectID'], invoice_data['CustomerID'],
-                                        inv_issue_date_edit.strftime("%Y-%m-%d"),
-                                        inv_due_date_edit.strftime("%Y-%m-%d"),
-                                        inv_payment_date_edit.strftime("%Y-%m-%d") if inv_payment_date_edit else None,
-                                        inv_amount_edit, inv_status_edit, inv_notes_edit
-                                    )
-                                    st.success(f"Invoice {inv_ref_id_edit} updated successfully!")
-                                    st.rerun()
-                                except Exception as e:
-                                    st.error(f"Error updating invoice: {e}")
-                else:
-                    st.error(f"Could not load invoice data for ID {invoice_id_to_edit}.")
-
-elif choice == "Expense Tracking":
-    st.header("💸 Expense Tracking")
-    projects_for_exp_rows = db.get_all_projects()
-    projects_for_exp_main = db.rows_to_dicts(projects_for_exp_rows) if projects_for_exp_rows else []
-    project_map_exp_main_scope = {"None (No Project)": None}
-    project_map_exp_main_scope.update({f"{p.get('ProjectName','Unnamed Project')} (ID: {p['ProjectID']})": p['ProjectID'] for p in projects_for_exp_main})
-
-    action_exp_main_page = st.selectbox("Action", ["View All", "Add New (Manual)"], key="exp_action_main_page_key")
-    if action_exp_main_page == "View All":
-        st.subheader("Recorded Expenses")
-        all_db_expenses_rows = db.get_all_expenses()
-        if all_db_expenses_rows:
-            all_db_expenses_main_page = db.rows_to_dicts(all_db_expenses_rows)
-            df_expenses_main_page = pd.DataFrame(all_db_expenses_main_page)
-            if 'Amount' in df_expenses_main_page.columns:
-                df_expenses_main_page['Amount_Display'] = df_expenses_main_page['Amount'].apply(lambda x: f"Rs. {x:,.2f}" if pd.notnull(x) else "N/A")
-
-            cols_exp_disp_main = ['ExpenseID', 'ExpenseDate', 'Description', 'Category', 'Amount_Display', 'Vendor', 'ProjectName', 'ReceiptReference', 'SupplierServiceName']
-            cols_exp_disp_filt_main = [col for col in cols_exp_disp_main if col in df_expenses_main_page.columns]
-            st.dataframe(df_expenses_main_page[cols_exp_disp_filt_main], use_container_width=True, hide_index=True)
-        else:
-            st.info("No expenses recorded yet.")
-    elif action_exp_main_page == "Add New (Manual)":
-        st.subheader("Add New Manual Expense")
-        with st.form("add_manual_expense_form_db_main_key", clear_on_submit=True):
-            exp_date_man_main = st.date_input("Expense Date", datetime.now().date())
-            desc_exp_man_main = st.text_input("Description*")
-            cat_exp_opts_man_main = ["Operational", "Marketing", "COGS", "Salaries", "Utilities", "Rent", "Travel", "Manual Adjustment", "Other"]
-            cat_exp_man_main = st.selectbox("Category", cat_exp_opts_man_main)
-            amt_exp_man_main = st.number_input("Amount (Rs.)*", min_value=0.01, format="%.2f")
-            vendor_exp_man_main = st.text_input("Vendor/Payee")
-            selected_proj_name_exp_man_main = st.selectbox("Associated Project (Optional)", list(project_map_exp_main_scope.keys()), key="exp_manual_proj_db_select_main_key", index=0)
-            exp_project_id_man_main = project_map_exp_main_scope.get(selected_proj_name_exp_man_main)
-            receipt_ref_exp_man_main = st.text_input("Receipt Reference (e.g., bill number, path to scanned receipt)")
-            submitted_exp_man_main = st.form_submit_button("Add Manual Expense")
-            if submitted_exp_man_main:
-                if not desc_exp_man_main or amt_exp_man_main <= 0:
-                    st.error("Description and a valid Amount are required.")
-                else:
-                    try:
-                        db.add_expense(exp_date_man_main.strftime("%Y-%m-%d"), desc_exp_man_main, cat_exp_man_main, amt_exp_man_main, vendor_exp_man_main, exp_project_id_man_main, receipt_ref_exp_man_main, None)
-                        st.success("Manual expense added successfully!")
-                    except Exception as e_exp_add:
-                        st.error(f"Error adding manual expense: {e_exp_add}")
-
-elif choice == "Reports":
-    st.header("📈 Reports")
-    st.info("Reporting section provides basic summaries. More detailed visualizations and queries can be added.")
-    report_type_main = st.selectbox("Select Report Type (Basic Examples)",
-                                    ["Overall Financial Summary", "Project Profitability (Simplified)",
-                                     "Sales by Product (Placeholder)", "Inventory Status (Placeholder)"])
-    if report_type_main == "Overall Financial Summary":
-        all_invoices_rep_rows = db.get_all_invoices()
-        all_invoices_rep = db.rows_to_dicts(all_invoices_rep_rows) if all_invoices_rep_rows else []
-
-        expenses_main_rep_rows = db.get_all_expenses()
-        expenses_main_rep = db.rows_to_dicts(expenses_main_rep_rows) if expenses_main_rep_rows else []
-
-        total_revenue_from_paid_invoices_rep = sum(inv['TotalAmount'] for inv in all_invoices_rep if inv.get('Status') == 'Paid' and inv.get('TotalAmount'))
-        total_operational_expenses_main_rep = sum(e['Amount'] for e in expenses_main_rep if e.get('Amount') and e.get('Category') != 'COGS')
-        total_cogs_expenses_rep = sum(e['Amount'] for e in expenses_main_rep if e.get('Amount') and e.get('Category') == 'COGS')
-
-        st.metric("Total Revenue (from Paid Invoices)", f"Rs. {total_revenue_from_paid_invoices_rep:,.2f}")
-        st.metric("Total Cost of Goods Sold (COGS)", f"Rs. {total_cogs_expenses_rep:,.2f}")
-        gross_profit = total_revenue_from_paid_invoices_rep - total_cogs_expenses_rep
-        st.metric("Gross Profit", f"Rs. {gross_profit:,.2f}")
-        st.metric("Total Operational Expenses (excl. COGS)", f"Rs. {total_operational_expenses_main_rep:,.2f}")
-        net_operating_income = gross_profit - total_operational_expenses_main_rep
-        st.metric("Net Operating Income", f"Rs. {net_operating_income:,.2f}")
-        st.caption("Note: This summary relies on accurate 'Paid' invoice statuses and categorized expenses (especially 'COGS'). Supplier service costs are included if logged as expenses.")
-
-    elif report_type_main == "Project Profitability (Simplified)":
-        st.subheader("Project Profitability (Simplified)")
-        projects_rep_rows = db.get_all_projects()
-        if projects_rep_rows:
-            projects_rep = db.rows_to_dicts(projects_rep_rows)
-            report_data = []
-            for proj in projects_rep:
-                proj_id = proj['ProjectID']
-                project_name = proj.get('ProjectName', f"Project ID {proj_id}")
-
-                invoices_for_proj_rows = db.get_invoices_by_project_id(proj_id)
-                invoices_for_proj = db.rows_to_dicts(invoices_for_proj_rows) if invoices_for_proj_rows else []
-                revenue_for_proj = sum(inv['TotalAmount'] for inv in invoices_for_proj if inv.get('Status') == 'Paid' and inv.get('TotalAmount'))
-
-                total_project_cost = 0
-
-                manual_expenses_for_proj_rows = db.get_expenses_by_project_id(proj_id)
-                manual_expenses_for_proj = db.rows_to_dicts(manual_expenses_for_proj_rows) if manual_expenses_for_proj_rows else []
-                total_project_cost += sum(exp['Amount'] for exp in manual_expenses_for_proj if exp.get('Amount'))
-
-                services_for_proj_rows = db.get_services_for_project(proj_id)
-                services_for_proj = db.rows_to_dicts(services_for_proj_rows) if services_for_proj_rows else []
-                total_project_cost += sum(serv.get('Cost', 0.0) for serv in services_for_proj if not serv.get('IsExpenseLogged'))
-
-                project_mats_rows = db.get_materials_for_project(proj_id)
-                project_mats = db.rows_to_dicts(project_mats_rows) if project_mats_rows else []
-                total_project_cost += sum(pm.get('QuantityUsed',0) * pm.get('CostPerUnitAtTimeOfUse',0) for pm in project_mats)
-
-                profit_for_proj = revenue_for_proj - total_project_cost
-                report_data.append({
-                    "Project Name": project_name,
-                    "Total Revenue (Paid Invoices)": revenue_for_proj,
-                    "Total Estimated Costs": total_project_cost,
-                    "Estimated Profit/Loss": profit_for_proj
-                })
-
-            if report_data:
-                df_report = pd.DataFrame(report_data)
-                df_report["Total Revenue (Paid Invoices)"] = df_report["Total Revenue (Paid Invoices)"].apply(lambda x: f"Rs. {x:,.2f}")
-                df_report["Total Estimated Costs"] = df_report["Total Estimated Costs"].apply(lambda x: f"Rs. {x:,.2f}")
-                df_report["Estimated Profit/Loss"] = df_report["Estimated Profit/Loss"].apply(lambda x: f"Rs. {x:,.2f}")
-                st.dataframe(df_report, use_container_width=True, hide_index=True)
-            else:
-                st.info("No project data with financial transactions to report on.")
+def _fetch_page(select_sql, key_column, descending=False, filters=(), params=(), limit=None, after=None):
+    return _fetch_all(*_page_query(select_sql, key_column, descending, filters, params, limit, after))
+
+
+def _count(from_sql, filters=(), params=()):
+    filters = [f for f in filters if f]
+    sql = "SELECT COUNT(*) " + from_sql
+    if filters:
+        sql += " WHERE " + " AND ".join(filters)
+    return _fetch_value(sql, tuple(params), 0)
+
+
+# --- Slow-query log ---
+# With SLOW_QUERY_MS set, connections are opened as _LoggedConnection, whose
+# cursors time each statement from execute() until its rows have been fetched
+# (or the cursor is dropped). Statements at or over the threshold are appended
+# to a rotating JSONL file with a fingerprint of the normalized SQL, the
+# statement as written, the types of the bound parameters (never their values),
+# the duration and the statement's EXPLAIN QUERY PLAN. slow_queries.py
+# summarizes the file and index_advisor.py replays it.
+
+_SQL_COMMENT = re.compile(r"--[^\n]*|/\*.*?\*/", re.S)
+_SQL_LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_SQL_PLACEHOLDER_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_slow_query_lock = threading.Lock()
+_slow_query_handler = None
+
+
+def normalize_sql(sql):
+    """The statement with comments dropped, literals and IN-lists replaced by ? and whitespace collapsed."""
+    sql = _SQL_LITERAL.sub("?", _SQL_COMMENT.sub(" ", sql))
+    return " ".join(_SQL_PLACEHOLDER_LIST.sub("(?, ...)", sql).split())
+
+
+def sql_fingerprint(sql):
+    return hashlib.sha1(normalize_sql(sql).encode("utf-8")).hexdigest()[:16]
+
+
+def slow_query_log_path():
+    return SLOW_QUERY_LOG or os.path.join(os.path.dirname(DB_FILE), "slow_queries.jsonl")
+
+
+def _param_shape(params):
+    if isinstance(params, dict):
+        return {name: type(value).__name__ for name, value in params.items()}
+    return [type(value).__name__ for value in params]
+
+
+def _query_plan(conn, sql, params):
+    """EXPLAIN QUERY PLAN lines, indented by depth like the sqlite3 shell; None for statements it can't explain."""
+    try:
+        rows = sqlite3.Cursor(conn).execute("EXPLAIN QUERY PLAN " + sql, params).fetchall()
+    except sqlite3.Error:
+        return None
+    depths, lines = {}, []
+    for node_id, parent_id, _, detail in rows:
+        depths[node_id] = depths.get(parent_id, -1) + 1
+        lines.append("  " * depths[node_id] + detail)
+    return lines
+
+
+def _write_slow_query(entry):
+    global _slow_query_handler
+    record = logging.makeLogRecord({"msg": json.dumps(entry, default=str)})
+    with _slow_query_lock:
+        if _slow_query_handler is None:
+            _slow_query_handler = logging.handlers.RotatingFileHandler(
+                slow_query_log_path(), maxBytes=SLOW_QUERY_LOG_BYTES, backupCount=SLOW_QUERY_LOG_BACKUPS,
+                encoding="utf-8", delay=True)
+        _slow_query_handler.emit(record)
+
+
+def _close_slow_query_log():
+    global _slow_query_handler
+    with _slow_query_lock:
+        handler, _slow_query_handler = _slow_query_handler, None
+    if handler is not None:
+        handler.close()
+
+
+def _log_slow_query(conn, sql, params, seconds, rows, executions):
+    _write_slow_query({
+        "Timestamp": datetime.now().isoformat(timespec="milliseconds"),
+        "Fingerprint": sql_fingerprint(sql),
+        "SQL": normalize_sql(sql),
+        "Statement": sql,
+        "Params": _param_shape(params),
+        "Executions": executions,
+        "DurationMs": round(seconds * 1000, 3),
+        "Rows": rows,
+        "Plan": _query_plan(conn, sql, params),
+    })
+
+
+class _LoggedCursor(sqlite3.Cursor):
+    """Cursor that times each statement through its last fetch and logs it when slow."""
+    _statement = None  # [sql, params, seconds, rows, executions] until the statement is finished
+
+    def execute(self, sql, parameters=()):
+        self._finish()
+        started = time.perf_counter()
+        super().execute(sql, parameters)
+        self._statement = [sql, parameters, time.perf_counter() - started, 0, 1]
+        if self.description is None:
+            self._statement[3] = max(self.rowcount, 0)
+            self._finish()
+        return self
+
+    def executemany(self, sql, seq_of_parameters):
+        self._finish()
+        sample, executions = [], [0]
+
+        def counted(params):
+            if not sample:
+                sample.append(params)
+            executions[0] += 1
+            return params
+
+        started = time.perf_counter()
+        super().executemany(sql, map(counted, seq_of_parameters))
+        self._statement = [sql, sample[0] if sample else (), time.perf_counter() - started, max(self.rowcount, 0), executions[0]]
+        self._finish()
+        return self
+
+    def __next__(self):
+        started = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._fetched(started, 0, done=True)
+            raise
+        self._fetched(started, 1)
+        return row
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = super().fetchone()
+        self._fetched(started, row is not None, done=row is None)
+        return row
+
+    def fetchmany(self, size=None):
+        size = self.arraysize if size is None else size
+        started = time.perf_counter()
+        rows = super().fetchmany(size)
+        self._fetched(started, len(rows), done=len(rows) < size)
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(started, len(rows), done=True)
+        return rows
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        try:
+            self._finish()
+        except Exception:
+            pass
+
+    def _fetched(self, started, rows, done=False):
+        if self._statement is not None:
+            self._statement[2] += time.perf_counter() - started
+            self._statement[3] += rows
+            if done:
+                self._finish()
+
+    def _finish(self):
+        statement, self._statement = self._statement, None
+        if statement is not None and statement[2] * 1000 >= SLOW_QUERY_MS:
+            _log_slow_query(self.connection, *statement)
+
+
+class _LoggedConnection(sqlite3.Connection):
+    def cursor(self, factory=_LoggedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+# --- Reference list cache ---
+# The (id, label) lists behind selectboxes are shared by every session in the
+# process. Each table has a version counter that its add/update/delete functions
+# bump once their transaction commits; a cached list is reused only while the
+# versions of all tables it reads are unchanged, so there is no TTL to tune.
+
+_REFERENCE_LISTS = {
+    "Customers": (("Customers",), "SELECT CustomerID, CustomerName FROM Customers ORDER BY CustomerName, CustomerID"),
+    "Suppliers": (("Suppliers",), "SELECT SupplierID, SupplierName FROM Suppliers ORDER BY SupplierName, SupplierID"),
+    "Projects": (
+        ("Projects", "Customers"),
+        "SELECT p.ProjectID, p.ProjectName, c.CustomerName FROM Projects p "
+        "LEFT JOIN Customers c ON c.CustomerID = p.CustomerID ORDER BY p.ProjectName, p.ProjectID",
+    ),
+    "Products": (
+        ("Products",),
+        "SELECT ProductID, ProductName, SKU, SellingPrice, QuantityInStock FROM Products ORDER BY ProductName, ProductID",
+    ),
+    "Materials": (
+        ("Materials", "Suppliers"),
+        "SELECT m.MaterialID, m.MaterialName, m.Category, m.UnitOfMeasure, m.CostPerUnit, m.QuantityInStock, "
+        "s.SupplierName FROM Materials m LEFT JOIN Suppliers s ON s.SupplierID = m.SupplierID "
+        "ORDER BY m.MaterialName, m.MaterialID",
+    ),
+}
+
+_cache_lock = threading.Lock()
+_table_versions = {}
+_reference_cache = {}
+
+
+def _invalidate_reference_lists(table):
+    """Marks `table` as changed; inside a transaction the bump waits for COMMIT."""
+    pending = getattr(_local, "pending_invalidations", None)
+    if pending is not None:
+        pending.add(table)
+    else:
+        _bump_table_versions((table,))
+
+
+def _bump_table_versions(tables):
+    if not tables:
+        return
+    with _cache_lock:
+        for table in tables:
+            _table_versions[table] = _table_versions.get(table, 0) + 1
+
+
+def get_reference_list(name):
+    """Cached rows for building selectbox maps, e.g. get_reference_list("Suppliers")."""
+    tables, sql = _REFERENCE_LISTS[name]
+    with _cache_lock:
+        versions = (DB_FILE,) + tuple(_table_versions.get(table, 0) for table in tables)
+        cached = _reference_cache.get(name)
+        if cached is not None and cached[0] == versions:
+            return cached[1]
+    # Versions are captured before reading, so a write committing meanwhile leaves this entry stale-marked.
+    rows = tuple(_fetch_all(sql))
+    with _cache_lock:
+        _reference_cache[name] = (versions, rows)
+    return rows
+
+
+def rows_to_dicts(rows):
+    return [dict(row) for row in rows] if rows else []
+
+
+# --- Schema ---
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS Customers (
+    CustomerID INTEGER PRIMARY KEY AUTOINCREMENT,
+    CustomerName TEXT NOT NULL,
+    Email TEXT,
+    Phone TEXT,
+    ReferenceID TEXT,
+    BillingAddress TEXT,
+    ShippingAddress TEXT,
+    Notes TEXT
+);
+
+CREATE TABLE IF NOT EXISTS Suppliers (
+    SupplierID INTEGER PRIMARY KEY AUTOINCREMENT,
+    SupplierName TEXT NOT NULL,
+    ContactPerson TEXT,
+    Email TEXT,
+    Phone TEXT,
+    Address TEXT
+);
+
+CREATE TABLE IF NOT EXISTS Materials (
+    MaterialID INTEGER PRIMARY KEY AUTOINCREMENT,
+    MaterialName TEXT NOT NULL,
+    Category TEXT,
+    SubType TEXT,
+    UnitOfMeasure TEXT,
+    CostPerUnit REAL DEFAULT 0,
+    QuantityInStock REAL DEFAULT 0,
+    SupplierID INTEGER REFERENCES Suppliers(SupplierID) ON DELETE SET NULL
+);
+
+CREATE TABLE IF NOT EXISTS Products (
+    ProductID INTEGER PRIMARY KEY AUTOINCREMENT,
+    ProductName TEXT NOT NULL,
+    SKU TEXT UNIQUE,
+    Description TEXT,
+    Category TEXT,
+    MaterialType TEXT,
+    Dimensions TEXT,
+    CostPrice REAL DEFAULT 0,
+    SellingPrice REAL DEFAULT 0,
+    QuantityInStock INTEGER DEFAULT 0,
+    ReorderLevel INTEGER DEFAULT 0,
+    SupplierID INTEGER REFERENCES Suppliers(SupplierID) ON DELETE SET NULL,
+    ImagePath TEXT
+);
+
+CREATE TABLE IF NOT EXISTS Projects (
+    ProjectID INTEGER PRIMARY KEY AUTOINCREMENT,
+    ProjectName TEXT NOT NULL,
+    CustomerID INTEGER REFERENCES Customers(CustomerID),
+    StartDate TEXT,
+    EndDate TEXT,
+    Status TEXT,
+    Budget REAL DEFAULT 0,
+    Description TEXT
+);
+
+CREATE TABLE IF NOT EXISTS ProjectMaterials (
+    ProjectMaterialID INTEGER PRIMARY KEY AUTOINCREMENT,
+    ProjectID INTEGER NOT NULL REFERENCES Projects(ProjectID) ON DELETE CASCADE,
+    MaterialID INTEGER NOT NULL REFERENCES Materials(MaterialID),
+    QuantityUsed REAL NOT NULL,
+    CostPerUnitAtTimeOfUse REAL DEFAULT 0,
+    Notes TEXT,
+    DateAdded TEXT DEFAULT (date('now'))
+);
+
+CREATE TABLE IF NOT EXISTS SupplierServices (
+    ServiceID INTEGER PRIMARY KEY AUTOINCREMENT,
+    SupplierID INTEGER REFERENCES Suppliers(SupplierID) ON DELETE SET NULL,
+    ProjectID INTEGER REFERENCES Projects(ProjectID) ON DELETE SET NULL,
+    ServiceName TEXT NOT NULL,
+    ServiceType TEXT,
+    ServiceDate TEXT,
+    Cost REAL DEFAULT 0,
+    ReceiptPath TEXT,
+    Description TEXT,
+    IsExpenseLogged INTEGER DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS Orders (
+    OrderID INTEGER PRIMARY KEY AUTOINCREMENT,
+    OrderDate TEXT,
+    CustomerID INTEGER REFERENCES Customers(CustomerID),
+    ProjectID INTEGER REFERENCES Projects(ProjectID) ON DELETE SET NULL,
+    OrderStatus TEXT,
+    TotalAmount REAL DEFAULT 0,
+    PaymentStatus TEXT,
+    ShippingAddress TEXT,
+    Notes TEXT,
+    ReferenceID TEXT
+);
+
+CREATE TABLE IF NOT EXISTS OrderItems (
+    OrderItemID INTEGER PRIMARY KEY AUTOINCREMENT,
+    OrderID INTEGER NOT NULL REFERENCES Orders(OrderID) ON DELETE CASCADE,
+    ProductID INTEGER REFERENCES Products(ProductID),
+    QuantitySold INTEGER NOT NULL,
+    UnitPriceAtSale REAL NOT NULL,
+    Discount REAL DEFAULT 0,
+    LineTotal REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS Invoices (
+    InvoiceID INTEGER PRIMARY KEY AUTOINCREMENT,
+    InvoiceReferenceID TEXT NOT NULL UNIQUE,
+    ProjectID INTEGER REFERENCES Projects(ProjectID) ON DELETE SET NULL,
+    CustomerID INTEGER REFERENCES Customers(CustomerID),
+    IssueDate TEXT,
+    DueDate TEXT,
+    PaymentDate TEXT,
+    TotalAmount REAL DEFAULT 0,
+    Status TEXT,
+    Notes TEXT
+);
+
+CREATE TABLE IF NOT EXISTS Expenses (
+    ExpenseID INTEGER PRIMARY KEY AUTOINCREMENT,
+    ExpenseDate TEXT,
+    Description TEXT NOT NULL,
+    Category TEXT,
+    Amount REAL NOT NULL,
+    Vendor TEXT,
+    ProjectID INTEGER REFERENCES Projects(ProjectID) ON DELETE SET NULL,
+    ReceiptReference TEXT,
+    SupplierServiceID INTEGER REFERENCES SupplierServices(ServiceID) ON DELETE SET NULL
+);
+
+-- Per-customer history lists are keyset-paged by ID within one customer.
+CREATE INDEX IF NOT EXISTS idx_orders_customer ON Orders (CustomerID, OrderID);
+CREATE INDEX IF NOT EXISTS idx_invoices_customer ON Invoices (CustomerID, InvoiceID);
+CREATE INDEX IF NOT EXISTS idx_projects_customer ON Projects (CustomerID, ProjectID);
+
+-- Low-stock alerts only ever read products at or below their reorder level.
+CREATE INDEX IF NOT EXISTS idx_products_below_reorder ON Products (ProductID, QuantityInStock, ReorderLevel)
+    WHERE QuantityInStock <= ReorderLevel;
+CREATE INDEX IF NOT EXISTS idx_projectmaterials_date ON ProjectMaterials (DateAdded, MaterialID, QuantityUsed);
+
+-- Financial summaries range-scan paid invoices by the date they count on, and expenses by date.
+CREATE INDEX IF NOT EXISTS idx_invoices_paid_date ON Invoices (COALESCE(PaymentDate, IssueDate), TotalAmount)
+    WHERE Status = 'Paid';
+CREATE INDEX IF NOT EXISTS idx_expenses_date ON Expenses (ExpenseDate, Category, Amount);
+"""
+
+
+# --- Full-text search indexes ---
+# One FTS5 table per searchable entity, keyed by the entity's primary key (the FTS
+# rowid). Documents include looked-up names (supplier, project, customer), so
+# triggers on the parent tables refresh the affected documents when a name changes.
+# "parents" maps parent table -> (foreign key expression in source, parent key, name column).
+# Bulk writers list a table in SearchIndexBypass to skip its per-row insert trigger
+# and then index the new rows with one INSERT ... SELECT (see _index_search_rows_after).
+
+_SEARCH_INDEXES = {
+    "Customers": {
+        "key": "CustomerID",
+        "columns": ("CustomerName", "Email", "ReferenceID"),
+        "source": "SELECT CustomerID, CustomerName, Email, ReferenceID FROM Customers",
+        "key_expr": "CustomerID",
+        "parents": {},
+    },
+    "Suppliers": {
+        "key": "SupplierID",
+        "columns": ("SupplierName", "ContactPerson", "Email"),
+        "source": "SELECT SupplierID, SupplierName, ContactPerson, Email FROM Suppliers",
+        "key_expr": "SupplierID",
+        "parents": {},
+    },
+    "SupplierServices": {
+        "key": "ServiceID",
+        "columns": ("ServiceName", "ServiceType", "SupplierName", "ProjectName", "Description"),
+        "source": (
+            "SELECT ss.ServiceID, ss.ServiceName, ss.ServiceType, s.SupplierName, p.ProjectName, ss.Description "
+            "FROM SupplierServices ss LEFT JOIN Suppliers s ON s.SupplierID = ss.SupplierID "
+            "LEFT JOIN Projects p ON p.ProjectID = ss.ProjectID"
+        ),
+        "key_expr": "ss.ServiceID",
+        "parents": {
+            "Suppliers": ("ss.SupplierID", "SupplierID", "SupplierName"),
+            "Projects": ("ss.ProjectID", "ProjectID", "ProjectName"),
+        },
+    },
+    "Materials": {
+        "key": "MaterialID",
+        "columns": ("MaterialName", "Category", "SubType", "SupplierName"),
+        "source": (
+            "SELECT m.MaterialID, m.MaterialName, m.Category, m.SubType, s.SupplierName "
+            "FROM Materials m LEFT JOIN Suppliers s ON s.SupplierID = m.SupplierID"
+        ),
+        "key_expr": "m.MaterialID",
+        "parents": {"Suppliers": ("m.SupplierID", "SupplierID", "SupplierName")},
+    },
+    "Products": {
+        "key": "ProductID",
+        "columns": ("ProductName", "SKU", "Category", "SupplierName"),
+        "source": (
+            "SELECT pr.ProductID, pr.ProductName, pr.SKU, pr.Category, s.SupplierName "
+            "FROM Products pr LEFT JOIN Suppliers s ON s.SupplierID = pr.SupplierID"
+        ),
+        "key_expr": "pr.ProductID",
+        "parents": {"Suppliers": ("pr.SupplierID", "SupplierID", "SupplierName")},
+    },
+    "Projects": {
+        "key": "ProjectID",
+        "columns": ("ProjectName", "CustomerName", "Status"),
+        "source": (
+            "SELECT p.ProjectID, p.ProjectName, c.CustomerName, p.Status "
+            "FROM Projects p LEFT JOIN Customers c ON c.CustomerID = p.CustomerID"
+        ),
+        "key_expr": "p.ProjectID",
+        "parents": {"Customers": ("p.CustomerID", "CustomerID", "CustomerName")},
+    },
+    "Invoices": {
+        "key": "InvoiceID",
+        "columns": ("InvoiceReferenceID", "ProjectName", "CustomerName"),
+        "source": (
+            "SELECT i.InvoiceID, i.InvoiceReferenceID, p.ProjectName, c.CustomerName "
+            "FROM Invoices i LEFT JOIN Projects p ON p.ProjectID = i.ProjectID "
+            "LEFT JOIN Customers c ON c.CustomerID = i.CustomerID"
+        ),
+        "key_expr": "i.InvoiceID",
+        "parents": {
+            "Projects": ("i.ProjectID", "ProjectID", "ProjectName"),
+            "Customers": ("i.CustomerID", "CustomerID", "CustomerName"),
+        },
+    },
+}
+
+
+def _search_table(table):
+    return f"{table}Search"
+
+
+def _search_insert_trigger(table, spec):
+    fts = _search_table(table)
+    return (
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} "
+        f"WHEN NOT EXISTS (SELECT 1 FROM SearchIndexBypass WHERE TableName = '{table}') BEGIN "
+        f"INSERT INTO {fts}(rowid, {', '.join(spec['columns'])}) {spec['source']} "
+        f"WHERE {spec['key_expr']} = NEW.{spec['key']}; END"
+    )
+
+
+def _search_index_ddl(table, spec):
+    fts = _search_table(table)
+    columns = ", ".join(spec["columns"])
+    insert = f"INSERT INTO {fts}(rowid, {columns}) {spec['source']}"
+    statements = [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({columns}, "
+        f"tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')",
+        _search_insert_trigger(table, spec),
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE ON {table} BEGIN "
+        f"DELETE FROM {fts} WHERE rowid = OLD.{spec['key']}; "
+        f"{insert} WHERE {spec['key_expr']} = NEW.{spec['key']}; END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN "
+        f"DELETE FROM {fts} WHERE rowid = OLD.{spec['key']}; END",
+    ]
+    for parent, (fk_expr, parent_key, name_column) in spec["parents"].items():
+        fk_column = fk_expr.split(".")[-1]
+        statements.append(
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_{parent}_au AFTER UPDATE OF {name_column} ON {parent} BEGIN "
+            f"DELETE FROM {fts} WHERE rowid IN (SELECT {spec['key']} FROM {table} WHERE {fk_column} = NEW.{parent_key}); "
+            f"{insert} WHERE {fk_expr} = NEW.{parent_key}; END"
+        )
+    return statements
+
+
+def _ensure_search_bypass(conn):
+    conn.execute("CREATE TABLE IF NOT EXISTS SearchIndexBypass (TableName TEXT PRIMARY KEY)")
+
+
+def _ensure_search_indexes(conn):
+    _ensure_search_bypass(conn)
+    existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    for table, spec in _SEARCH_INDEXES.items():
+        if _search_table(table) in existing:
+            continue
+        with transaction():
+            for statement in _search_index_ddl(table, spec):
+                conn.execute(statement)
+            _rebuild_search_index(conn, table)
+
+
+def _rebuild_search_index(conn, table):
+    spec = _SEARCH_INDEXES[table]
+    fts = _search_table(table)
+    conn.execute(f"DELETE FROM {fts}")
+    conn.execute(f"INSERT INTO {fts}(rowid, {', '.join(spec['columns'])}) {spec['source']}")
+
+
+def _bypassable_search_triggers(conn):
+    _ensure_search_bypass(conn)
+    for table, spec in _SEARCH_INDEXES.items():
+        conn.execute(f"DROP TRIGGER IF EXISTS {_search_table(table)}_ai")
+        conn.execute(_search_insert_trigger(table, spec))
+
+
+def _index_search_rows_after(conn, table, last_key):
+    """Indexes the rows of `table` keyed above last_key, for inserts made while the table was bypassed."""
+    spec = _SEARCH_INDEXES[table]
+    conn.execute(f"INSERT INTO {_search_table(table)}(rowid, {', '.join(spec['columns'])}) {spec['source']} "
+                 f"WHERE {spec['key_expr']} > ?", (last_key,))
+
+
+def rebuild_search_indexes():
+    """Repopulates every full-text index from its source tables."""
+    with transaction() as conn:
+        for table in _SEARCH_INDEXES:
+            _rebuild_search_index(conn, table)
+        for table in _SEARCH_INDEXES:
+            conn.execute(f"INSERT INTO {_search_table(table)}({_search_table(table)}) VALUES ('optimize')")
+
+
+def _fts_query(search_term):
+    """Turns free text into an FTS5 query where every word must match as a prefix."""
+    tokens = re.findall(r"\w+", search_term or "", re.UNICODE)
+    return " ".join(f'"{token}"*' for token in tokens) or None
+
+
+def _search_page_query(table, select_sql, key_column, search_term, limit=None, after=None):
+    """Best-ranked matches first; `after` is the (SearchRank, key) pair of the previous page's last row."""
+    fts = _search_table(table)
+    sql = (f"{select_sql.replace('SELECT ', f'SELECT {fts}.rank AS SearchRank, ', 1)} "
+           f"JOIN {fts} ON {fts}.rowid = {key_column} WHERE {fts} MATCH ?")
+    params = (_fts_query(search_term),)
+    if after is not None:
+        sql += f" AND ({fts}.rank, {key_column}) > (?, ?)"
+        params += tuple(after)
+    sql += f" ORDER BY {fts}.rank, {key_column}"
+    if limit:
+        sql += " LIMIT ?"
+        params += (int(limit),)
+    return sql, params
+
+
+def _fetch_search_page(table, select_sql, key_column, search_term, limit=None, after=None):
+    return _fetch_all(*_search_page_query(table, select_sql, key_column, search_term, limit, after))
+
+
+def _count_search_matches(table, search_term):
+    fts = _search_table(table)
+    return _fetch_value(f"SELECT COUNT(*) FROM {fts} WHERE {fts} MATCH ?", (_fts_query(search_term),), 0)
+
+
+# --- Dashboard KPI snapshot ---
+# The Dashboard tiles read one small table instead of counting and summing whole
+# tables. Triggers apply each insert/update/delete as a delta, so the snapshot is
+# kept current by every write path (add_invoice, update_invoice, add_expense, ...).
+# Each KPI is (source table, per-row value, optional condition) with {row} standing
+# for NEW/OLD inside triggers and for the table itself when seeding.
+
+_DASHBOARD_KPIS = {
+    "TotalCustomers": ("Customers", "1", None),
+    "TotalProducts": ("Products", "1", None),
+    "TotalSuppliers": ("Suppliers", "1", None),
+    "TotalMaterials": ("Materials", "1", None),
+    "TotalProjects": ("Projects", "1", None),
+    "TotalSupplierServices": ("SupplierServices", "1", None),
+    "PaidInvoiceRevenue": ("Invoices", "COALESCE({row}.TotalAmount, 0)", "{row}.Status = 'Paid'"),
+    "TotalExpenses": ("Expenses", "COALESCE({row}.Amount, 0)", None),
+}
+
+
+def _kpi_contribution(value, condition, row):
+    value = value.format(row=row)
+    if condition is None:
+        return value
+    return f"(CASE WHEN {condition.format(row=row)} THEN {value} ELSE 0 END)"
+
+
+def _dashboard_kpi_ddl():
+    statements = ["CREATE TABLE IF NOT EXISTS DashboardKPIs (Metric TEXT PRIMARY KEY, Value REAL NOT NULL DEFAULT 0)"]
+    tables = sorted({table for table, _, _ in _DASHBOARD_KPIS.values()})
+    for table in tables:
+        metrics = [(name, value, condition) for name, (source, value, condition) in _DASHBOARD_KPIS.items() if source == table]
+        on_insert = " ".join(
+            f"UPDATE DashboardKPIs SET Value = Value + {_kpi_contribution(v, c, 'NEW')} WHERE Metric = '{n}';"
+            for n, v, c in metrics
+        )
+        on_delete = " ".join(
+            f"UPDATE DashboardKPIs SET Value = Value - {_kpi_contribution(v, c, 'OLD')} WHERE Metric = '{n}';"
+            for n, v, c in metrics
+        )
+        statements.append(f"CREATE TRIGGER IF NOT EXISTS {table}_kpi_ai AFTER INSERT ON {table} BEGIN {on_insert} END")
+        statements.append(f"CREATE TRIGGER IF NOT EXISTS {table}_kpi_ad AFTER DELETE ON {table} BEGIN {on_delete} END")
+        # Plain row counts cannot change on UPDATE, so only value/condition KPIs need an update trigger.
+        on_update = " ".join(
+            f"UPDATE DashboardKPIs SET Value = Value + {_kpi_contribution(v, c, 'NEW')} - {_kpi_contribution(v, c, 'OLD')} "
+            f"WHERE Metric = '{n}';"
+            for n, v, c in metrics if v != "1" or c is not None
+        )
+        if on_update:
+            statements.append(f"CREATE TRIGGER IF NOT EXISTS {table}_kpi_au AFTER UPDATE ON {table} BEGIN {on_update} END")
+    return statements
+
+
+def _ensure_dashboard_kpis(conn):
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'DashboardKPIs'").fetchone()
+    if exists:
+        return
+    with transaction():
+        for statement in _dashboard_kpi_ddl():
+            conn.execute(statement)
+        _seed_dashboard_kpis(conn)
+
+
+def _seed_dashboard_kpis(conn):
+    for name, (table, value, condition) in _DASHBOARD_KPIS.items():
+        conn.execute(
+            f"INSERT OR REPLACE INTO DashboardKPIs (Metric, Value) "
+            f"SELECT ?, COALESCE(SUM({_kpi_contribution(value, condition, table)}), 0) FROM {table}",
+            (name,),
+        )
+
+
+def refresh_dashboard_kpis():
+    """Recomputes the KPI snapshot from COUNT/SUM over the source tables."""
+    with transaction() as conn:
+        _seed_dashboard_kpis(conn)
+
+
+def get_dashboard_kpis():
+    kpis = {name: 0 for name in _DASHBOARD_KPIS}
+    for row in _fetch_all("SELECT Metric, Value FROM DashboardKPIs"):
+        kpis[row["Metric"]] = row["Value"]
+    for name, (_, value, condition) in _DASHBOARD_KPIS.items():
+        if value == "1" and condition is None:
+            kpis[name] = int(kpis[name])
+    return kpis
+
+
+# --- Stock ledger ---
+# Every change to Products/Materials.QuantityInStock is also appended to
+# StockMovements with the reason and the record that caused it. QuantityInStock
+# stays the maintained balance that pages read directly; the ledger is the audit
+# trail and can be replayed by rebuild_stock_from_ledger() to verify it.
+
+_STOCK_ITEMS = {
+    "Product": ("Products", "ProductID", "ProductName"),
+    "Material": ("Materials", "MaterialID", "MaterialName"),
+}
+
+_STOCK_LEDGER_DDL = (
+    """
+    CREATE TABLE IF NOT EXISTS StockMovements (
+        MovementID INTEGER PRIMARY KEY AUTOINCREMENT,
+        ItemType TEXT NOT NULL CHECK (ItemType IN ('Product', 'Material')),
+        ItemID INTEGER NOT NULL,
+        QuantityChange REAL NOT NULL,
+        Reason TEXT NOT NULL,
+        ReferenceType TEXT,
+        ReferenceID INTEGER,
+        MovementDate TEXT NOT NULL DEFAULT (datetime('now')),
+        Notes TEXT
+    )
+    """,
+    # Covers both the per-item history and the grouped replay without touching the table.
+    "CREATE INDEX IF NOT EXISTS idx_stockmovements_item ON StockMovements (ItemType, ItemID, QuantityChange)",
+)
+
+
+def _ensure_stock_ledger(conn):
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'StockMovements'").fetchone()
+    if exists:
+        return
+    with transaction():
+        for statement in _STOCK_LEDGER_DDL:
+            conn.execute(statement)
+        # Existing balances become the opening movements so the ledger sums match from day one.
+        for item_type, (table, key, _) in _STOCK_ITEMS.items():
+            conn.execute(
+                f"INSERT INTO StockMovements (ItemType, ItemID, QuantityChange, Reason) "
+                f"SELECT ?, {key}, QuantityInStock, 'Opening' FROM {table} WHERE COALESCE(QuantityInStock, 0) <> 0",
+                (item_type,),
+            )
+
+
+def _record_stock_movement(conn, item_type, item_id, quantity_change, reason, reference_type=None, reference_id=None,
+                           notes=None):
+    if not quantity_change:
+        return
+    conn.execute(
+        "INSERT INTO StockMovements (ItemType, ItemID, QuantityChange, Reason, ReferenceType, ReferenceID, Notes) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+        (item_type, item_id, quantity_change, reason, reference_type, reference_id, notes),
+    )
+
+
+def _apply_stock_change(conn, item_type, item_id, quantity_change, reason, reference_type=None, reference_id=None,
+                        notes=None):
+    """Moves the balance and appends the matching ledger row inside the caller's transaction."""
+    table, key, _ = _STOCK_ITEMS[item_type]
+    _invalidate_reference_lists(table)
+    cur = conn.execute(
+        f"UPDATE {table} SET QuantityInStock = COALESCE(QuantityInStock, 0) + ? WHERE {key} = ?",
+        (quantity_change, item_id),
+    )
+    if cur.rowcount:
+        _record_stock_movement(conn, item_type, item_id, quantity_change, reason, reference_type, reference_id, notes)
+
+
+def _set_stock_balance(conn, item_type, item_id, quantity, reason="Adjustment", notes=None):
+    """Sets an absolute balance (edit forms) and records the difference as one movement."""
+    table, key, _ = _STOCK_ITEMS[item_type]
+    current = conn.execute(f"SELECT COALESCE(QuantityInStock, 0) FROM {table} WHERE {key} = ?", (item_id,)).fetchone()
+    if current is None:
+        return
+    _record_stock_movement(conn, item_type, item_id, (quantity or 0) - current[0], reason, notes=notes)
+
+
+def get_stock_movements(item_type, item_id, limit=50):
+    """Most recent movements first for one product or material."""
+    return _fetch_all(
+        "SELECT * FROM StockMovements WHERE ItemType = ? AND ItemID = ? ORDER BY MovementID DESC LIMIT ?",
+        (item_type, item_id, int(limit)),
+    )
+
+
+def rebuild_stock_from_ledger(apply=False, batch_size=1000):
+    """Replays the ledger and returns the items whose balance disagrees with it.
+
+    The per-item sums are computed by SQLite from the covering index and read back in
+    batches of `batch_size`, so memory stays flat however many movements exist. Each
+    discrepancy is a dict with ItemType, ItemID, ItemName, Balance and LedgerTotal; with
+    apply=True the balances are reset to the ledger totals in the same transaction.
+    """
+    discrepancies = []
+    with transaction() as conn:
+        for item_type, (table, key, name_column) in _STOCK_ITEMS.items():
+            cur = conn.execute(
+                f"""
+                SELECT i.{key} AS ItemID, i.{name_column} AS ItemName, COALESCE(i.QuantityInStock, 0) AS Balance,
+                       COALESCE(l.LedgerTotal, 0) AS LedgerTotal
+                FROM {table} i
+                LEFT JOIN (
+                    SELECT ItemID, SUM(QuantityChange) AS LedgerTotal
+                    FROM StockMovements WHERE ItemType = ? GROUP BY ItemID
+                ) l ON l.ItemID = i.{key}
+                WHERE ABS(COALESCE(i.QuantityInStock, 0) - COALESCE(l.LedgerTotal, 0)) > 1e-9
+                """,
+                (item_type,),
+            )
+            while True:
+                rows = cur.fetchmany(batch_size)
+                if not rows:
+                    break
+                discrepancies.extend(dict(row, ItemType=item_type) for row in rows)
+            if apply:
+                fixes = [(d["LedgerTotal"], d["ItemID"]) for d in discrepancies if d["ItemType"] == item_type]
+                if fixes:
+                    _invalidate_reference_lists(table)
+                    conn.executemany(f"UPDATE {table} SET QuantityInStock = ? WHERE {key} = ?", fixes)
+    return discrepancies
+
+
+# --- Order totals ---
+# Orders.TotalAmount is kept equal to the sum of its lines by OrderItems
+# triggers, so no write path has to remember to call update_order_total().
+
+_ORDER_TOTAL_TRIGGERS = (
+    """
+    CREATE TRIGGER IF NOT EXISTS OrderItems_total_ai AFTER INSERT ON OrderItems BEGIN
+        UPDATE Orders SET TotalAmount = COALESCE(TotalAmount, 0) + NEW.LineTotal WHERE OrderID = NEW.OrderID;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS OrderItems_total_au AFTER UPDATE OF OrderID, LineTotal ON OrderItems BEGIN
+        UPDATE Orders SET TotalAmount = COALESCE(TotalAmount, 0) - OLD.LineTotal WHERE OrderID = OLD.OrderID;
+        UPDATE Orders SET TotalAmount = COALESCE(TotalAmount, 0) + NEW.LineTotal WHERE OrderID = NEW.OrderID;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS OrderItems_total_ad AFTER DELETE ON OrderItems BEGIN
+        UPDATE Orders SET TotalAmount = COALESCE(TotalAmount, 0) - OLD.LineTotal WHERE OrderID = OLD.OrderID;
+    END
+    """,
+)
+
+
+def _ensure_order_total_triggers(conn):
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = 'OrderItems_total_ai'"
+    ).fetchone()
+    if exists:
+        return
+    with transaction():
+        for statement in _ORDER_TOTAL_TRIGGERS:
+            conn.execute(statement)
+        # Totals written before the triggers existed may have drifted from their lines.
+        _recompute_order_totals(conn)
+
+
+def _recompute_order_totals(conn):
+    return conn.execute(
+        """
+        UPDATE Orders SET TotalAmount = totals.LineSum
+        FROM (SELECT OrderID, SUM(LineTotal) AS LineSum FROM OrderItems GROUP BY OrderID) AS totals
+        WHERE totals.OrderID = Orders.OrderID
+          AND (Orders.TotalAmount IS NULL OR ABS(Orders.TotalAmount - totals.LineSum) > 1e-9)
+        """
+    ).rowcount
+
+
+def recompute_all_order_totals():
+    """Resets every order that has lines to the sum of its LineTotals in one UPDATE; returns how many changed.
+
+    Orders without lines keep the TotalAmount they were created with.
+    """
+    with transaction() as conn:
+        return _recompute_order_totals(conn)
+
+
+# --- Daily product sales ---
+# DailyProductSales holds one row per (day, product) with the quantities and
+# amounts of every non-cancelled order line. Triggers on OrderItems and Orders
+# apply each change as a signed delta, so add_order_item, create_order_with_items
+# and order edits keep it current and the Sales by Product report never has to
+# scan OrderItems.
+
+_DAILY_SALES_COUNTED = "{o}.OrderDate IS NOT NULL AND COALESCE({o}.OrderStatus, '') <> 'Cancelled'"
+
+
+def _daily_sales_upsert(select_sql):
+    return (
+        f"INSERT INTO DailyProductSales (SaleDate, ProductID, Quantity, Gross, Discount, Net) {select_sql} "
+        "ON CONFLICT (SaleDate, ProductID) DO UPDATE SET Quantity = Quantity + excluded.Quantity, "
+        "Gross = Gross + excluded.Gross, Discount = Discount + excluded.Discount, Net = Net + excluded.Net;"
+    )
+
+
+def _daily_sales_line_delta(line, sign):
+    """Upsert for one OrderItems row (NEW or OLD), read against its order's date and status."""
+    return _daily_sales_upsert(
+        f"SELECT date(o.OrderDate), {line}.ProductID, {sign} * {line}.QuantitySold, "
+        f"{sign} * {line}.QuantitySold * {line}.UnitPriceAtSale, {sign} * COALESCE({line}.Discount, 0), "
+        f"{sign} * {line}.LineTotal FROM Orders o WHERE o.OrderID = {line}.OrderID AND {line}.ProductID IS NOT NULL "
+        f"AND {_DAILY_SALES_COUNTED.format(o='o')}"
+    )
+
+
+def _daily_sales_order_delta(order, sign):
+    """Upsert for all lines of one Orders row (NEW or OLD), used when its date or status changes."""
+    return _daily_sales_upsert(
+        f"SELECT date({order}.OrderDate), oi.ProductID, {sign} * SUM(oi.QuantitySold), "
+        f"{sign} * SUM(oi.QuantitySold * oi.UnitPriceAtSale), {sign} * SUM(COALESCE(oi.Discount, 0)), "
+        f"{sign} * SUM(oi.LineTotal) FROM OrderItems oi WHERE oi.OrderID = {order}.OrderID "
+        f"AND oi.ProductID IS NOT NULL AND {_DAILY_SALES_COUNTED.format(o=order)} GROUP BY oi.ProductID"
+    )
+
+
+def _daily_sales_ddl():
+    return [
+        """
+        CREATE TABLE IF NOT EXISTS DailyProductSales (
+            SaleDate TEXT NOT NULL,
+            ProductID INTEGER NOT NULL,
+            Quantity INTEGER NOT NULL DEFAULT 0,
+            Gross REAL NOT NULL DEFAULT 0,
+            Discount REAL NOT NULL DEFAULT 0,
+            Net REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (SaleDate, ProductID)
+        ) WITHOUT ROWID
+        """,
+        f"CREATE TRIGGER IF NOT EXISTS OrderItems_sales_ai AFTER INSERT ON OrderItems BEGIN "
+        f"{_daily_sales_line_delta('NEW', 1)} END",
+        f"CREATE TRIGGER IF NOT EXISTS OrderItems_sales_au AFTER UPDATE OF OrderID, ProductID, QuantitySold, "
+        f"UnitPriceAtSale, Discount, LineTotal ON OrderItems BEGIN "
+        f"{_daily_sales_line_delta('OLD', -1)} {_daily_sales_line_delta('NEW', 1)} END",
+        f"CREATE TRIGGER IF NOT EXISTS OrderItems_sales_ad AFTER DELETE ON OrderItems BEGIN "
+        f"{_daily_sales_line_delta('OLD', -1)} END",
+        f"CREATE TRIGGER IF NOT EXISTS Orders_sales_au AFTER UPDATE OF OrderDate, OrderStatus ON Orders "
+        f"WHEN OLD.OrderDate IS NOT NEW.OrderDate OR OLD.OrderStatus IS NOT NEW.OrderStatus BEGIN "
+        f"{_daily_sales_order_delta('OLD', -1)} {_daily_sales_order_delta('NEW', 1)} END",
+        # Cascaded line deletes run after the order row is gone, so the order takes its lines out first.
+        f"CREATE TRIGGER IF NOT EXISTS Orders_sales_bd BEFORE DELETE ON Orders BEGIN "
+        f"{_daily_sales_order_delta('OLD', -1)} END",
+    ]
+
+
+def _ensure_daily_product_sales(conn):
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'DailyProductSales'"
+    ).fetchone()
+    if exists:
+        return
+    with transaction():
+        for statement in _daily_sales_ddl():
+            conn.execute(statement)
+        _seed_daily_product_sales(conn)
+
+
+def _seed_daily_product_sales(conn):
+    conn.execute("DELETE FROM DailyProductSales")
+    conn.execute(
+        f"""
+        INSERT INTO DailyProductSales (SaleDate, ProductID, Quantity, Gross, Discount, Net)
+        SELECT date(o.OrderDate), oi.ProductID, SUM(oi.QuantitySold), SUM(oi.QuantitySold * oi.UnitPriceAtSale),
+               SUM(COALESCE(oi.Discount, 0)), SUM(oi.LineTotal)
+        FROM OrderItems oi
+        JOIN Orders o ON o.OrderID = oi.OrderID
+        WHERE oi.ProductID IS NOT NULL AND {_DAILY_SALES_COUNTED.format(o='o')}
+        GROUP BY date(o.OrderDate), oi.ProductID
+        """
+    )
+
+
+def refresh_daily_product_sales():
+    """Rebuilds DailyProductSales from OrderItems and Orders."""
+    with transaction() as conn:
+        _seed_daily_product_sales(conn)
+
+
+# --- Inventory velocity ---
+# InventoryVelocity holds how much of each product and material was consumed in a
+# rolling window of closed days (sales from DailyProductSales, project usage from
+# ProjectMaterials). Triggers on those tables apply back-dated changes that fall
+# inside the window, and refresh_inventory_velocity() rolls the window forward by
+# adding the days that enter it and subtracting the days that leave it.
+
+_INVENTORY_VELOCITY_DDL = (
+    """
+    CREATE TABLE IF NOT EXISTS InventoryVelocity (
+        ItemType TEXT NOT NULL,
+        ItemID INTEGER NOT NULL,
+        Consumed REAL NOT NULL DEFAULT 0,
+        PRIMARY KEY (ItemType, ItemID)
+    ) WITHOUT ROWID
+    """,
+    "CREATE TABLE IF NOT EXISTS InventoryVelocityWindow (WindowStart TEXT NOT NULL, WindowEnd TEXT NOT NULL)",
+)
+
+# (trigger source table, item type, item column, quantity column, date column)
+_VELOCITY_SOURCES = (
+    ("DailyProductSales", "Product", "ProductID", "Quantity", "SaleDate"),
+    ("ProjectMaterials", "Material", "MaterialID", "QuantityUsed", "DateAdded"),
+)
+
+
+def _velocity_delta(item_type, item_column, quantity_column, date_column, row, sign):
+    return (
+        f"INSERT INTO InventoryVelocity (ItemType, ItemID, Consumed) "
+        f"SELECT '{item_type}', {row}.{item_column}, {sign} * {row}.{quantity_column} FROM InventoryVelocityWindow w "
+        f"WHERE {row}.{date_column} BETWEEN w.WindowStart AND w.WindowEnd "
+        f"ON CONFLICT (ItemType, ItemID) DO UPDATE SET Consumed = Consumed + excluded.Consumed;"
+    )
+
+
+def _inventory_velocity_triggers():
+    statements = []
+    for table, item_type, item_column, quantity_column, date_column in _VELOCITY_SOURCES:
+        columns = (item_type, item_column, quantity_column, date_column)
+        statements.append(
+            f"CREATE TRIGGER IF NOT EXISTS {table}_velocity_ai AFTER INSERT ON {table} BEGIN "
+            f"{_velocity_delta(*columns, 'NEW', 1)} END"
+        )
+        statements.append(
+            f"CREATE TRIGGER IF NOT EXISTS {table}_velocity_au AFTER UPDATE OF {item_column}, {quantity_column}, "
+            f"{date_column} ON {table} BEGIN {_velocity_delta(*columns, 'OLD', -1)} "
+            f"{_velocity_delta(*columns, 'NEW', 1)} END"
+        )
+        statements.append(
+            f"CREATE TRIGGER IF NOT EXISTS {table}_velocity_ad AFTER DELETE ON {table} BEGIN "
+            f"{_velocity_delta(*columns, 'OLD', -1)} END"
+        )
+    return statements
+
+
+def _ensure_inventory_velocity(conn):
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'InventoryVelocity'"
+    ).fetchone()
+    if exists:
+        return
+    with transaction():
+        for statement in _INVENTORY_VELOCITY_DDL:
+            conn.execute(statement)
+        for statement in _inventory_velocity_triggers():
+            conn.execute(statement)
+
+
+def _add_consumption(conn, sign, date_from, date_to):
+    """Adds (sign=1) or removes (sign=-1) the consumption recorded between two dates, inclusive."""
+    for table, item_type, item_column, quantity_column, date_column in _VELOCITY_SOURCES:
+        conn.execute(
+            f"""
+            INSERT INTO InventoryVelocity (ItemType, ItemID, Consumed)
+            SELECT ?, {item_column}, ? * SUM({quantity_column}) FROM {table}
+            WHERE {date_column} BETWEEN ? AND ? AND {item_column} IS NOT NULL
+            GROUP BY {item_column}
+            ON CONFLICT (ItemType, ItemID) DO UPDATE SET Consumed = Consumed + excluded.Consumed
+            """,
+            (item_type, sign, date_from, date_to),
+        )
+
+
+def _stored_velocity_window(conn):
+    state = conn.execute("SELECT WindowStart, WindowEnd FROM InventoryVelocityWindow").fetchone()
+    return (date.fromisoformat(state[0]), date.fromisoformat(state[1])) if state else (None, None)
+
+
+def refresh_inventory_velocity(window_days=VELOCITY_WINDOW_DAYS, as_of=None):
+    """Moves the velocity window to the `window_days` closed days before `as_of` (default today).
+
+    When the new window overlaps the stored one of the same length only the days that
+    enter and leave it are read; otherwise the window is rebuilt. A no-op when current:
+    the window is checked without a transaction, so the write lock is only taken to move it.
+    """
+    as_of = as_of or date.today()
+    new_start, new_end = as_of - timedelta(days=window_days), as_of - timedelta(days=1)
+    if _stored_velocity_window(get_connection()) == (new_start, new_end):
+        return
+    with transaction() as conn:
+        old_start, old_end = _stored_velocity_window(conn)
+        if (old_start, old_end) == (new_start, new_end):
+            return
+        if old_start and old_end - old_start == new_end - new_start and old_end < new_end and new_start <= old_end:
+            _add_consumption(conn, -1, old_start.isoformat(), (new_start - timedelta(days=1)).isoformat())
+            _add_consumption(conn, 1, (old_end + timedelta(days=1)).isoformat(), new_end.isoformat())
+            conn.execute("DELETE FROM InventoryVelocity WHERE ABS(Consumed) < 1e-9")
         else:
-            st.info("No projects available for reporting.")
+            conn.execute("DELETE FROM InventoryVelocity")
+            _add_consumption(conn, 1, new_start.isoformat(), new_end.isoformat())
+        conn.execute("DELETE FROM InventoryVelocityWindow")
+        conn.execute(
+            "INSERT INTO InventoryVelocityWindow (WindowStart, WindowEnd) VALUES (?, ?)",
+            (new_start.isoformat(), new_end.isoformat()),
+        )
+
+
+# --- Financial rollups ---
+# Closed calendar months never change unless someone back-dates an invoice or
+# expense, so their Revenue/COGS/OpEx totals are cached in FinancialMonthlyRollup.
+# Triggers drop the cached month of any invoice or expense that is written, and
+# get_financial_summary() refills missing months with one GROUP BY.
+
+_PAID_INVOICE_DATE = "COALESCE({row}PaymentDate, {row}IssueDate)"
+
+_PERIOD_BUCKETS = {
+    "day": "date({col})",
+    "week": "date({col}, 'weekday 0', '-6 days')",  # Monday the week starts on
+    "month": "strftime('%Y-%m-01', {col})",
+    "quarter": "printf('%s-%02d-01', strftime('%Y', {col}), (CAST(strftime('%m', {col}) AS INTEGER) - 1) / 3 * 3 + 1)",
+}
+
+
+def _financial_rollup_ddl():
+    statements = [
+        """
+        CREATE TABLE IF NOT EXISTS FinancialMonthlyRollup (
+            Month TEXT PRIMARY KEY,
+            Revenue REAL NOT NULL DEFAULT 0,
+            COGS REAL NOT NULL DEFAULT 0,
+            OperatingExpenses REAL NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+        """
+    ]
+    sources = {
+        "Invoices": lambda row: _PAID_INVOICE_DATE.format(row=f"{row}."),
+        "Expenses": lambda row: f"{row}.ExpenseDate",
+    }
+    for table, date_of in sources.items():
+        def forget(row):
+            return f"DELETE FROM FinancialMonthlyRollup WHERE Month = strftime('%Y-%m-01', {date_of(row)});"
+        statements.append(f"CREATE TRIGGER IF NOT EXISTS {table}_rollup_ai AFTER INSERT ON {table} BEGIN {forget('NEW')} END")
+        statements.append(
+            f"CREATE TRIGGER IF NOT EXISTS {table}_rollup_au AFTER UPDATE ON {table} BEGIN {forget('OLD')} {forget('NEW')} END"
+        )
+        statements.append(f"CREATE TRIGGER IF NOT EXISTS {table}_rollup_ad AFTER DELETE ON {table} BEGIN {forget('OLD')} END")
+    return statements
+
+
+def _ensure_financial_rollups(conn):
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'FinancialMonthlyRollup'"
+    ).fetchone()
+    if exists:
+        return
+    with transaction():
+        for statement in _financial_rollup_ddl():
+            conn.execute(statement)
+
+
+# --- Managed indexes ---
+# Each per-parent lookup gets an index that leads with the parent key and goes
+# on with the lookup's ORDER BY columns, so it reads one index range already in
+# display order (every index ends in the rowid, which covers ORDER BY <primary
+# key>). The child side of every foreign key is indexed as well, so cascades
+# and parent deletes don't scan the child table. Orders and invoices by
+# customer already have idx_orders_customer / idx_invoices_customer from the
+# base schema: the customer page keyset-pages them by ID, and a second
+# CustomerID index for the by-date lists would only add write cost, so those
+# lists sort just that customer's rows. index_advisor.py reports on these
+# indexes by name; changes go in through a new migration.
+
+MANAGED_INDEXES = {
+    # Orders.ProjectID is SET NULL when a project goes
+    "idx_orders_project": "Orders (ProjectID)",
+    # get_order_items_by_order_id, the order total triggers and product deletes
+    "idx_orderitems_order": "OrderItems (OrderID)",
+    "idx_orderitems_product": "OrderItems (ProductID)",
+    # get_invoices_by_project_id, and the newest-first invoice lists
+    "idx_invoices_project_date": "Invoices (ProjectID, IssueDate, InvoiceID)",
+    "idx_invoices_issue_date": "Invoices (IssueDate, InvoiceID)",
+    # Project profitability groups paid revenue per project straight from this index
+    "idx_invoices_paid_project": "Invoices (ProjectID, COALESCE(PaymentDate, IssueDate), TotalAmount) WHERE Status = 'Paid'",
+    # get_expenses_by_project_id; Expenses.SupplierServiceID is SET NULL when a service goes
+    "idx_expenses_project_date": "Expenses (ProjectID, ExpenseDate, ExpenseID)",
+    "idx_expenses_service": "Expenses (SupplierServiceID)",
+    # get_services_for_project and supplier deletes
+    "idx_supplierservices_project_date": "SupplierServices (ProjectID, ServiceDate, ServiceID)",
+    "idx_supplierservices_supplier": "SupplierServices (SupplierID)",
+    # get_materials_for_project and material deletes
+    "idx_projectmaterials_project": "ProjectMaterials (ProjectID)",
+    "idx_projectmaterials_material": "ProjectMaterials (MaterialID)",
+    # get_materials_by_category, and supplier deletes for materials and products
+    "idx_materials_category": "Materials (Category, MaterialName, MaterialID)",
+    "idx_materials_supplier": "Materials (SupplierID)",
+    "idx_products_supplier": "Products (SupplierID)",
+}
+
+
+def _ensure_managed_indexes(conn):
+    for name, definition in MANAGED_INDEXES.items():
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {definition}")
+
+
+# --- Migrations ---
+# The schema is built by numbered migrations, applied in order and recorded in
+# schema_version. Each one runs in its own write transaction together with its
+# schema_version row, and re-checks the version inside it, so two processes
+# starting at once apply each migration exactly once. The steps are idempotent,
+# which lets databases created before schema_version existed upgrade in place.
+# New schema changes are appended here; never edit or reorder an applied one.
+
+def _schema_statements():
+    statement = ""
+    for line in _SCHEMA.splitlines(keepends=True):
+        statement += line
+        if sqlite3.complete_statement(statement):
+            yield statement.strip()
+            statement = ""
+
+
+def _create_base_schema(conn):
+    for statement in _schema_statements():
+        conn.execute(statement)
+
+
+_MIGRATIONS = (
+    (1, "Base tables and indexes", _create_base_schema),
+    (2, "Full-text search indexes", _ensure_search_indexes),
+    (3, "Dashboard KPI counters", _ensure_dashboard_kpis),
+    (4, "Stock movement ledger", _ensure_stock_ledger),
+    (5, "Order total triggers", _ensure_order_total_triggers),
+    (6, "Daily product sales", _ensure_daily_product_sales),
+    (7, "Inventory velocity", _ensure_inventory_velocity),
+    (8, "Financial month rollups", _ensure_financial_rollups),
+    (9, "Foreign-key and filter indexes", _ensure_managed_indexes),
+    (10, "Search index bypass for bulk imports", _bypassable_search_triggers),
+)
+SCHEMA_VERSION = _MIGRATIONS[-1][0]
+
+_migrated_db_file = None  # DB_FILE this process already brought up to SCHEMA_VERSION
+
+
+def get_schema_version(conn=None):
+    """Highest applied migration, or 0 for a database without schema_version."""
+    conn = conn or get_connection()
+    try:
+        return conn.execute("SELECT MAX(Version) FROM schema_version").fetchone()[0] or 0
+    except sqlite3.OperationalError:
+        return 0
+
+
+def migrate():
+    """Applies the migrations the database has not seen yet; returns the resulting version."""
+    conn = get_connection()
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS schema_version ("
+        "Version INTEGER PRIMARY KEY, Name TEXT NOT NULL, AppliedAt TEXT NOT NULL DEFAULT (datetime('now')))"
+    )
+    for version, name, migration in _MIGRATIONS:
+        with transaction():
+            if get_schema_version(conn) >= version:
+                continue
+            migration(conn)
+            conn.execute("INSERT INTO schema_version (Version, Name) VALUES (?, ?)", (version, name))
+    return get_schema_version(conn)
+
+
+def init_db():
+    """Makes sure the folders and schema exist; after the first call per process it returns immediately."""
+    global _migrated_db_file
+    if _migrated_db_file == DB_FILE:
+        return
+    for directory in (IMAGE_DIR, RECEIPT_DIR):
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+    if get_schema_version() < SCHEMA_VERSION:
+        migrate()
+    _migrated_db_file = DB_FILE
+
+
+# --- Customers ---
+
+def add_customer(name, email, phone, reference_id, billing_address, shipping_address, notes):
+    with transaction() as conn:
+        _invalidate_reference_lists("Customers")
+        cur = conn.execute(
+            "INSERT INTO Customers (CustomerName, Email, Phone, ReferenceID, BillingAddress, ShippingAddress, Notes) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (name, email, phone, reference_id or None, billing_address, shipping_address, notes),
+        )
+        return cur.lastrowid
+
+
+def update_customer(customer_id, name, email, phone, reference_id, billing_address, shipping_address, notes):
+    with transaction() as conn:
+        _invalidate_reference_lists("Customers")
+        conn.execute(
+            "UPDATE Customers SET CustomerName = ?, Email = ?, Phone = ?, ReferenceID = ?, BillingAddress = ?, "
+            "ShippingAddress = ?, Notes = ? WHERE CustomerID = ?",
+            (name, email, phone, reference_id or None, billing_address, shipping_address, notes, customer_id),
+        )
+
+
+def delete_customer(customer_id):
+    with transaction() as conn:
+        _invalidate_reference_lists("Customers")
+        conn.execute("DELETE FROM Customers WHERE CustomerID = ?", (customer_id,))
+
+
+def get_all_customers(search_term=None, limit=None, after=None):
+    if _fts_query(search_term):
+        return _fetch_search_page("Customers", "SELECT Customers.* FROM Customers", "CustomerID", search_term, limit=limit, after=after)
+    return _fetch_page("SELECT Customers.* FROM Customers", "CustomerID", limit=limit, after=after)
+
+
+def count_customers(search_term=None):
+    if _fts_query(search_term):
+        return _count_search_matches("Customers", search_term)
+    return _count("FROM Customers")
+
+
+def get_customer_by_id(customer_id):
+    return _fetch_one("SELECT * FROM Customers WHERE CustomerID = ?", (customer_id,))
+
+
+# --- Suppliers ---
+
+def add_supplier(name, contact_person, email, phone, address):
+    with transaction() as conn:
+        _invalidate_reference_lists("Suppliers")
+        cur = conn.execute(
+            "INSERT INTO Suppliers (SupplierName, ContactPerson, Email, Phone, Address) VALUES (?, ?, ?, ?, ?)",
+            (name, contact_person, email, phone, address),
+        )
+        return cur.lastrowid
+
+
+def update_supplier(supplier_id, name, contact_person, email, phone, address):
+    with transaction() as conn:
+        _invalidate_reference_lists("Suppliers")
+        conn.execute(
+            "UPDATE Suppliers SET SupplierName = ?, ContactPerson = ?, Email = ?, Phone = ?, Address = ? "
+            "WHERE SupplierID = ?",
+            (name, contact_person, email, phone, address, supplier_id),
+        )
+
+
+def delete_supplier(supplier_id):
+    with transaction() as conn:
+        _invalidate_reference_lists("Suppliers")
+        conn.execute("DELETE FROM Suppliers WHERE SupplierID = ?", (supplier_id,))
+
+
+def get_all_suppliers(search_term=None, limit=None, after=None):
+    if _fts_query(search_term):
+        return _fetch_search_page("Suppliers", "SELECT Suppliers.* FROM Suppliers", "SupplierID", search_term, limit=limit, after=after)
+    return _fetch_page("SELECT Suppliers.* FROM Suppliers", "SupplierID", limit=limit, after=after)
+
+
+def count_suppliers(search_term=None):
+    if _fts_query(search_term):
+        return _count_search_matches("Suppliers", search_term)
+    return _count("FROM Suppliers")
+
+
+def get_supplier_by_id(supplier_id):
+    return _fetch_one("SELECT * FROM Suppliers WHERE SupplierID = ?", (supplier_id,))
+
+
+# --- Supplier Services ---
+
+_SERVICE_FROM = """
+    FROM SupplierServices ss
+    LEFT JOIN Suppliers s ON s.SupplierID = ss.SupplierID
+    LEFT JOIN Projects p ON p.ProjectID = ss.ProjectID
+"""
+_SERVICE_SELECT = "SELECT ss.*, s.SupplierName, p.ProjectName" + _SERVICE_FROM
+
+
+def add_supplier_service(supplier_id, project_id, service_name, service_type, service_date, cost, receipt_path, description):
+    """Records a service and, when it has a cost, logs the matching expense. Returns (ServiceID, expense_logged)."""
+    with transaction() as conn:
+        cur = conn.execute(
+            "INSERT INTO SupplierServices (SupplierID, ProjectID, ServiceName, ServiceType, ServiceDate, Cost, "
+            "ReceiptPath, Description, IsExpenseLogged) VALUES (?, ?, ?, ?, ?, ?, ?, ?, 0)",
+            (supplier_id, project_id, service_name, service_type, service_date, cost, receipt_path, description),
+        )
+        service_id = cur.lastrowid
+        expense_logged = False
+        if cost and cost > 0:
+            supplier_name = conn.execute(
+                "SELECT SupplierName FROM Suppliers WHERE SupplierID = ?", (supplier_id,)
+            ).fetchone()
+            add_expense(
+                service_date, f"Supplier service: {service_name}", "Supplier Service", cost,
+                supplier_name[0] if supplier_name else None, project_id, receipt_path, service_id,
+            )
+            conn.execute("UPDATE SupplierServices SET IsExpenseLogged = 1 WHERE ServiceID = ?", (service_id,))
+            expense_logged = True
+        return service_id, expense_logged
+
+
+def update_supplier_service(service_id, supplier_id, project_id, service_name, service_type, service_date, cost,
+                            receipt_path, description, is_expense_logged):
+    with transaction() as conn:
+        conn.execute(
+            "UPDATE SupplierServices SET SupplierID = ?, ProjectID = ?, ServiceName = ?, ServiceType = ?, "
+            "ServiceDate = ?, Cost = ?, ReceiptPath = ?, Description = ?, IsExpenseLogged = ? WHERE ServiceID = ?",
+            (supplier_id, project_id, service_name, service_type, service_date, cost, receipt_path, description,
+             1 if is_expense_logged else 0, service_id),
+        )
 
-    elif report_type_main == "Sales by Product (Placeholder)":
-        st.info("This report is a placeholder and needs implementation (e.g., querying OrderItems and Products).")
 
-    elif report_type_main == "Inventory Status (Placeholder)":
-        st.info("This report is a placeholder and needs implementation (e.g., querying Products for stock levels, reorder points).")
+def update_supplier_service_receipt_path(service_id, receipt_path):
+    with transaction() as conn:
+        conn.execute("UPDATE SupplierServices SET ReceiptPath = ? WHERE ServiceID = ?", (receipt_path, service_id))
+        conn.execute(
+            "UPDATE Expenses SET ReceiptReference = ? WHERE SupplierServiceID = ? AND ReceiptReference IS NULL",
+            (receipt_path, service_id),
+        )
 
-st.sidebar.markdown("---")
-st.sidebar.info("BACHAT-Management System")
+
+def delete_supplier_service(service_id):
+    receipt_path = _fetch_value("SELECT ReceiptPath FROM SupplierServices WHERE ServiceID = ?", (service_id,))
+    with transaction() as conn:
+        conn.execute("DELETE FROM SupplierServices WHERE ServiceID = ?", (service_id,))
+    if receipt_path and os.path.exists(receipt_path):
+        try:
+            os.remove(receipt_path)
+        except OSError:
+            pass
+
+
+def get_all_supplier_services(search_term=None, limit=None, after=None):
+    if _fts_query(search_term):
+        return _fetch_search_page("SupplierServices", _SERVICE_SELECT, "ss.ServiceID", search_term, limit=limit, after=after)
+    return _fetch_page(_SERVICE_SELECT, "ss.ServiceID", descending=True, limit=limit, after=after)
+
+
+def count_supplier_services(search_term=None):
+    if _fts_query(search_term):
+        return _count_search_matches("SupplierServices", search_term)
+    return _count(_SERVICE_FROM)
+
+
+def get_supplier_service_by_id(service_id):
+    return _fetch_one(_SERVICE_SELECT + " WHERE ss.ServiceID = ?", (service_id,))
+
+
+def get_services_for_project(project_id):
+    return _fetch_all(_SERVICE_SELECT + " WHERE ss.ProjectID = ? ORDER BY ss.ServiceDate, ss.ServiceID", (project_id,))
+
+
+# --- Materials ---
+
+_MATERIAL_FROM = """
+    FROM Materials m
+    LEFT JOIN Suppliers s ON s.SupplierID = m.SupplierID
+"""
+_MATERIAL_SELECT = "SELECT m.*, s.SupplierName" + _MATERIAL_FROM
+
+
+def add_material(name, category, subtype, unit_of_measure, cost_per_unit, quantity_in_stock, supplier_id):
+    with transaction() as conn:
+        _invalidate_reference_lists("Materials")
+        cur = conn.execute(
+            "INSERT INTO Materials (MaterialName, Category, SubType, UnitOfMeasure, CostPerUnit, QuantityInStock, "
+            "SupplierID) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (name, category, subtype, unit_of_measure, cost_per_unit, quantity_in_stock, supplier_id),
+        )
+        _record_stock_movement(conn, "Material", cur.lastrowid, quantity_in_stock, "Opening")
+        return cur.lastrowid
+
+
+def update_material(material_id, name, category, subtype, unit_of_measure, cost_per_unit, quantity_in_stock, supplier_id):
+    with transaction() as conn:
+        _invalidate_reference_lists("Materials")
+        _set_stock_balance(conn, "Material", material_id, quantity_in_stock)
+        conn.execute(
+            "UPDATE Materials SET MaterialName = ?, Category = ?, SubType = ?, UnitOfMeasure = ?, CostPerUnit = ?, "
+            "QuantityInStock = ?, SupplierID = ? WHERE MaterialID = ?",
+            (name, category, subtype, unit_of_measure, cost_per_unit, quantity_in_stock, supplier_id, material_id),
+        )
+
+
+def delete_material(material_id):
+    with transaction() as conn:
+        _invalidate_reference_lists("Materials")
+        conn.execute("DELETE FROM Materials WHERE MaterialID = ?", (material_id,))
+
+
+def update_material_stock(material_id, quantity_change, reason="Adjustment", reference_type=None, reference_id=None,
+                          notes=None):
+    with transaction() as conn:
+        _apply_stock_change(conn, "Material", material_id, quantity_change, reason, reference_type, reference_id, notes)
+
+
+def get_all_materials(search_term=None, limit=None, after=None):
+    if _fts_query(search_term):
+        return _fetch_search_page("Materials", _MATERIAL_SELECT, "m.MaterialID", search_term, limit=limit, after=after)
+    return _fetch_page(_MATERIAL_SELECT, "m.MaterialID", limit=limit, after=after)
+
+
+def count_materials(search_term=None):
+    if _fts_query(search_term):
+        return _count_search_matches("Materials", search_term)
+    return _count(_MATERIAL_FROM)
+
+
+def get_material_by_id(material_id):
+    return _fetch_one(_MATERIAL_SELECT + " WHERE m.MaterialID = ?", (material_id,))
+
+
+def get_materials_by_category(category):
+    return _fetch_all(_MATERIAL_SELECT + " WHERE m.Category = ? ORDER BY m.MaterialName, m.MaterialID", (category,))
+
+
+def get_distinct_product_categories():
+    rows = _fetch_all(
+        "SELECT DISTINCT Category FROM Products WHERE Category IS NOT NULL AND Category <> '' ORDER BY Category"
+    )
+    return [row[0] for row in rows]
+
+
+def get_distinct_material_categories():
+    rows = _fetch_all(
+        "SELECT DISTINCT Category FROM Materials WHERE Category IS NOT NULL AND Category <> '' ORDER BY Category"
+    )
+    return [row[0] for row in rows]
+
+
+# --- Products ---
+
+_PRODUCT_FROM = """
+    FROM Products pr
+    LEFT JOIN Suppliers s ON s.SupplierID = pr.SupplierID
+"""
+_PRODUCT_SELECT = "SELECT pr.*, s.SupplierName" + _PRODUCT_FROM
+
+
+def add_product(name, sku, description, category, material_type, dimensions, cost_price, selling_price,
+                quantity_in_stock, reorder_level, supplier_id, image_path):
+    with transaction() as conn:
+        _invalidate_reference_lists("Products")
+        cur = conn.execute(
+            "INSERT INTO Products (ProductName, SKU, Description, Category, MaterialType, Dimensions, CostPrice, "
+            "SellingPrice, QuantityInStock, ReorderLevel, SupplierID, ImagePath) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (name, sku, description, category, material_type, dimensions, cost_price, selling_price,
+             quantity_in_stock, reorder_level, supplier_id, image_path),
+        )
+        _record_stock_movement(conn, "Product", cur.lastrowid, quantity_in_stock, "Opening")
+        return cur.lastrowid
+
+
+def update_product(product_id, name, sku, description, category, material_type, dimensions, cost_price,
+                   selling_price, quantity_in_stock, reorder_level, supplier_id, image_path):
+    with transaction() as conn:
+        _invalidate_reference_lists("Products")
+        _set_stock_balance(conn, "Product", product_id, quantity_in_stock)
+        conn.execute(
+            "UPDATE Products SET ProductName = ?, SKU = ?, Description = ?, Category = ?, MaterialType = ?, "
+            "Dimensions = ?, CostPrice = ?, SellingPrice = ?, QuantityInStock = ?, ReorderLevel = ?, SupplierID = ?, "
+            "ImagePath = ? WHERE ProductID = ?",
+            (name, sku, description, category, material_type, dimensions, cost_price, selling_price,
+             quantity_in_stock, reorder_level, supplier_id, image_path, product_id),
+        )
+
+
+def delete_product(product_id):
+    image_path = _fetch_value("SELECT ImagePath FROM Products WHERE ProductID = ?", (product_id,))
+    with transaction() as conn:
+        _invalidate_reference_lists("Products")
+        conn.execute("DELETE FROM Products WHERE ProductID = ?", (product_id,))
+    if image_path and os.path.exists(image_path):
+        try:
+            os.remove(image_path)
+        except OSError:
+            pass
+
+
+def update_product_stock(product_id, quantity_change, reason="Adjustment", reference_type=None, reference_id=None,
+                         notes=None):
+    with transaction() as conn:
+        _apply_stock_change(conn, "Product", product_id, quantity_change, reason, reference_type, reference_id, notes)
+
+
+def get_all_products(search_term=None, limit=None, after=None):
+    if _fts_query(search_term):
+        return _fetch_search_page("Products", _PRODUCT_SELECT, "pr.ProductID", search_term, limit=limit, after=after)
+    return _fetch_page(_PRODUCT_SELECT, "pr.ProductID", limit=limit, after=after)
+
+
+def count_products(search_term=None):
+    if _fts_query(search_term):
+        return _count_search_matches("Products", search_term)
+    return _count(_PRODUCT_FROM)
+
+
+def get_product_by_id(product_id):
+    return _fetch_one(_PRODUCT_SELECT + " WHERE pr.ProductID = ?", (product_id,))
+
+
+# --- Projects ---
+
+_PROJECT_FROM = """
+    FROM Projects p
+    LEFT JOIN Customers c ON c.CustomerID = p.CustomerID
+"""
+_PROJECT_SELECT = "SELECT p.*, c.CustomerName" + _PROJECT_FROM
+
+
+def add_project(name, customer_id, start_date, end_date, status, budget, description):
+    with transaction() as conn:
+        _invalidate_reference_lists("Projects")
+        cur = conn.execute(
+            "INSERT INTO Projects (ProjectName, CustomerID, StartDate, EndDate, Status, Budget, Description) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (name, customer_id, start_date, end_date, status, budget, description),
+        )
+        return cur.lastrowid
+
+
+def update_project(project_id, name, customer_id, start_date, end_date, status, budget, description):
+    with transaction() as conn:
+        _invalidate_reference_lists("Projects")
+        conn.execute(
+            "UPDATE Projects SET ProjectName = ?, CustomerID = ?, StartDate = ?, EndDate = ?, Status = ?, Budget = ?, "
+            "Description = ? WHERE ProjectID = ?",
+            (name, customer_id, start_date, end_date, status, budget, description, project_id),
+        )
+
+
+def delete_project(project_id):
+    with transaction() as conn:
+        _invalidate_reference_lists("Projects")
+        conn.execute("DELETE FROM Projects WHERE ProjectID = ?", (project_id,))
+
+
+def get_all_projects(search_term=None, limit=None, after=None):
+    if _fts_query(search_term):
+        return _fetch_search_page("Projects", _PROJECT_SELECT, "p.ProjectID", search_term, limit=limit, after=after)
+    return _fetch_page(_PROJECT_SELECT, "p.ProjectID", limit=limit, after=after)
+
+
+def count_projects(search_term=None):
+    if _fts_query(search_term):
+        return _count_search_matches("Projects", search_term)
+    return _count(_PROJECT_FROM)
+
+
+def get_project_by_id(project_id):
+    return _fetch_one(_PROJECT_SELECT + " WHERE p.ProjectID = ?", (project_id,))
+
+
+def get_projects_by_customer_id(customer_id):
+    return _fetch_all(_PROJECT_SELECT + " WHERE p.CustomerID = ? ORDER BY p.StartDate DESC, p.ProjectID DESC", (customer_id,))
+
+
+# --- Project Materials ---
+
+def add_material_to_project(project_id, material_id, quantity_used, cost_per_unit_at_time_of_use, notes,
+                            deduct_stock=False):
+    """Assigns a material to a project; with deduct_stock the used quantity leaves stock in the same transaction."""
+    with transaction() as conn:
+        cur = conn.execute(
+            "INSERT INTO ProjectMaterials (ProjectID, MaterialID, QuantityUsed, CostPerUnitAtTimeOfUse, Notes) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (project_id, material_id, quantity_used, cost_per_unit_at_time_of_use, notes),
+        )
+        if deduct_stock:
+            _apply_stock_change(conn, "Material", material_id, -quantity_used, "ProjectConsumption",
+                                "ProjectMaterial", cur.lastrowid)
+        return cur.lastrowid
+
+
+def remove_material_from_project(project_material_id):
+    """Deletes the assignment and puts the used quantity back into material stock."""
+    with transaction() as conn:
+        row = conn.execute(
+            "SELECT MaterialID, QuantityUsed FROM ProjectMaterials WHERE ProjectMaterialID = ?", (project_material_id,)
+        ).fetchone()
+        if row is None:
+            return
+        _apply_stock_change(conn, "Material", row["MaterialID"], row["QuantityUsed"], "Reversal",
+                            "ProjectMaterial", project_material_id)
+        conn.execute("DELETE FROM ProjectMaterials WHERE ProjectMaterialID = ?", (project_material_id,))
+
+
+def get_materials_for_project(project_id):
+    return _fetch_all(
+        """
+        SELECT pm.*, m.MaterialName, m.UnitOfMeasure
+        FROM ProjectMaterials pm
+        LEFT JOIN Materials m ON m.MaterialID = pm.MaterialID
+        WHERE pm.ProjectID = ?
+        ORDER BY pm.ProjectMaterialID
+        """,
+        (project_id,),
+    )
+
+
+# --- Orders ---
+
+_ORDER_FROM = """
+    FROM Orders o
+    LEFT JOIN Customers c ON c.CustomerID = o.CustomerID
+    LEFT JOIN Projects p ON p.ProjectID = o.ProjectID
+"""
+_ORDER_SELECT = "SELECT o.*, c.CustomerName, p.ProjectName" + _ORDER_FROM
+
+
+def add_order(order_date, customer_id, project_id, order_status, total_amount, payment_status, shipping_address,
+              notes, reference_id):
+    with transaction() as conn:
+        cur = conn.execute(
+            "INSERT INTO Orders (OrderDate, CustomerID, ProjectID, OrderStatus, TotalAmount, PaymentStatus, "
+            "ShippingAddress, Notes, ReferenceID) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (order_date, customer_id, project_id, order_status, total_amount, payment_status, shipping_address,
+             notes, reference_id or None),
+        )
+        return cur.lastrowid
+
+
+def add_order_item(order_id, product_id, quantity_sold, unit_price_at_sale, discount):
+    discount = discount or 0.0
+    with transaction() as conn:
+        cur = conn.execute(
+            "INSERT INTO OrderItems (OrderID, ProductID, QuantitySold, UnitPriceAtSale, Discount, LineTotal) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (order_id, product_id, quantity_sold, unit_price_at_sale, discount,
+             quantity_sold * unit_price_at_sale - discount),
+        )
+        return cur.lastrowid
+
+
+class StockShortageError(Exception):
+    """Raised by create_order_with_items when stock cannot cover the order; nothing is written.
+
+    `shortages` holds one dict per affected order line: Line (0-based index into items),
+    ProductID, ProductName, Requested (total across the order's lines) and Available.
+    """
+
+    def __init__(self, shortages):
+        self.shortages = shortages
+        by_product = {s["ProductID"]: s for s in shortages}
+        names = ", ".join(f"{s['ProductName']} (requested {s['Requested']}, available {s['Available']})" for s in by_product.values())
+        super().__init__(f"Insufficient stock for: {names}")
+
+
+def create_order_with_items(header, items):
+    """Creates an order, its lines and the stock decrements in one transaction and returns the new OrderID.
+
+    `header` uses the Orders column names (OrderDate, CustomerID, ProjectID, OrderStatus, PaymentStatus,
+    ShippingAddress, Notes, ReferenceID); each item has ProductID, QuantitySold, UnitPriceAtSale and
+    optionally Discount. Stock is taken with one conditional UPDATE per product that never goes negative
+    and recorded as Sale movements in the stock ledger; if any product falls short the whole order is
+    rolled back and StockShortageError is raised. Lines with a non-positive quantity, a negative price or
+    discount, or a discount above the line amount raise ValueError before anything is written.
+    """
+    for line, item in enumerate(items, 1):
+        quantity, unit_price, discount = item["QuantitySold"], item["UnitPriceAtSale"], item.get("Discount") or 0.0
+        if quantity is None or quantity <= 0:
+            raise ValueError(f"Line {line}: quantity must be greater than zero")
+        if unit_price is None or unit_price < 0:
+            raise ValueError(f"Line {line}: unit price cannot be negative")
+        if discount < 0:
+            raise ValueError(f"Line {line}: discount cannot be negative")
+        if discount > quantity * unit_price:
+            raise ValueError(f"Line {line}: discount cannot exceed the line amount")
+
+    quantity_by_product = {}
+    for item in items:
+        quantity_by_product[item["ProductID"]] = quantity_by_product.get(item["ProductID"], 0) + item["QuantitySold"]
+
+    with transaction() as conn:
+        _invalidate_reference_lists("Products")
+        short_products = []
+        for product_id, quantity in quantity_by_product.items():
+            cur = conn.execute(
+                "UPDATE Products SET QuantityInStock = QuantityInStock - ? WHERE ProductID = ? AND QuantityInStock >= ?",
+                (quantity, product_id, quantity),
+            )
+            if cur.rowcount == 0:
+                short_products.append(product_id)
+        if short_products:
+            placeholders = ", ".join("?" * len(short_products))
+            stock = {
+                row["ProductID"]: row
+                for row in conn.execute(
+                    f"SELECT ProductID, ProductName, QuantityInStock FROM Products WHERE ProductID IN ({placeholders})",
+                    short_products,
+                )
+            }
+            shortages = [
+                {
+                    "Line": line,
+                    "ProductID": item["ProductID"],
+                    "ProductName": stock[item["ProductID"]]["ProductName"] if item["ProductID"] in stock else None,
+                    "Requested": quantity_by_product[item["ProductID"]],
+                    "Available": stock[item["ProductID"]]["QuantityInStock"] if item["ProductID"] in stock else 0,
+                }
+                for line, item in enumerate(items) if item["ProductID"] in short_products
+            ]
+            raise StockShortageError(shortages)
+
+        order_id = conn.execute(
+            "INSERT INTO Orders (OrderDate, CustomerID, ProjectID, OrderStatus, TotalAmount, PaymentStatus, "
+            "ShippingAddress, Notes, ReferenceID) VALUES (?, ?, ?, ?, 0, ?, ?, ?, ?)",
+            (header.get("OrderDate"), header.get("CustomerID"), header.get("ProjectID"), header.get("OrderStatus"),
+             header.get("PaymentStatus"), header.get("ShippingAddress"), header.get("Notes"),
+             header.get("ReferenceID") or None),
+        ).lastrowid
+        conn.executemany(
+            "INSERT INTO OrderItems (OrderID, ProductID, QuantitySold, UnitPriceAtSale, Discount, LineTotal) "
+            "VALUES (:order_id, :product_id, :quantity, :unit_price, :discount, :quantity * :unit_price - :discount)",
+            [
+                {"order_id": order_id, "product_id": item["ProductID"], "quantity": item["QuantitySold"],
+                 "unit_price": item["UnitPriceAtSale"], "discount": item.get("Discount") or 0.0}
+                for item in items
+            ],
+        )
+        conn.executemany(
+            "INSERT INTO StockMovements (ItemType, ItemID, QuantityChange, Reason, ReferenceType, ReferenceID) "
+            "VALUES ('Product', ?, ?, 'Sale', 'Order', ?)",
+            [(product_id, -quantity, order_id) for product_id, quantity in quantity_by_product.items()],
+        )
+        return order_id
+
+
+def update_order_total(order_id):
+    """Recomputes one order from its lines; the OrderItems triggers normally keep it current."""
+    with transaction() as conn:
+        conn.execute(
+            "UPDATE Orders SET TotalAmount = (SELECT COALESCE(SUM(LineTotal), 0) FROM OrderItems WHERE OrderID = ?) "
+            "WHERE OrderID = ?",
+            (order_id, order_id),
+        )
+
+
+def update_order_basic_info(order_id, order_date, customer_id, project_id, order_status, payment_status,
+                            shipping_address, notes, reference_id):
+    with transaction() as conn:
+        conn.execute(
+            "UPDATE Orders SET OrderDate = ?, CustomerID = ?, ProjectID = ?, OrderStatus = ?, PaymentStatus = ?, "
+            "ShippingAddress = ?, Notes = ?, ReferenceID = ? WHERE OrderID = ?",
+            (order_date, customer_id, project_id, order_status, payment_status, shipping_address, notes,
+             reference_id or None, order_id),
+        )
+
+
+def get_all_orders(limit=None, after=None):
+    return _fetch_page(_ORDER_SELECT, "o.OrderID", descending=True, limit=limit, after=after)
+
+
+def count_orders():
+    return _count("FROM Orders")
+
+
+def get_order_by_id(order_id):
+    return _fetch_one(_ORDER_SELECT + " WHERE o.OrderID = ?", (order_id,))
+
+
+def get_order_items_by_order_id(order_id):
+    return _fetch_all(
+        """
+        SELECT oi.*, pr.ProductName, pr.SKU
+        FROM OrderItems oi
+        LEFT JOIN Products pr ON pr.ProductID = oi.ProductID
+        WHERE oi.OrderID = ?
+        ORDER BY oi.OrderItemID
+        """,
+        (order_id,),
+    )
+
+
+def get_orders_by_customer_id(customer_id):
+    return _fetch_all(_ORDER_SELECT + " WHERE o.CustomerID = ? ORDER BY o.OrderDate DESC, o.OrderID DESC", (customer_id,))
+
+
+# --- Invoices ---
+
+_INVOICE_FROM = """
+    FROM Invoices i
+    LEFT JOIN Projects p ON p.ProjectID = i.ProjectID
+    LEFT JOIN Customers c ON c.CustomerID = i.CustomerID
+"""
+_INVOICE_SELECT = "SELECT i.*, p.ProjectName, c.CustomerName" + _INVOICE_FROM
+
+
+def add_invoice(invoice_reference_id, project_id, customer_id, issue_date, due_date, payment_date, total_amount,
+                status, notes):
+    with transaction() as conn:
+        cur = conn.execute(
+            "INSERT INTO Invoices (InvoiceReferenceID, ProjectID, CustomerID, IssueDate, DueDate, PaymentDate, "
+            "TotalAmount, Status, Notes) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (invoice_reference_id, project_id, customer_id, issue_date, due_date, payment_date, total_amount,
+             status, notes),
+        )
+        return cur.lastrowid
+
+
+def update_invoice(invoice_id, invoice_reference_id, project_id, customer_id, issue_date, due_date, payment_date,
+                   total_amount, status, notes):
+    with transaction() as conn:
+        conn.execute(
+            "UPDATE Invoices SET InvoiceReferenceID = ?, ProjectID = ?, CustomerID = ?, IssueDate = ?, DueDate = ?, "
+            "PaymentDate = ?, TotalAmount = ?, Status = ?, Notes = ? WHERE InvoiceID = ?",
+            (invoice_reference_id, project_id, customer_id, issue_date, due_date, payment_date, total_amount,
+             status, notes, invoice_id),
+        )
+
+
+def get_all_invoices(search_term=None, limit=None, after=None):
+    if _fts_query(search_term):
+        return _fetch_search_page("Invoices", _INVOICE_SELECT, "i.InvoiceID", search_term, limit=limit, after=after)
+    return _fetch_page(_INVOICE_SELECT, "i.InvoiceID", descending=True, limit=limit, after=after)
+
+
+def count_invoices(search_term=None):
+    if _fts_query(search_term):
+        return _count_search_matches("Invoices", search_term)
+    return _count(_INVOICE_FROM)
+
+
+def get_invoice_by_id(invoice_id):
+    return _fetch_one(_INVOICE_SELECT + " WHERE i.InvoiceID = ?", (invoice_id,))
+
+
+def get_invoices_by_project_id(project_id):
+    return _fetch_all(_INVOICE_SELECT + " WHERE i.ProjectID = ? ORDER BY i.IssueDate DESC, i.InvoiceID DESC", (project_id,))
+
+
+def get_invoices_by_customer_id(customer_id):
+    return _fetch_all(_INVOICE_SELECT + " WHERE i.CustomerID = ? ORDER BY i.IssueDate DESC, i.InvoiceID DESC", (customer_id,))
+
+
+def get_recent_invoices(limit=5):
+    return _fetch_all(_INVOICE_SELECT + " ORDER BY i.IssueDate DESC, i.InvoiceID DESC LIMIT ?", (int(limit),))
+
+
+def get_next_invoice_reference_id():
+    prefix = f"INV-{datetime.now().strftime('%Y%m')}-"
+    count = _fetch_value("SELECT COUNT(*) FROM Invoices WHERE InvoiceReferenceID LIKE ?", (prefix + "%",), 0)
+    return f"{prefix}{count + 1:04d}"
+
+
+# --- Expenses ---
+
+_EXPENSE_FROM = """
+    FROM Expenses e
+    LEFT JOIN Projects p ON p.ProjectID = e.ProjectID
+    LEFT JOIN SupplierServices ss ON ss.ServiceID = e.SupplierServiceID
+"""
+_EXPENSE_SELECT = "SELECT e.*, p.ProjectName, ss.ServiceName AS SupplierServiceName" + _EXPENSE_FROM
+
+
+def add_expense(expense_date, description, category, amount, vendor, project_id, receipt_reference, supplier_service_id):
+    with transaction() as conn:
+        cur = conn.execute(
+            "INSERT INTO Expenses (ExpenseDate, Description, Category, Amount, Vendor, ProjectID, ReceiptReference, "
+            "SupplierServiceID) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (expense_date, description, category, amount, vendor, project_id, receipt_reference, supplier_service_id),
+        )
+        return cur.lastrowid
+
+
+def get_all_expenses(limit=None, after=None):
+    return _fetch_page(_EXPENSE_SELECT, "e.ExpenseID", descending=True, limit=limit, after=after)
+
+
+def count_expenses():
+    return _count("FROM Expenses")
+
+
+def get_expenses_by_project_id(project_id):
+    return _fetch_all(_EXPENSE_SELECT + " WHERE e.ProjectID = ? ORDER BY e.ExpenseDate DESC, e.ExpenseID DESC", (project_id,))
+
+
+# --- Customer 360 ---
+
+def get_customer_360(customer_id, limit=25, orders_after=None, invoices_after=None, projects_after=None):
+    """Everything the customer detail page shows, read from one snapshot. Returns None for an unknown customer.
+
+    The dict holds Profile, one keyset page (newest first) each of Orders, Invoices and Projects, and
+    Totals with lifetime aggregates: OrderCount, OrderTotal, FirstOrderDate, LastOrderDate,
+    InvoiceCount, PaidInvoiceTotal, OutstandingInvoiceTotal and ProjectCount. The *_after
+    arguments are the last OrderID/InvoiceID/ProjectID of the previous page of that list.
+    """
+    with read_transaction():
+        profile = _fetch_one("SELECT * FROM Customers WHERE CustomerID = ?", (customer_id,))
+        if profile is None:
+            return None
+        totals = _fetch_one(
+            """
+            SELECT o.OrderCount, o.OrderTotal, o.FirstOrderDate, o.LastOrderDate,
+                   i.InvoiceCount, i.PaidInvoiceTotal, i.OutstandingInvoiceTotal, p.ProjectCount
+            FROM (SELECT COUNT(*) AS OrderCount, COALESCE(SUM(TotalAmount), 0) AS OrderTotal,
+                         MIN(OrderDate) AS FirstOrderDate, MAX(OrderDate) AS LastOrderDate
+                  FROM Orders WHERE CustomerID = :customer_id) o,
+                 (SELECT COUNT(*) AS InvoiceCount,
+                         COALESCE(SUM(CASE WHEN Status = 'Paid' THEN TotalAmount END), 0) AS PaidInvoiceTotal,
+                         COALESCE(SUM(CASE WHEN Status IN ('Sent', 'Overdue') THEN TotalAmount END), 0)
+                             AS OutstandingInvoiceTotal
+                  FROM Invoices WHERE CustomerID = :customer_id) i,
+                 (SELECT COUNT(*) AS ProjectCount FROM Projects WHERE CustomerID = :customer_id) p
+            """,
+            {"customer_id": customer_id},
+        )
+        return {
+            "Profile": profile,
+            "Orders": _fetch_page(_ORDER_SELECT, "o.OrderID", descending=True, filters=("o.CustomerID = ?",),
+                                  params=(customer_id,), limit=limit, after=orders_after),
+            "Invoices": _fetch_page(_INVOICE_SELECT, "i.InvoiceID", descending=True, filters=("i.CustomerID = ?",),
+                                    params=(customer_id,), limit=limit, after=invoices_after),
+            "Projects": _fetch_page(_PROJECT_SELECT, "p.ProjectID", descending=True, filters=("p.CustomerID = ?",),
+                                    params=(customer_id,), limit=limit, after=projects_after),
+            "Totals": dict(totals),
+        }
+
+
+# --- Reports ---
+
+def get_project_profitability(date_from=None, date_to=None):
+    """Revenue and cost per project in one grouped pass.
+
+    Revenue is Paid invoices (dated by PaymentDate, falling back to IssueDate); costs are
+    expenses linked to the project, supplier services not already logged as expenses, and
+    materials at their cost when used. Dates are 'YYYY-MM-DD' strings; None leaves that end open.
+    """
+    return _fetch_all(
+        """
+        WITH paid_revenue AS (
+            SELECT ProjectID, SUM(TotalAmount) AS Amount
+            FROM Invoices
+            WHERE Status = 'Paid' AND ProjectID IS NOT NULL
+              AND (:date_from IS NULL OR COALESCE(PaymentDate, IssueDate) >= :date_from)
+              AND (:date_to IS NULL OR COALESCE(PaymentDate, IssueDate) <= :date_to)
+            GROUP BY ProjectID
+        ), project_expenses AS (
+            SELECT ProjectID, SUM(Amount) AS Amount
+            FROM Expenses
+            WHERE ProjectID IS NOT NULL
+              AND (:date_from IS NULL OR ExpenseDate >= :date_from)
+              AND (:date_to IS NULL OR ExpenseDate <= :date_to)
+            GROUP BY ProjectID
+        ), unlogged_services AS (
+            SELECT ProjectID, SUM(Cost) AS Amount
+            FROM SupplierServices
+            WHERE ProjectID IS NOT NULL AND COALESCE(IsExpenseLogged, 0) = 0
+              AND (:date_from IS NULL OR ServiceDate >= :date_from)
+              AND (:date_to IS NULL OR ServiceDate <= :date_to)
+            GROUP BY ProjectID
+        ), material_usage AS (
+            SELECT ProjectID, SUM(QuantityUsed * CostPerUnitAtTimeOfUse) AS Amount
+            FROM ProjectMaterials
+            WHERE (:date_from IS NULL OR DateAdded >= :date_from)
+              AND (:date_to IS NULL OR DateAdded <= :date_to)
+            GROUP BY ProjectID
+        )
+        SELECT p.ProjectID, p.ProjectName, c.CustomerName,
+               COALESCE(r.Amount, 0.0) AS Revenue,
+               COALESCE(e.Amount, 0.0) AS ExpenseCost,
+               COALESCE(s.Amount, 0.0) AS UnloggedServiceCost,
+               COALESCE(m.Amount, 0.0) AS MaterialCost,
+               COALESCE(e.Amount, 0.0) + COALESCE(s.Amount, 0.0) + COALESCE(m.Amount, 0.0) AS TotalCost,
+               COALESCE(r.Amount, 0.0) - (COALESCE(e.Amount, 0.0) + COALESCE(s.Amount, 0.0) + COALESCE(m.Amount, 0.0)) AS Profit
+        FROM Projects p
+        LEFT JOIN Customers c ON c.CustomerID = p.CustomerID
+        LEFT JOIN paid_revenue r ON r.ProjectID = p.ProjectID
+        LEFT JOIN project_expenses e ON e.ProjectID = p.ProjectID
+        LEFT JOIN unlogged_services s ON s.ProjectID = p.ProjectID
+        LEFT JOIN material_usage m ON m.ProjectID = p.ProjectID
+        ORDER BY p.ProjectName, p.ProjectID
+        """,
+        {"date_from": date_from, "date_to": date_to},
+    )
+
+
+def _financial_totals(conn, granularity, date_from, date_to):
+    """(Period, Revenue, COGS, OperatingExpenses) per bucket for a date range, read from Invoices and Expenses."""
+    bucket = _PERIOD_BUCKETS[granularity]
+    paid_date = _PAID_INVOICE_DATE.format(row="")
+    return conn.execute(
+        f"""
+        SELECT Period, SUM(Revenue) AS Revenue, SUM(COGS) AS COGS, SUM(OperatingExpenses) AS OperatingExpenses
+        FROM (
+            SELECT {bucket.format(col=paid_date)} AS Period, SUM(TotalAmount) AS Revenue, 0 AS COGS, 0 AS OperatingExpenses
+            FROM Invoices
+            WHERE Status = 'Paid' AND {paid_date} BETWEEN :date_from AND :date_to
+            GROUP BY 1
+            UNION ALL
+            SELECT {bucket.format(col="ExpenseDate")}, 0,
+                   SUM(CASE WHEN Category = 'COGS' THEN Amount ELSE 0 END),
+                   SUM(CASE WHEN Category = 'COGS' THEN 0 ELSE Amount END)
+            FROM Expenses
+            WHERE ExpenseDate BETWEEN :date_from AND :date_to
+            GROUP BY 1
+        )
+        GROUP BY Period
+        ORDER BY Period
+        """,
+        {"date_from": date_from, "date_to": date_to},
+    ).fetchall()
+
+
+def _closed_months(date_from, date_to):
+    """First and last day of the whole calendar months inside the range that ended before this month."""
+    first = date_from if date_from.day == 1 else (date_from.replace(day=28) + timedelta(days=4)).replace(day=1)
+    after_last = date_to + timedelta(days=1)
+    end = min(after_last.replace(day=1), date.today().replace(day=1)) - timedelta(days=1)
+    return (first, end) if first <= end else (None, None)
+
+
+def _cached_month_totals(first, last):
+    """Totals for every closed month first..last (0 for empty ones), computing and storing the uncached months.
+
+    Uncached months are computed one run of consecutive months at a time, never re-reading cached ones.
+    The cache is read without a transaction; the write lock is only taken when there are months to store.
+    """
+    conn = get_connection()
+    months = []
+    month = first
+    while month <= last:
+        months.append(month.isoformat())
+        month = (month.replace(day=28) + timedelta(days=4)).replace(day=1)
+    cached = {
+        row["Month"]: row
+        for row in conn.execute(
+            "SELECT Month, Revenue, COGS, OperatingExpenses FROM FinancialMonthlyRollup WHERE Month BETWEEN ? AND ?",
+            (months[0], months[-1]),
+        )
+    }
+    missing = [m for m in months if m not in cached]
+    if missing:
+        runs = []  # [first, last day] of each stretch of consecutive missing months
+        for index, m in enumerate(months):
+            month_end = months[index + 1] if index + 1 < len(months) else None
+            month_end = (date.fromisoformat(month_end) - timedelta(days=1)).isoformat() if month_end else last.isoformat()
+            if m not in cached:
+                if runs and index and months[index - 1] not in cached:
+                    runs[-1][1] = month_end
+                else:
+                    runs.append([m, month_end])
+        with transaction():
+            computed = {}
+            for run_first, run_last in runs:
+                computed.update((row["Period"], row) for row in _financial_totals(conn, "month", run_first, run_last))
+            stored = {
+                m: {key: computed[m][key] if m in computed else 0.0 for key in ("Revenue", "COGS", "OperatingExpenses")}
+                for m in missing
+            }
+            conn.executemany(
+                "INSERT OR REPLACE INTO FinancialMonthlyRollup (Month, Revenue, COGS, OperatingExpenses) VALUES (?, ?, ?, ?)",
+                [(m, totals["Revenue"], totals["COGS"], totals["OperatingExpenses"]) for m, totals in stored.items()],
+            )
+        cached.update(stored)
+    return [(m, cached[m]) for m in months]
+
+
+def get_financial_summary(date_from, date_to, granularity="month"):
+    """Revenue, COGS, gross profit, operating expenses and net operating income per period.
+
+    `granularity` is "day", "week", "month" or "quarter"; each row's Period is the first day of
+    its bucket. Revenue is paid invoices on their payment (else issue) date, COGS is expenses
+    in the COGS category and everything else is operating expense. For month and quarter
+    buckets, whole closed months come from FinancialMonthlyRollup and are listed even when empty.
+    """
+    if granularity not in _PERIOD_BUCKETS:
+        raise ValueError(f"Unknown granularity: {granularity}")
+    date_from, date_to = date.fromisoformat(str(date_from)), date.fromisoformat(str(date_to))
+    periods = {}
+
+    def add(period, row):
+        totals = periods.setdefault(period, {"Revenue": 0.0, "COGS": 0.0, "OperatingExpenses": 0.0})
+        for key in totals:
+            totals[key] += row[key] or 0.0
+
+    first, last = _closed_months(date_from, date_to) if granularity in ("month", "quarter") else (None, None)
+    if first is None:
+        live_ranges = [(date_from, date_to)]
+    else:
+        live_ranges = [(date_from, first - timedelta(days=1)), (last + timedelta(days=1), date_to)]
+        for month, row in _cached_month_totals(first, last):
+            add(month, row)
+    with read_transaction() as conn:
+        for range_from, range_to in live_ranges:
+            if range_from <= range_to:
+                for row in _financial_totals(conn, "month" if first else granularity, range_from.isoformat(), range_to.isoformat()):
+                    add(row["Period"], row)
+
+    if granularity == "quarter":
+        by_quarter = {}
+        for month, totals in periods.items():
+            quarter = f"{month[:5]}{(int(month[5:7]) - 1) // 3 * 3 + 1:02d}-01"
+            target = by_quarter.setdefault(quarter, {"Revenue": 0.0, "COGS": 0.0, "OperatingExpenses": 0.0})
+            for key in target:
+                target[key] += totals[key]
+        periods = by_quarter
+
+    summary = []
+    for period in sorted(periods):
+        totals = periods[period]
+        gross_profit = totals["Revenue"] - totals["COGS"]
+        summary.append({
+            "Period": period,
+            "Revenue": totals["Revenue"],
+            "COGS": totals["COGS"],
+            "GrossProfit": gross_profit,
+            "OperatingExpenses": totals["OperatingExpenses"],
+            "NetOperatingIncome": gross_profit - totals["OperatingExpenses"],
+        })
+    return summary
+
+
+def get_sales_by_product(date_from=None, date_to=None, category=None, top_n=None):
+    """Units and amounts sold per product from DailyProductSales, best-selling (by Net) first."""
+    sql = """
+        SELECT d.ProductID, pr.ProductName, pr.SKU, pr.Category,
+               SUM(d.Quantity) AS Quantity, SUM(d.Gross) AS Gross, SUM(d.Discount) AS Discount, SUM(d.Net) AS Net
+        FROM DailyProductSales d
+        LEFT JOIN Products pr ON pr.ProductID = d.ProductID
+        WHERE (:date_from IS NULL OR d.SaleDate >= :date_from)
+          AND (:date_to IS NULL OR d.SaleDate <= :date_to)
+          AND (:category IS NULL OR pr.Category = :category)
+        GROUP BY d.ProductID
+        HAVING SUM(d.Quantity) <> 0 OR SUM(d.Net) <> 0
+        ORDER BY Net DESC, d.ProductID
+    """
+    params = {"date_from": date_from, "date_to": date_to, "category": category}
+    if top_n:
+        sql += " LIMIT :top_n"
+        params["top_n"] = int(top_n)
+    return _fetch_all(sql, params)
+
+
+# Length in days of the window InventoryVelocity was last built for; NULL before the first refresh.
+_VELOCITY_WINDOW_LENGTH = "(SELECT julianday(WindowEnd) - julianday(WindowStart) + 1 FROM InventoryVelocityWindow)"
+
+
+def _daily_velocity():
+    return f"COALESCE(v.Consumed / {_VELOCITY_WINDOW_LENGTH}, 0)"
+
+
+def _days_of_cover(stock):
+    return f"CASE WHEN v.Consumed > 0 THEN {stock} / (v.Consumed / {_VELOCITY_WINDOW_LENGTH}) END"
+
+
+def get_inventory_status():
+    """Every product and material with stock value, consumption velocity and days of cover (lowest cover first).
+
+    Velocity comes from InventoryVelocity, over the window stored with it; call
+    refresh_inventory_velocity() first to move that window.
+    """
+    return _fetch_all(
+        f"""
+        SELECT * FROM (
+        SELECT 'Product' AS ItemType, pr.ProductID AS ItemID, pr.ProductName AS ItemName, pr.SKU, pr.Category,
+               COALESCE(pr.QuantityInStock, 0) AS QuantityInStock, pr.ReorderLevel, pr.CostPrice AS UnitCost,
+               COALESCE(pr.QuantityInStock, 0) * COALESCE(pr.CostPrice, 0) AS StockValue,
+               {_daily_velocity()} AS DailyVelocity,
+               {_days_of_cover("COALESCE(pr.QuantityInStock, 0)")} AS DaysOfCover,
+               pr.QuantityInStock <= pr.ReorderLevel AS BelowReorder
+        FROM Products pr
+        LEFT JOIN InventoryVelocity v ON v.ItemType = 'Product' AND v.ItemID = pr.ProductID
+        UNION ALL
+        SELECT 'Material', m.MaterialID, m.MaterialName, NULL, m.Category,
+               COALESCE(m.QuantityInStock, 0), NULL, m.CostPerUnit,
+               COALESCE(m.QuantityInStock, 0) * COALESCE(m.CostPerUnit, 0),
+               {_daily_velocity()},
+               {_days_of_cover("COALESCE(m.QuantityInStock, 0)")},
+               0
+        FROM Materials m
+        LEFT JOIN InventoryVelocity v ON v.ItemType = 'Material' AND v.ItemID = m.MaterialID
+        )
+        ORDER BY DaysOfCover IS NULL, DaysOfCover, ItemType, ItemID
+        """
+    )
+
+
+def get_low_stock_products():
+    """Products at or below their reorder level, read through the partial reorder index."""
+    return _fetch_all(
+        f"""
+        SELECT pr.ProductID, pr.ProductName, pr.SKU, pr.Category, pr.QuantityInStock, pr.ReorderLevel,
+               {_daily_velocity()} AS DailyVelocity,
+               {_days_of_cover("pr.QuantityInStock")} AS DaysOfCover
+        FROM Products pr
+        LEFT JOIN InventoryVelocity v ON v.ItemType = 'Product' AND v.ItemID = pr.ProductID
+        WHERE pr.QuantityInStock <= pr.ReorderLevel
+        ORDER BY DaysOfCover IS NULL, DaysOfCover, pr.QuantityInStock - pr.ReorderLevel
+        """
+    )
+
+
+# --- DataFrame reads ---
+# fetch_frame() serves the View All grids straight from the cursor into column
+# arrays, so a page is not held as Rows, then dicts, then a DataFrame. Each grid
+# query is (search index table or None, select, key column, newest first).
+
+_FRAME_QUERIES = {
+    "customers": ("Customers", "SELECT Customers.* FROM Customers", "CustomerID", False),
+    "suppliers": ("Suppliers", "SELECT Suppliers.* FROM Suppliers", "SupplierID", False),
+    "supplier_services": ("SupplierServices", _SERVICE_SELECT, "ss.ServiceID", True),
+    "materials": ("Materials", _MATERIAL_SELECT, "m.MaterialID", False),
+    "products": ("Products", _PRODUCT_SELECT, "pr.ProductID", False),
+    "projects": ("Projects", _PROJECT_SELECT, "p.ProjectID", False),
+    "orders": (None, _ORDER_SELECT, "o.OrderID", True),
+    "invoices": ("Invoices", _INVOICE_SELECT, "i.InvoiceID", True),
+    "expenses": (None, _EXPENSE_SELECT, "e.ExpenseID", True),
+}
+
+_FRAME_DATETIME_COLUMNS = {"OrderDate", "IssueDate", "DueDate", "PaymentDate", "ExpenseDate", "ServiceDate",
+                           "StartDate", "EndDate", "DateAdded", "MovementDate"}
+_FRAME_FLOAT_COLUMNS = {"TotalAmount", "Amount", "Cost", "CostPerUnit", "CostPrice", "SellingPrice", "Budget",
+                        "UnitPriceAtSale", "Discount", "LineTotal", "CostPerUnitAtTimeOfUse"}
+
+
+def _quote_identifier(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _frame_cursor(query_name, columns, search_term, limit, after):
+    """Executes a grid query on a tuple-row cursor; returns it with its column names."""
+    search_table, select_sql, key_column, descending = _FRAME_QUERIES[query_name]
+    key_name = key_column.split(".")[-1]
+    if search_table and _fts_query(search_term):
+        sql, params = _search_page_query(search_table, select_sql, key_column, search_term, limit, after)
+        order_by = f"SearchRank, {_quote_identifier(key_name)}"
+        required = ["SearchRank", key_name]
+    else:
+        sql, params = _page_query(select_sql, key_column, descending, limit=limit, after=after)
+        order_by = f"{_quote_identifier(key_name)} {'DESC' if descending else 'ASC'}"
+        required = [key_name]
+    if columns:
+        wanted = required + [c for c in columns if c not in required]
+        sql = f"SELECT {', '.join(map(_quote_identifier, wanted))} FROM ({sql}) ORDER BY {order_by}"
+
+    cur = get_connection().cursor()
+    cur.row_factory = None  # Plain tuples; the rows only live until they are split into columns
+    cur.execute(sql, params)
+    return cur, [d[0] for d in cur.description]
+
+
+def _typed_frame(names, rows):
+    """DataFrame from tuple rows, with date columns as datetime64 and money columns as float64."""
+    frame = pd.DataFrame(dict(zip(names, map(list, zip(*rows)))) if rows else {}, columns=names)
+    for name in names:
+        if name in _FRAME_DATETIME_COLUMNS:
+            frame[name] = pd.to_datetime(frame[name], errors="coerce")
+        elif name in _FRAME_FLOAT_COLUMNS:
+            frame[name] = pd.to_numeric(frame[name], errors="coerce").astype("float64")
+    return frame
+
+
+def fetch_frame(query_name, columns=None, search_term=None, limit=None, after=None, batch_size=1000):
+    """One keyset page of a grid query as a DataFrame.
+
+    `columns` limits the SELECT to what the grid shows; the key column (and SearchRank for
+    searches) is always included so the caller can build the next cursor. Date columns come
+    back as datetime64 and money columns as float64.
+    """
+    cur, names = _frame_cursor(query_name, columns, search_term, limit, after)
+    rows = []
+    while True:
+        batch = cur.fetchmany(batch_size)
+        if not batch:
+            break
+        rows.extend(batch)
+    return _typed_frame(names, rows)
+
+
+# --- Exports ---
+# Exports read a whole grid query (every page, same search) off one cursor and
+# write it batch by batch, so only one batch is in memory at a time. Parquet
+# needs pyarrow; without it only CSV is offered.
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+EXPORT_FORMATS = ("csv", "parquet") if pq else ("csv",)
+
+
+def iter_frame_batches(query_name, columns=None, search_term=None, batch_size=5000):
+    """Every row of a grid query, in grid order, as DataFrames of at most `batch_size` rows."""
+    cur, names = _frame_cursor(query_name, columns, search_term, None, None)
+    first = True
+    try:
+        while True:
+            batch = cur.fetchmany(batch_size)
+            if batch or first:  # An empty result still yields one frame so exports get their header
+                yield _typed_frame(names, batch).drop(columns=["SearchRank"], errors="ignore")
+            if len(batch) < batch_size:
+                break
+            first = False
+    finally:
+        cur.close()
+
+
+def _parquet_schema(frame):
+    # A column that is all NULL in the first batch would otherwise be typed null for the whole file.
+    schema = pa.Schema.from_pandas(frame, preserve_index=False)
+    return pa.schema([field.with_type(pa.string()) if pa.types.is_null(field.type) else field for field in schema])
+
+
+def export_frames(batches, fileobj, file_format="csv"):
+    """Writes DataFrame batches to a binary file object as CSV or Parquet; returns the number of rows written."""
+    if file_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format: {file_format}")
+    rows, writer = 0, None
+    for batch in batches:
+        if file_format == "csv":
+            fileobj.write(batch.to_csv(index=False, header=writer is None).encode("utf-8"))
+            writer = True
+        else:
+            if writer is None:
+                writer = pq.ParquetWriter(fileobj, _parquet_schema(batch))
+            writer.write_table(pa.Table.from_pandas(batch, schema=writer.schema, preserve_index=False))
+        rows += len(batch)
+    if file_format == "parquet" and writer is not None:
+        writer.close()
+    return rows
+
+
+# --- Bulk import ---
+# import_records() takes uploaded files as a stream of DataFrame chunks (all
+# values as text), validates each chunk column-wise and inserts the valid rows
+# with one executemany per chunk. Column kinds: text, money and quantity
+# (non-negative numbers), whole (non-negative integers) and date. Lookup columns
+# are resolved by name to the ID column stored in the table.
+
+_IMPORT_SPECS = {
+    "customers": {
+        "table": "Customers",
+        "columns": [("CustomerName", "text"), ("Email", "text"), ("Phone", "text"), ("ReferenceID", "text"),
+                    ("BillingAddress", "text"), ("ShippingAddress", "text"), ("Notes", "text")],
+        "required": ["CustomerName"],
+    },
+    "products": {
+        "table": "Products",
+        "columns": [("ProductName", "text"), ("SKU", "text"), ("Description", "text"), ("Category", "text"),
+                    ("MaterialType", "text"), ("Dimensions", "text"), ("CostPrice", "money"),
+                    ("SellingPrice", "money"), ("QuantityInStock", "whole"), ("ReorderLevel", "whole"),
+                    ("SupplierName", "text")],
+        "required": ["ProductName", "SKU"],
+        "unique": ["SKU"],
+        "lookups": {"SupplierName": ("SupplierID", "Suppliers", "SupplierName")},
+        "stock_item": "Product",
+    },
+    "materials": {
+        "table": "Materials",
+        "columns": [("MaterialName", "text"), ("Category", "text"), ("SubType", "text"), ("UnitOfMeasure", "text"),
+                    ("CostPerUnit", "money"), ("QuantityInStock", "quantity"), ("SupplierName", "text")],
+        "required": ["MaterialName"],
+        "lookups": {"SupplierName": ("SupplierID", "Suppliers", "SupplierName")},
+        "stock_item": "Material",
+    },
+    "expenses": {
+        "table": "Expenses",
+        "columns": [("ExpenseDate", "date"), ("Description", "text"), ("Category", "text"), ("Amount", "money"),
+                    ("Vendor", "text"), ("ProjectName", "text"), ("ReceiptReference", "text")],
+        "required": ["ExpenseDate", "Description", "Amount"],
+        "lookups": {"ProjectName": ("ProjectID", "Projects", "ProjectName")},
+    },
+}
+
+
+def _header_key(name):
+    return re.sub(r"[^0-9a-z]", "", str(name).casefold())
+
+
+def get_import_columns(entity):
+    """Column headers an import file for `entity` may use, required ones first."""
+    spec = _IMPORT_SPECS[entity]
+    names = [name for name, _ in spec["columns"]]
+    return [n for n in names if n in spec["required"]] + [n for n in names if n not in spec["required"]]
+
+
+def _import_lookup(conn, table, name_column, key_column):
+    """casefolded name -> ID; names shared by several rows map to None so they are reported as ambiguous."""
+    ids = {}
+    for key, name in conn.execute(f"SELECT {key_column}, {name_column} FROM {table} WHERE {name_column} IS NOT NULL"):
+        folded = name.strip().casefold()
+        ids[folded] = None if folded in ids else key
+    return ids
+
+
+def _validate_import_chunk(spec, chunk, lookups, seen):
+    """(values to insert, error message per row) for one chunk; rows with an empty message are valid."""
+    errors = pd.Series("", index=chunk.index, dtype=object)
+
+    def flag(mask, message):
+        mask = mask.fillna(False).astype(bool)
+        if mask.any():
+            errors[mask] = errors[mask] + (message if isinstance(message, str) else message[mask]) + "; "
+
+    values = {}
+    for name, kind in spec["columns"]:
+        raw = chunk[name].astype("string").str.strip() if name in chunk else pd.Series(pd.NA, index=chunk.index, dtype="string")
+        raw = raw.mask(raw == "")
+        if name in spec["required"]:
+            flag(raw.isna(), f"{name} is required")
+        if kind == "text":
+            values[name] = raw
+        elif kind == "date":
+            parsed = pd.to_datetime(raw, errors="coerce", format="ISO8601")
+            flag(raw.notna() & parsed.isna(), f"{name} is not a date (use YYYY-MM-DD)")
+            values[name] = parsed.dt.strftime("%Y-%m-%d")
+        else:
+            number = pd.to_numeric(raw, errors="coerce")
+            flag(raw.notna() & (number.isna() | (number < 0)), f"{name} must be a non-negative number")
+            if kind == "whole":
+                flag(number.notna() & (number % 1 != 0), f"{name} must be a whole number")
+            values[name] = number.fillna(0)
+
+    for name in spec.get("unique", []):
+        column = values[name]
+        flag(column.notna() & column.duplicated(keep="first"), f"{name} is repeated in the file")
+        flag(column.map(seen[name].__contains__, na_action="ignore"), f"{name} already exists")
+
+    for name, (key_column, table, _) in spec.get("lookups", {}).items():
+        names = values.pop(name)
+        folded = names.str.casefold()
+        known = folded.isin(lookups[name].keys())
+        ids = folded.map(lookups[name])
+        flag(names.notna() & ~known, "Unknown " + table[:-1].lower() + " '" + names.fillna("") + "'")
+        flag(names.notna() & known & ids.isna(), "Several " + table.lower() + " are named '" + names.fillna("") + "'")
+        values[key_column] = ids
+    return values, errors
+
+
+def import_records(entity, chunks, on_chunk=None):
+    """Validates and inserts DataFrame chunks of `entity` rows; returns inserted/rejected counts and the rejects.
+
+    Headers are matched ignoring case, spaces and punctuation. Each chunk is inserted in its
+    own transaction, so a failure keeps the chunks before it, and is added to the search index
+    in one statement instead of row by row. `Errors` holds the rejected
+    rows as uploaded, with `Row` (the file line, header = 1) and `Error` columns in front.
+    `on_chunk(inserted, rejected)` is called with the running totals after every chunk.
+    """
+    spec = _IMPORT_SPECS[entity]
+    known_headers = {_header_key(name): name for name, _ in spec["columns"]}
+    for name in spec.get("lookups", {}):
+        known_headers.setdefault(_header_key(name[: -len("Name")]), name)
+    table = spec["table"]
+    conn = get_connection()
+    lookups = {
+        name: _import_lookup(conn, lookup_table, name_column, key_column)
+        for name, (key_column, lookup_table, name_column) in spec.get("lookups", {}).items()
+    }
+    seen = {
+        name: {row[0] for row in conn.execute(f"SELECT {name} FROM {table} WHERE {name} IS NOT NULL")}
+        for name in spec.get("unique", [])
+    }
+    key_column = f"{table[:-1]}ID"
+    searchable = table in _SEARCH_INDEXES
+    inserted, rejected, error_frames = 0, 0, []
+    for chunk in chunks:
+        chunk = chunk.rename(columns=lambda header: known_headers.get(_header_key(header), header))
+        missing = [name for name in spec["required"] if name not in chunk.columns]
+        if missing:
+            raise ValueError(f"Missing required column(s): {', '.join(missing)}")
+        values, errors = _validate_import_chunk(spec, chunk, lookups, seen)
+        valid = errors == ""
+        if valid.any():
+            columns = list(values)
+            rows = list(zip(*(values[c][valid].astype(object).where(values[c][valid].notna(), None).tolist()
+                              for c in columns)))
+            with transaction() as conn:
+                _invalidate_reference_lists(table)
+                last_id = conn.execute(f"SELECT COALESCE(MAX({key_column}), 0) FROM {table}").fetchone()[0]
+                if searchable:
+                    conn.execute("INSERT INTO SearchIndexBypass (TableName) VALUES (?)", (table,))
+                conn.executemany(
+                    f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})", rows
+                )
+                if searchable:
+                    conn.execute("DELETE FROM SearchIndexBypass WHERE TableName = ?", (table,))
+                    _index_search_rows_after(conn, table, last_id)
+                if spec.get("stock_item"):
+                    conn.execute(
+                        f"INSERT INTO StockMovements (ItemType, ItemID, QuantityChange, Reason, ReferenceType) "
+                        f"SELECT ?, {key_column}, QuantityInStock, 'Opening', 'Import' FROM {table} "
+                        f"WHERE {key_column} > ? AND COALESCE(QuantityInStock, 0) <> 0",
+                        (spec["stock_item"], last_id),
+                    )
+            for name in seen:
+                seen[name].update(values[name][valid].dropna())
+            inserted += len(rows)
+        if not valid.all():
+            bad = chunk.loc[~valid].copy()
+            bad.insert(0, "Error", errors[~valid].str.rstrip("; "))
+            bad.insert(0, "Row", bad.index + 2)
+            error_frames.append(bad)
+            rejected += len(bad)
+        if on_chunk:
+            on_chunk(inserted, rejected)
+    errors = pd.concat(error_frames, ignore_index=True) if error_frames else pd.DataFrame(columns=["Row", "Error"])
+    return {"Inserted": inserted, "Rejected": rejected, "Errors": errors}
+
+
+# --- Profiling ---
+# enable_profiling() swaps every public function in this module for a wrapper
+# that tallies calls, wall time, rows returned and the bytes those results hold.
+# Tallies are kept per thread; Streamlit runs each rerun on its script thread,
+# so app.py calls reset_profile() at the top of the script and reads
+# get_profile() at the bottom. Calls one db function makes to another count as
+# calls, but only the outermost call adds to the totals.
+
+_PROFILE_EXCLUDED = {"get_connection", "configure", "close_all_connections", "rows_to_dicts",
+                     "enable_profiling", "profiling_enabled", "reset_profile", "get_profile"}
+_profiling_enabled = False
+
+
+def _result_volume(result):
+    """(rows, bytes) held by a db function's result; records are Rows, dicts of scalars or DataFrame rows."""
+    if result is None:
+        return 0, 0
+    if isinstance(result, pd.DataFrame):
+        return len(result), int(result.memory_usage(deep=True).sum())
+    if isinstance(result, sqlite3.Row):
+        return 1, sys.getsizeof(result) + sum(sys.getsizeof(value) for value in result)
+    if isinstance(result, dict) and not any(isinstance(v, (dict, list, tuple, sqlite3.Row, pd.DataFrame)) for v in result.values()):
+        return 1, sys.getsizeof(result) + sum(sys.getsizeof(value) for value in result.values())
+    if isinstance(result, (dict, list, tuple)):
+        rows, size = 0, sys.getsizeof(result)
+        for item in (result.values() if isinstance(result, dict) else result):
+            item_rows, item_size = _result_volume(item)
+            rows += item_rows
+            size += item_size
+        return rows, size
+    return 0, sys.getsizeof(result)
+
+
+def _profiled(name, fn):
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        depth = getattr(_local, "profile_depth", 0)
+        _local.profile_depth = depth + 1
+        result, started = None, time.perf_counter()
+        try:
+            result = fn(*args, **kwargs)
+            return result
+        finally:
+            elapsed = time.perf_counter() - started
+            _local.profile_depth = depth
+            rows, size = _result_volume(result)
+            profile = _current_profile()
+            stats = profile["Functions"].setdefault(name, {"Function": name, "Calls": 0, "Seconds": 0.0, "MaxSeconds": 0.0,
+                                                           "Rows": 0, "Bytes": 0})
+            stats["Calls"] += 1
+            stats["Seconds"] += elapsed
+            stats["MaxSeconds"] = max(stats["MaxSeconds"], elapsed)
+            stats["Rows"] += rows
+            stats["Bytes"] += size
+            if depth == 0:
+                profile["Calls"] += 1
+                profile["Seconds"] += elapsed
+                profile["Rows"] += rows
+                profile["Bytes"] += size
+
+    return wrapper
+
+
+def _current_profile():
+    profile = getattr(_local, "profile", None)
+    if profile is None:
+        profile = _local.profile = {"Functions": {}, "Calls": 0, "Seconds": 0.0, "Rows": 0, "Bytes": 0}
+    return profile
+
+
+def enable_profiling():
+    """Wraps the public functions of this module (not generators or context managers) with call tallies."""
+    global _profiling_enabled
+    if _profiling_enabled:
+        return
+    module = sys.modules[__name__]
+    for name, fn in list(vars(module).items()):
+        if (name.startswith("_") or name in _PROFILE_EXCLUDED or not inspect.isfunction(fn)
+                or fn.__module__ != __name__ or inspect.isgeneratorfunction(fn) or hasattr(fn, "__wrapped__")):
+            continue
+        setattr(module, name, _profiled(name, fn))
+    _profiling_enabled = True
+
+
+def profiling_enabled():
+    return _profiling_enabled
+
+
+def reset_profile():
+    """Starts a new tally for the calling thread."""
+    _local.profile = None
+    _local.profile_depth = 0
+
+
+def get_profile():
+    """The calling thread's tally since reset_profile(): totals plus per-function stats, slowest first."""
+    profile = _current_profile()
+    return {**profile, "Functions": sorted(profile["Functions"].values(), key=lambda f: f["Seconds"], reverse=True)}
+
+
+if PROFILE_DB_CALLS:
+    enable_profiling()
@@ -0,0 +1,453 @@
+"""Deterministic synthetic data for load-testing the DIYI database.
+
+    python datagen.py --db data/load.db --orders 1000000 --seed 7
+    python datagen.py --db data/load.db --rows 10000000
+
+or from Python, against the database `database` is configured for:
+
+    import datagen
+    datagen.generate(orders=100_000, seed=7)
+
+Every table the UI reads is filled: customers (a few whales place a large share
+of the orders), suppliers, materials, products with SKUs and shared placeholder
+images, projects, project materials, supplier services with their auto-logged
+expenses, orders with items (dates follow a seasonal curve), invoices in every
+status, and general expenses. Rows are generated lazily and written batch by
+batch with executemany, using explicit IDs so references never need a lookup.
+Only the per-product prices and per-project customers are kept in memory. The
+same seed and sizes always produce the same rows.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from array import array
+from datetime import date, timedelta
+from itertools import accumulate
+
+import database as db
+
+BATCH_SIZE = 20_000
+HISTORY_DAYS = 3 * 365
+IMAGE_COUNT = 24  # Distinct placeholder product images, shared round-robin
+IMAGE_SUBDIR = "generated"
+
+WHALE_FRACTION = 0.01  # Share of customers that are whales...
+WHALE_ORDER_SHARE = 0.30  # ...and the share of orders they place
+ITEM_COUNTS = (1, 1, 2, 2, 3, 4, 6)  # Lines per order, drawn uniformly
+MONTH_WEIGHTS = (0.8, 0.8, 1.0, 1.1, 0.9, 0.7, 0.7, 0.8, 1.0, 1.2, 1.5, 1.6)  # Jan..Dec order volume
+
+PRODUCT_CATEGORIES = ("Sofa", "Table", "Chair", "Bed", "Wardrobe", "Shelf", "Desk", "Cabinet", "Dresser", "Stool")
+PRODUCT_MATERIALS = ("Oak", "Teak", "Sheesham", "Pine", "MDF", "Metal", "Rattan")
+MATERIAL_CATEGORIES = {
+    "Wood": ("Oak", "Teak", "Sheesham", "Pine", "MDF", "Plywood"),
+    "Fabric": ("Linen", "Velvet", "Leather", "Jute", "Cotton"),
+    "Hardware": ("Hinges", "Screws", "Handles", "Drawer Slides", "Brackets"),
+    "Finish": ("Varnish", "Lacquer", "Paint", "Polish", "Stain"),
+    "Foam": ("High Density", "Memory", "Latex"),
+}
+UNITS = {"Wood": "sq ft", "Fabric": "metre", "Hardware": "piece", "Finish": "litre", "Foam": "sheet"}
+SERVICE_TYPES = ("Transport", "Upholstery", "Polishing", "Carpentry", "Installation", "Design")
+PROJECT_STATUSES = ("Planning", "In Progress", "On Hold", "Completed", "Completed", "Cancelled")
+ORDER_STATUSES = ("Pending", "Confirmed", "Processing", "Shipped", "Delivered", "Delivered", "Delivered", "Cancelled")
+INVOICE_STATUSES = ("Draft", "Sent", "Paid", "Paid", "Paid", "Overdue", "Cancelled")
+EXPENSE_CATEGORIES = ("Operational", "Marketing", "COGS", "COGS", "Salaries", "Utilities", "Rent", "Travel", "Other")
+CITIES = ("Lahore", "Karachi", "Islamabad", "Rawalpindi", "Faisalabad", "Multan", "Peshawar", "Sialkot")
+FIRST_NAMES = ("Ali", "Ayesha", "Bilal", "Fatima", "Hassan", "Hina", "Imran", "Maryam", "Omar", "Sana", "Usman",
+               "Zainab", "Ahmed", "Amna", "Farhan", "Nida")
+LAST_NAMES = ("Khan", "Ahmed", "Malik", "Butt", "Chaudhry", "Sheikh", "Qureshi", "Raza", "Siddiqui", "Mirza")
+
+
+def plan_sizes(orders):
+    """Rows per table for a given number of orders."""
+    projects = max(10, orders // 20)
+    return {
+        "Customers": max(20, orders // 10),
+        "Suppliers": max(5, orders // 2_000),
+        "Materials": max(20, orders // 500),
+        "Products": max(20, orders // 200),
+        "Projects": projects,
+        "ProjectMaterials": projects * 4,
+        "SupplierServices": projects,
+        "Orders": orders,
+        "Invoices": projects * 2,
+        "Expenses": max(20, orders // 5),
+    }
+
+
+# Rows written per order: the planned tables, the order lines and ~0.9 logged expense per supplier service.
+ROWS_PER_ORDER = (sum(plan_sizes(1_000_000).values()) + 0.9 * plan_sizes(1_000_000)["SupplierServices"]) / 1_000_000 \
+    + sum(ITEM_COUNTS) / len(ITEM_COUNTS)
+
+
+def _next_id(conn, table, key):
+    seq = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = ?", (table,)).fetchone()
+    return max(seq[0] if seq else 0, conn.execute(f"SELECT COALESCE(MAX({key}), 0) FROM {table}").fetchone()[0]) + 1
+
+
+def _write(sql, rows, batch_size, on_batch=None):
+    """executemany over `rows` in batches, one transaction each; returns the number of rows written."""
+    written, batch = 0, []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == batch_size:
+            written += _flush(sql, batch, on_batch)
+            batch = []
+    if batch:
+        written += _flush(sql, batch, on_batch)
+    return written
+
+
+def _flush(sql, batch, on_batch):
+    with db.transaction() as conn:
+        conn.executemany(sql, batch)
+    if on_batch:
+        on_batch(len(batch))
+    return len(batch)
+
+
+def _placeholder_images(count, seed):
+    """Writes `count` small JPEGs under the image folder (once) and returns their paths."""
+    from PIL import Image
+
+    folder = os.path.join(db.IMAGE_DIR, IMAGE_SUBDIR)
+    os.makedirs(folder, exist_ok=True)
+    rng = random.Random(seed)
+    paths = []
+    for i in range(count):
+        path = os.path.join(folder, f"product_sample_{i:02d}.jpg")
+        if not os.path.exists(path):
+            top = tuple(rng.randrange(80, 230) for _ in range(3))
+            bottom = tuple(max(0, c - 60) for c in top)
+            image = Image.linear_gradient("L").resize((640, 480))
+            Image.composite(Image.new("RGB", image.size, bottom), Image.new("RGB", image.size, top), image).save(
+                path, "JPEG", quality=80)
+        paths.append(path)
+    return paths
+
+
+class _Sampler:
+    """Skewed and seasonal draws over one random.Random."""
+
+    def __init__(self, rng, today):
+        self.rng = rng
+        self.days = [today - timedelta(days=offset) for offset in range(HISTORY_DAYS)]
+        self.day_weights = list(accumulate(MONTH_WEIGHTS[d.month - 1] for d in self.days))
+
+    def seasonal_dates(self, k):
+        return self.rng.choices(self.days, cum_weights=self.day_weights, k=k)
+
+    def uniform_date(self):
+        return self.days[self.rng.randrange(len(self.days))]
+
+    def customer(self, first_id, count, whales):
+        if self.rng.random() < WHALE_ORDER_SHARE:
+            return first_id + self.rng.randrange(whales)
+        return first_id + self.rng.randrange(count)
+
+
+def generate(orders, seed=0, as_of=None, batch_size=BATCH_SIZE, image_count=IMAGE_COUNT, progress=None):
+    """Appends a generated data set with `orders` orders to the configured database; returns rows per table.
+
+    Dates run back HISTORY_DAYS from `as_of` (default today); pass it to reproduce a data set
+    on another day. `progress(table, rows_written)` is called after every batch.
+    """
+    db.init_db()
+    rng = random.Random(seed)
+    today = date.fromisoformat(str(as_of)) if as_of else date.today()
+    sample = _Sampler(rng, today)
+    sizes = plan_sizes(orders)
+    conn = db.get_connection()
+    first = {table: _next_id(conn, table, key) for table, key in (
+        ("Customers", "CustomerID"), ("Suppliers", "SupplierID"), ("Materials", "MaterialID"),
+        ("Products", "ProductID"), ("Projects", "ProjectID"), ("SupplierServices", "ServiceID"),
+        ("Orders", "OrderID"), ("Expenses", "ExpenseID"), ("Invoices", "InvoiceID"))}
+    written = {}
+
+    def write(table, sql, rows):
+        counter = [0]
+
+        def on_batch(n):
+            counter[0] += n
+            if progress:
+                progress(table, counter[0])
+
+        written[table] = written.get(table, 0) + _write(sql, rows, batch_size, on_batch)
+
+    def pick(start, count):
+        return start + rng.randrange(count)
+
+    def person():
+        return f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+
+    # --- Customers and suppliers ---
+    n_customers, n_suppliers = sizes["Customers"], sizes["Suppliers"]
+    whales = max(1, int(n_customers * WHALE_FRACTION))
+    write("Customers",
+          "INSERT INTO Customers (CustomerID, CustomerName, Email, Phone, ReferenceID, BillingAddress, ShippingAddress) "
+          "VALUES (?, ?, ?, ?, ?, ?, ?)",
+          ((first["Customers"] + i, f"{person()} {'Interiors' if i < whales else ''}".strip(),
+            f"customer{first['Customers'] + i}@example.com", f"+92-3{rng.randrange(10**9):09d}",
+            f"CUST-{seed}-{first['Customers'] + i:07d}" if rng.random() < 0.9 else None,
+            f"{rng.randrange(1, 300)} Street {rng.randrange(1, 40)}, {rng.choice(CITIES)}",
+            f"{rng.randrange(1, 300)} Block {rng.choice('ABCDEFGH')}, {rng.choice(CITIES)}")
+           for i in range(n_customers)))
+    supplier_names = {}
+
+    def suppliers():
+        for i in range(n_suppliers):
+            supplier_id = first["Suppliers"] + i
+            supplier_names[supplier_id] = f"{rng.choice(LAST_NAMES)} {rng.choice(('Timber', 'Traders', 'Fabrics', 'Hardware', 'Works'))} {supplier_id}"
+            yield (supplier_id, supplier_names[supplier_id], person(), f"supplier{supplier_id}@example.com",
+                   f"+92-42-{rng.randrange(10**7):07d}", f"Industrial Area, {rng.choice(CITIES)}")
+
+    write("Suppliers",
+          "INSERT INTO Suppliers (SupplierID, SupplierName, ContactPerson, Email, Phone, Address) VALUES (?, ?, ?, ?, ?, ?)",
+          suppliers())
+
+    # --- Materials and products ---
+    material_costs = array("d")
+
+    def materials():
+        for i in range(sizes["Materials"]):
+            category = rng.choice(tuple(MATERIAL_CATEGORIES))
+            subtype = rng.choice(MATERIAL_CATEGORIES[category])
+            material_costs.append(round(rng.uniform(50, 5_000), 2))
+            yield (first["Materials"] + i, f"{subtype} {category} #{i + 1}", category, subtype, UNITS[category],
+                   material_costs[-1], rng.randrange(0, 1_000), pick(first["Suppliers"], n_suppliers))
+
+    write("Materials",
+          "INSERT INTO Materials (MaterialID, MaterialName, Category, SubType, UnitOfMeasure, CostPerUnit, "
+          "QuantityInStock, SupplierID) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+          materials())
+    images = _placeholder_images(image_count, seed) if image_count else [None]
+    n_products = sizes["Products"]
+    product_prices = array("d")
+    # Product popularity follows a Zipf-like curve, so a few products dominate sales.
+    product_weights = list(accumulate(1 / (rank + 1) ** 0.8 for rank in range(n_products)))
+
+    def products():
+        for i in range(n_products):
+            category = rng.choice(PRODUCT_CATEGORIES)
+            cost = round(rng.uniform(2_000, 150_000), 2)
+            product_prices.append(round(cost * rng.uniform(1.25, 1.9), 2))
+            yield (first["Products"] + i, f"{rng.choice(PRODUCT_MATERIALS)} {category} {i + 1}",
+                   f"SKU-{seed}-{first['Products'] + i:08d}", f"Generated {category.lower()}", category,
+                   rng.choice(PRODUCT_MATERIALS), f"{rng.randrange(30, 240)} x {rng.randrange(30, 120)} x {rng.randrange(40, 200)} cm",
+                   cost, product_prices[-1], rng.randrange(0, 300), rng.randrange(0, 25),
+                   pick(first["Suppliers"], n_suppliers), images[i % len(images)])
+
+    write("Products",
+          "INSERT INTO Products (ProductID, ProductName, SKU, Description, Category, MaterialType, Dimensions, CostPrice, "
+          "SellingPrice, QuantityInStock, ReorderLevel, SupplierID, ImagePath) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+          products())
+    with db.transaction():  # Opening ledger rows for the new stock, as add_product()/add_material() record them
+        for item_type, (table, key, _) in db._STOCK_ITEMS.items():
+            conn.execute(
+                f"INSERT INTO StockMovements (ItemType, ItemID, QuantityChange, Reason, ReferenceType) "
+                f"SELECT ?, {key}, QuantityInStock, 'Opening', 'Generated' FROM {table} "
+                f"WHERE {key} >= ? AND QuantityInStock <> 0",
+                (item_type, first[table]),
+            )
+
+    # --- Projects, their materials and supplier services ---
+    n_projects, n_materials = sizes["Projects"], sizes["Materials"]
+    project_customers = array("q")
+    project_starts = []
+
+    def projects():
+        for i in range(n_projects):
+            project_customers.append(sample.customer(first["Customers"], n_customers, whales))
+            start = sample.uniform_date()
+            project_starts.append(start)
+            status = rng.choice(PROJECT_STATUSES)
+            end = (start + timedelta(days=rng.randrange(14, 180))).isoformat() if status in ("Completed", "Cancelled") else None
+            yield (first["Projects"] + i, f"{rng.choice(('Villa', 'Office', 'Apartment', 'Hotel', 'Cafe'))} fit-out {first['Projects'] + i}",
+                   project_customers[-1], start.isoformat(), end, status, round(rng.uniform(100_000, 5_000_000), -3),
+                   "Generated project")
+
+    write("Projects",
+          "INSERT INTO Projects (ProjectID, ProjectName, CustomerID, StartDate, EndDate, Status, Budget, Description) "
+          "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+          projects())
+
+    def project_materials():
+        for _ in range(sizes["ProjectMaterials"]):
+            project = rng.randrange(n_projects)
+            material = rng.randrange(n_materials)
+            used_on = min(today, project_starts[project] + timedelta(days=rng.randrange(90)))
+            yield (first["Projects"] + project, first["Materials"] + material, rng.randint(1, 40),
+                   material_costs[material], None, used_on.isoformat())
+
+    write("ProjectMaterials",
+          "INSERT INTO ProjectMaterials (ProjectID, MaterialID, QuantityUsed, CostPerUnitAtTimeOfUse, Notes, DateAdded) "
+          "VALUES (?, ?, ?, ?, ?, ?)",
+          project_materials())
+
+    # Services with a cost get the expense add_supplier_service() logs, in the same batch.
+    next_expense = first["Expenses"]
+
+    def services_with_expenses():
+        nonlocal next_expense
+        for i in range(sizes["SupplierServices"]):
+            service_id = first["SupplierServices"] + i
+            project = rng.randrange(n_projects)
+            supplier_id = pick(first["Suppliers"], n_suppliers)
+            service_type = rng.choice(SERVICE_TYPES)
+            name = f"{service_type} for project {first['Projects'] + project}"
+            served_on = min(today, project_starts[project] + timedelta(days=rng.randrange(120))).isoformat()
+            cost = round(rng.uniform(2_000, 250_000), -2) if rng.random() < 0.9 else 0
+            service = (service_id, supplier_id, first["Projects"] + project, name, service_type, served_on, cost,
+                       None, "Generated service", 1 if cost else 0)
+            expense = None
+            if cost:
+                expense = (next_expense, served_on, f"Supplier service: {name}", "Supplier Service", cost,
+                           supplier_names[supplier_id], first["Projects"] + project, None, service_id)
+                next_expense += 1
+            yield service, expense
+
+    service_sql = ("INSERT INTO SupplierServices (ServiceID, SupplierID, ProjectID, ServiceName, ServiceType, ServiceDate, "
+                   "Cost, ReceiptPath, Description, IsExpenseLogged) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)")
+    expense_sql = ("INSERT INTO Expenses (ExpenseID, ExpenseDate, Description, Category, Amount, Vendor, ProjectID, "
+                   "ReceiptReference, SupplierServiceID) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)")
+    _write_pairs(services_with_expenses(), ("SupplierServices", service_sql), ("Expenses", expense_sql),
+                 batch_size, written, progress)
+
+    # --- Orders with their items ---
+    def orders_with_items():
+        order_id = first["Orders"]
+        remaining = orders
+        while remaining:
+            dates = sample.seasonal_dates(min(remaining, batch_size))
+            for ordered_on in dates:
+                if rng.random() < 0.15:
+                    project = rng.randrange(n_projects)
+                    customer_id, project_id = project_customers[project], first["Projects"] + project
+                else:
+                    customer_id, project_id = sample.customer(first["Customers"], n_customers, whales), None
+                status = rng.choice(ORDER_STATUSES)
+                payment = "Refunded" if status == "Cancelled" and rng.random() < 0.5 else rng.choice(
+                    ("Paid", "Paid", "Unpaid", "Partially Paid") if status != "Pending" else ("Unpaid",))
+                order = (order_id, ordered_on.isoformat(), customer_id, project_id, status, 0, payment, None, None,
+                         f"ORD-{seed}-{order_id:09d}")
+                items = []
+                for product in rng.choices(range(n_products), cum_weights=product_weights, k=rng.choice(ITEM_COUNTS)):
+                    quantity = rng.randint(1, 4)
+                    price = product_prices[product]
+                    discount = round(price * quantity * rng.choice((0, 0, 0, 0.05, 0.1)), 2)
+                    items.append((order_id, first["Products"] + product, quantity, price, discount,
+                                  round(quantity * price - discount, 2)))
+                yield order, items
+                order_id += 1
+            remaining -= len(dates)
+
+    order_sql = ("INSERT INTO Orders (OrderID, OrderDate, CustomerID, ProjectID, OrderStatus, TotalAmount, PaymentStatus, "
+                 "ShippingAddress, Notes, ReferenceID) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)")
+    item_sql = ("INSERT INTO OrderItems (OrderID, ProductID, QuantitySold, UnitPriceAtSale, Discount, LineTotal) "
+                "VALUES (?, ?, ?, ?, ?, ?)")
+    _write_pairs(orders_with_items(), ("Orders", order_sql), ("OrderItems", item_sql), batch_size, written, progress)
+
+    # --- Invoices and general expenses ---
+    def invoices():
+        for i in range(sizes["Invoices"]):
+            invoice_id = first["Invoices"] + i
+            project = rng.randrange(n_projects)
+            status = rng.choice(INVOICE_STATUSES)
+            if status == "Draft":
+                issued = today - timedelta(days=rng.randrange(20))
+            elif status in ("Sent", "Overdue"):
+                issued = today - timedelta(days=rng.randrange(10, 25) if status == "Sent" else rng.randrange(35, 200))
+            else:
+                issued = max(project_starts[project], sample.uniform_date())
+            due = issued + timedelta(days=30)
+            paid = min(today, issued + timedelta(days=rng.randrange(45))).isoformat() if status == "Paid" else None
+            yield (invoice_id, f"INV-G{seed}-{invoice_id:09d}", first["Projects"] + project, project_customers[project],
+                   issued.isoformat(), due.isoformat(), paid, round(rng.uniform(20_000, 1_500_000), -2), status, None)
+
+    write("Invoices",
+          "INSERT INTO Invoices (InvoiceID, InvoiceReferenceID, ProjectID, CustomerID, IssueDate, DueDate, PaymentDate, "
+          "TotalAmount, Status, Notes) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+          invoices())
+
+    def expenses():
+        expense_dates = iter(())
+        for i in range(sizes["Expenses"]):
+            expense_date = next(expense_dates, None)
+            if expense_date is None:
+                expense_dates = iter(sample.seasonal_dates(batch_size))
+                expense_date = next(expense_dates)
+            category = rng.choice(EXPENSE_CATEGORIES)
+            project_id = first["Projects"] + rng.randrange(n_projects) if category == "COGS" or rng.random() < 0.2 else None
+            yield (next_expense + i, expense_date.isoformat(), f"{category} expense", category,
+                   round(rng.uniform(500, 200_000), 2), f"Vendor {rng.randrange(1, 200)}", project_id, None, None)
+
+    write("Expenses", expense_sql, expenses())
+    with db.transaction():
+        conn.execute("ANALYZE")
+    return written
+
+
+def _write_pairs(pairs, parent, child, batch_size, written, progress=None):
+    """Writes (parent row, child row(s) or None) pairs; each batch inserts the parents before their children."""
+    (parent_table, parent_sql), (child_table, child_sql) = parent, child
+    parents, children = [], []
+
+    def flush():
+        with db.transaction() as conn:
+            conn.executemany(parent_sql, parents)
+            conn.executemany(child_sql, children)
+        for table, rows in ((parent_table, parents), (child_table, children)):
+            written[table] = written.get(table, 0) + len(rows)
+            if progress:
+                progress(table, written[table])
+        parents.clear()
+        children.clear()
+
+    for parent_row, child_rows in pairs:
+        parents.append(parent_row)
+        if isinstance(child_rows, list):
+            children.extend(child_rows)
+        elif child_rows is not None:
+            children.append(child_rows)
+        if len(parents) == batch_size:
+            flush()
+    if parents:
+        flush()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fill a DIYI database with deterministic synthetic data.")
+    parser.add_argument("--db", default=db.DB_FILE, help=f"database file (default: {db.DB_FILE})")
+    size = parser.add_mutually_exclusive_group()
+    size.add_argument("--orders", type=int, default=10_000, help="number of orders; other tables scale with it")
+    size.add_argument("--rows", type=int, help="approximate total rows across all tables instead of --orders")
+    parser.add_argument("--seed", type=int, default=0, help="random seed (same seed and size = same data)")
+    parser.add_argument("--as-of", help="last day of the generated history, YYYY-MM-DD (default: today)")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="rows per executemany/transaction")
+    parser.add_argument("--images", type=int, default=IMAGE_COUNT, help="distinct placeholder product images (0 = none)")
+    args = parser.parse_args(argv)
+
+    orders = int(args.rows / ROWS_PER_ORDER) if args.rows else args.orders
+    db.configure(db_file=args.db)
+    started = time.perf_counter()
+    last_report = [started]
+
+    def progress(table, rows):
+        now = time.perf_counter()
+        if now - last_report[0] >= 2:
+            print(f"  {table}: {rows:,} rows ({now - started:,.0f}s)", flush=True)
+            last_report[0] = now
+
+    print(f"Generating {orders:,} orders into {args.db} (seed {args.seed}) ...", flush=True)
+    written = generate(orders, seed=args.seed, as_of=args.as_of, batch_size=args.batch_size, image_count=args.images, progress=progress)
+    elapsed = time.perf_counter() - started
+    total = sum(written.values())
+    for table, rows in written.items():
+        print(f"{table:<18} {rows:>12,}")
+    print(f"{'Total':<18} {total:>12,} rows in {elapsed:,.1f}s ({total / elapsed:,.0f} rows/s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,401 @@
+"""Propose missing and unused indexes from the slow-query log.
+
+    python index_advisor.py
+    python index_advisor.py --db data/copy.db --log data/slow_queries.jsonl --top 30 --analyze
+
+The worst logged SELECT fingerprints are replayed against the database. Their
+parameters are filled from the data: equality and LIKE placeholders get the
+column's most common value (the worst case for an index), range bounds get the
+column's MIN/MAX, and LIMIT gets a grid page. For every replayed query whose
+plan scans a table in full or sorts it through a temp B-tree, an index is
+derived from its equality, range and ORDER BY columns. The index is created
+inside a savepoint, ANALYZEd, and the query is timed again. Then it is rolled
+back, so the measured speedup is the one the proposal reports. Scans are
+judged as in slow_queries: a scan under a LIMIT with no temp B-tree reads one
+page and gets no proposal.
+
+Indexes that no logged or replayed plan uses are listed with their
+sqlite_stat1 selectivity and size, and with the timing of the replayed queries
+on that table while the index is dropped (again inside a rolled-back
+savepoint). Indexes that back a foreign key are marked, since cascades and
+parent deletes use them without showing up in a SELECT plan. The slow-query
+log only holds slow statements, so "unused" means unused by those.
+
+Creating indexes takes the database's write lock while it runs. On a busy
+production file, point --db at a copy.
+"""
+import argparse
+import re
+import sqlite3
+import statistics
+import sys
+import time
+
+import database as db
+import slow_queries
+
+LIMIT_VALUE = 50  # Bound to LIMIT placeholders, like a View All grid page
+MIN_GAIN = 0.2  # Proposals must make a query at least this much faster (20%)...
+MIN_GAIN_MS = 0.1  # ...and by at least this many milliseconds
+
+_PLACEHOLDER = re.compile(r"\?|:[A-Za-z_]\w*")
+_COMPARISON = re.compile(
+    r"(?:\b(\w+)\.)?\b(\w+)\s*(=|>=|<=|>|<|\bLIKE\b|\bBETWEEN\b)\s*(\?|:[A-Za-z_]\w*)(?:\s+AND\s+(\?|:[A-Za-z_]\w*))?", re.I)
+_PAGING = re.compile(r"\b(LIMIT|OFFSET)\s+(\?|:[A-Za-z_]\w*)", re.I)
+_ORDER_BY = re.compile(r"\bORDER\s+BY\s+(.+?)(?:\bLIMIT\b|\)|$)", re.I | re.S)
+_TEMP_SORT = re.compile(r"^\s*USE TEMP B-TREE FOR (?:RIGHT PART OF )?ORDER BY")
+_USES_INDEX = re.compile(r"USING (?:COVERING )?INDEX (\w+)")
+
+
+def open_database(path):
+    """A plain connection (not a logged one) in autocommit mode, so savepoints are the only transactions."""
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.execute("PRAGMA foreign_keys = ON")
+    return conn
+
+
+def _table_columns(conn, table):
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+
+def _column_table(conn, aliases, qualifier, column):
+    """Table a (qualifier.)column reference reads, or None when it can't be told."""
+    if qualifier:
+        return aliases.get(qualifier)
+    owners = {table for table in aliases.values() if column in _table_columns(conn, table)}
+    return owners.pop() if len(owners) == 1 else None
+
+
+def _sample_value(conn, table, column, operator, bound):
+    if operator in ("=", "LIKE"):
+        sql = f"SELECT {column} FROM {table} WHERE {column} IS NOT NULL GROUP BY {column} ORDER BY COUNT(*) DESC LIMIT 1"
+    elif operator in (">", ">=") or (operator == "BETWEEN" and bound == 0):
+        sql = f"SELECT MIN({column}) FROM {table}"
+    else:
+        sql = f"SELECT MAX({column}) FROM {table}"
+    row = conn.execute(sql).fetchone()
+    return row[0] if row else None
+
+
+def predicates(conn, sql):
+    """(table, column, operator) for each column compared with a placeholder, keyed by placeholder position or name."""
+    aliases = slow_queries.table_aliases(sql)
+    positions = {match.start(): index for index, match in enumerate(_PLACEHOLDER.finditer(sql))}
+    found = {}
+    for match in _COMPARISON.finditer(sql):
+        qualifier, column, operator = match.group(1), match.group(2), match.group(3).upper()
+        table = _column_table(conn, aliases, qualifier, column)
+        if table is None or column not in _table_columns(conn, table):
+            continue
+        for bound, group in ((0, 4), (1, 5)):
+            placeholder = match.group(group)
+            if placeholder is None or (bound and operator != "BETWEEN"):
+                continue
+            key = placeholder[1:] if placeholder.startswith(":") else positions.get(match.start(group))
+            found.setdefault(key, (table, column, operator, bound))
+    return found
+
+
+def sample_parameters(conn, sql):
+    """Parameters for replaying sql, drawn from the data; placeholders the advisor can't place are bound to NULL."""
+    found = predicates(conn, sql)
+    paging = {}
+    for match in _PAGING.finditer(sql):
+        placeholder = match.group(2)
+        key = placeholder[1:] if placeholder.startswith(":") else None
+        value = LIMIT_VALUE if match.group(1).upper() == "LIMIT" else 0
+        if key is None:
+            key = sum(1 for _ in _PLACEHOLDER.finditer(sql, 0, match.start(2)))
+        paging[key] = value
+
+    def value_for(key):
+        if key in paging:
+            return paging[key]
+        if key in found:
+            table, column, operator, bound = found[key]
+            return _sample_value(conn, table, column, operator, bound)
+        return None
+
+    placeholders = [match.group() for match in _PLACEHOLDER.finditer(sql)]
+    if any(placeholder.startswith(":") for placeholder in placeholders):
+        return {placeholder[1:]: value_for(placeholder[1:]) for placeholder in placeholders}
+    return [value_for(index) for index in range(len(placeholders))]
+
+
+def time_query(conn, sql, params, repeat):
+    """Median milliseconds to execute sql and fetch every row, and the row count."""
+    timings, rows = [], 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        rows = len(conn.execute(sql, params).fetchall())
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings), rows
+
+
+def _primary_key(conn, table):
+    return [row[1] for row in sorted(conn.execute(f"PRAGMA table_info({table})"), key=lambda row: row[5]) if row[5]]
+
+
+def _without_rowid(conn, table, columns):
+    """columns minus a trailing INTEGER PRIMARY KEY, which every index of a rowid table ends with anyway."""
+    key = _primary_key(conn, table)
+    return columns[:-1] if len(key) == 1 and columns[-1:] == key else columns
+
+
+def _managed_name(conn, table, columns):
+    """Name of the managed index with this definition, so a dropped one is proposed under its own name."""
+    for name, definition in db.MANAGED_INDEXES.items():
+        managed_table, _, rest = definition.partition(" (")
+        managed_columns = [column.strip() for column in rest.partition(")")[0].split(",")]
+        if managed_table == table and _without_rowid(conn, table, managed_columns) == _without_rowid(conn, table, columns):
+            return name
+    return None
+
+
+def _existing_indexes(conn, table):
+    """{index name: [column, ...]} for table; expression columns come back as None."""
+    return {row[1]: [info[2] for info in conn.execute(f"PRAGMA index_info({row[1]})")]
+            for row in conn.execute(f"PRAGMA index_list({table})")}
+
+
+def _order_columns(conn, sql, aliases):
+    match = None
+    for match in _ORDER_BY.finditer(sql):
+        pass
+    if match is None:
+        return []
+    columns = []
+    for term in match.group(1).split(","):
+        words = term.strip().split()
+        if not words:
+            continue
+        qualifier, _, column = words[0].rpartition(".")
+        table = _column_table(conn, aliases, qualifier, column)
+        if table is None:
+            return []
+        columns.append((table, column))
+    return columns
+
+
+def candidate_indexes(conn, sql, plan):
+    """(table, columns) worth trying for the tables the plan scans in full or sorts through a temp B-tree."""
+    aliases = slow_queries.table_aliases(sql)
+    found = list(predicates(conn, sql).values())
+    order = _order_columns(conn, sql, aliases)
+    targets = [table for table in slow_queries.scanned_tables(sql, plan) if table in aliases.values()]
+    if any(_TEMP_SORT.match(line) for line in plan) and order and len({table for table, _ in order}) == 1:
+        targets.append(order[0][0])
+    candidates = []
+    for table in dict.fromkeys(targets):
+        columns = [column for t, column, operator, _ in found if t == table and operator == "="]
+        ranges = [column for t, column, operator, _ in found if t == table and operator != "=" and column not in columns]
+        ordering = [column for t, column in order if t == table] if all(t == table for t, _ in order) else []
+        if ranges and not (ordering and ordering[0] == ranges[0]):
+            columns.append(ranges[0])
+        columns += [column for column in ordering if column not in columns]
+        columns = list(dict.fromkeys(columns))
+        if not columns or columns[:1] == _primary_key(conn, table):
+            continue
+        covered = [name for name, indexed in _existing_indexes(conn, table).items() if indexed[:len(columns)] == columns]
+        candidates.append((table, columns, covered[0] if covered else None))
+    return candidates
+
+
+def _stat(conn, name):
+    """sqlite_stat1 as (rows in the table, rows per value of the leading column), or None before ANALYZE."""
+    try:
+        row = conn.execute("SELECT stat FROM sqlite_stat1 WHERE idx = ?", (name,)).fetchone()
+    except sqlite3.OperationalError:
+        return None
+    if row is None:
+        return None
+    numbers = [int(part) for part in row[0].split() if part.isdigit()]
+    return (numbers[0], numbers[1]) if len(numbers) > 1 else None
+
+
+def _index_bytes(conn, name):
+    try:
+        return conn.execute("SELECT SUM(pgsize) FROM dbstat WHERE name = ?", (name,)).fetchone()[0]
+    except sqlite3.OperationalError:
+        return None
+
+
+def _foreign_key_columns(conn, table):
+    return {row[3] for row in conn.execute(f"PRAGMA foreign_key_list({table})")}
+
+
+def measure_index(conn, table, columns, queries, repeat):
+    """Creates the index in a rolled-back savepoint; returns its stat and each query's (ms, plan) with it in place."""
+    name = "advisor_" + "_".join([table] + columns).lower()
+    conn.execute("SAVEPOINT index_advisor")
+    try:
+        conn.execute(f"CREATE INDEX {name} ON {table} ({', '.join(columns)})")
+        conn.execute(f"ANALYZE {name}")
+        stat = _stat(conn, name)
+        results = [(time_query(conn, sql, params, repeat)[0], db._query_plan(conn, sql, params)) for sql, params in queries]
+    finally:
+        conn.execute("ROLLBACK TO index_advisor")
+        conn.execute("RELEASE index_advisor")
+    return stat, results
+
+
+def measure_without(conn, name, queries, repeat):
+    """Times the queries with index `name` dropped, inside a rolled-back savepoint."""
+    conn.execute("SAVEPOINT index_advisor")
+    try:
+        conn.execute(f"DROP INDEX {name}")
+        return [time_query(conn, sql, params, repeat)[0] for sql, params in queries]
+    finally:
+        conn.execute("ROLLBACK TO index_advisor")
+        conn.execute("RELEASE index_advisor")
+
+
+def replay(conn, summaries, repeat):
+    """Baseline timing and plan for every replayable (SELECT/WITH) fingerprint; the rest come back as skipped."""
+    replayed, skipped = [], []
+    for summary in summaries:
+        sql = summary["Statement"]
+        if not re.match(r"\s*(SELECT|WITH)\b", sql, re.I):
+            skipped.append((summary, "not a read"))
+            continue
+        if re.search(r"\bMATCH\b", sql, re.I):
+            skipped.append((summary, "full-text search, served by its FTS index"))
+            continue
+        try:
+            params = sample_parameters(conn, sql)
+            milliseconds, rows = time_query(conn, sql, params, repeat)
+        except sqlite3.Error as error:
+            skipped.append((summary, str(error)))
+            continue
+        replayed.append({**summary, "Params": params, "Ms": milliseconds, "ReplayRows": rows,
+                         "ReplayPlan": db._query_plan(conn, sql, params) or []})
+    return replayed, skipped
+
+
+def propose_missing(conn, replayed, repeat):
+    """Measured proposals, best total saving (per-execution saving x logged count) first."""
+    proposals = {}
+    for query in replayed:
+        for table, columns, covered_by in candidate_indexes(conn, query["Statement"], query["ReplayPlan"]):
+            proposal = proposals.setdefault((table, tuple(columns)), {"Table": table, "Columns": columns,
+                                                                      "CoveredBy": covered_by, "Queries": []})
+            proposal["Queries"].append(query)
+    measured = []
+    for proposal in proposals.values():
+        if proposal["CoveredBy"]:
+            measured.append({**proposal, "SavedMs": 0.0, "Stat": _stat(conn, proposal["CoveredBy"]), "Results": []})
+            continue
+        queries = [(query["Statement"], query["Params"]) for query in proposal["Queries"]]
+        stat, results = measure_index(conn, proposal["Table"], proposal["Columns"], queries, repeat)
+        saved = sum((query["Ms"] - after) * query["Count"] for query, (after, _) in zip(proposal["Queries"], results))
+        measured.append({**proposal, "SavedMs": saved, "Stat": stat, "Results": results})
+    return sorted(measured, key=lambda proposal: proposal["SavedMs"], reverse=True)
+
+
+def find_unused(conn, summaries, replayed, repeat):
+    """Indexes no logged or replayed plan mentions, with their stat, size and the replay timing without them."""
+    used = set()
+    for summary in summaries:
+        for line in summary["Plan"] or ():
+            used.update(_USES_INDEX.findall(line))
+    for query in replayed:
+        for line in query["ReplayPlan"]:
+            used.update(_USES_INDEX.findall(line))
+    unused = []
+    for name, table in conn.execute(
+        "SELECT name, tbl_name FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL ORDER BY tbl_name, name"
+    ).fetchall():
+        if name in used:
+            continue
+        columns = _existing_indexes(conn, table).get(name, [])
+        on_table = [query for query in replayed if table in slow_queries.table_aliases(query["Statement"]).values()]
+        queries = [(query["Statement"], query["Params"]) for query in on_table]
+        without = measure_without(conn, name, queries, repeat) if queries else []
+        unused.append({
+            "Name": name, "Table": table, "Columns": columns, "Stat": _stat(conn, name), "Bytes": _index_bytes(conn, name),
+            "Managed": name in db.MANAGED_INDEXES, "ForeignKey": bool(columns) and columns[0] in _foreign_key_columns(conn, table),
+            "BeforeMs": sum(query["Ms"] for query in on_table), "WithoutMs": sum(without), "Queries": len(queries),
+        })
+    return unused
+
+
+def _describe_stat(stat):
+    if stat is None:
+        return "no sqlite_stat1 row"
+    rows, per_key = stat
+    return f"{rows:,} rows, ~{per_key:,} per key"
+
+
+def print_report(conn, proposals, unused, replayed, skipped):
+    writes = sum(1 for _, reason in skipped if reason == "not a read")
+    print(f"Replayed {len(replayed):,} fingerprints; skipped {writes:,} writes and {len(skipped) - writes:,} other reads.")
+    for summary, reason in skipped:
+        if reason != "not a read":
+            print(f"  skipped {summary['Fingerprint']}: {reason}")
+
+    print("\n== Missing indexes ==")
+    gains = [p for p in proposals if not p["CoveredBy"] and p["Results"]
+             and any(after <= query["Ms"] * (1 - MIN_GAIN) and query["Ms"] - after >= MIN_GAIN_MS
+                     for query, (after, _) in zip(p["Queries"], p["Results"]))]
+    if not gains:
+        print("No candidate index made a replayed query measurably faster.")
+    for proposal in gains:
+        managed = _managed_name(conn, proposal["Table"], proposal["Columns"])
+        name = managed or f"idx_{proposal['Table'].lower()}_{'_'.join(proposal['Columns']).lower()}"
+        if managed:
+            print(f"\nCREATE INDEX {name} ON {db.MANAGED_INDEXES[name]};  -- managed index missing from this database")
+        else:
+            print(f"\nCREATE INDEX {name} ON {proposal['Table']} ({', '.join(proposal['Columns'])});")
+        print(f"   saves ~{proposal['SavedMs']:,.1f} ms over the logged executions; {_describe_stat(proposal['Stat'])}")
+        for query, (after, plan) in zip(proposal["Queries"], proposal["Results"]):
+            print(f"   {query['Fingerprint']} x{query['Count']:,}: {query['Ms']:,.2f} ms -> {after:,.2f} ms")
+            print(f"      before: {' / '.join(line.strip() for line in query['ReplayPlan'])}")
+            print(f"      after:  {' / '.join(line.strip() for line in plan or [])}")
+    for proposal in proposals:
+        if proposal["CoveredBy"]:
+            print(f"\n{proposal['Table']} ({', '.join(proposal['Columns'])}) is already indexed by {proposal['CoveredBy']} "
+                  f"({_describe_stat(proposal['Stat'])}) but the planner scans instead; run with --analyze.")
+
+    print("\n== Unused indexes ==")
+    if not unused:
+        print("Every index shows up in a logged or replayed plan.")
+    for index in unused:
+        notes = [note for flag, note in ((index["Managed"], "managed"), (index["ForeignKey"], "backs a foreign key")) if flag]
+        size = f"{index['Bytes'] / 1024:,.0f} KB" if index["Bytes"] is not None else "size unknown"
+        print(f"\n{index['Name']} ON {index['Table']} ({', '.join(str(c) for c in index['Columns'])})"
+              f"{' [' + ', '.join(notes) + ']' if notes else ''}")
+        print(f"   {_describe_stat(index['Stat'])}; {size}")
+        if index["Queries"]:
+            print(f"   {index['Queries']} replayed queries on {index['Table']}: "
+                  f"{index['BeforeMs']:,.2f} ms -> {index['WithoutMs']:,.2f} ms without it")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Propose missing and unused indexes by replaying the slow-query log.")
+    parser.add_argument("--db", default=db.DB_FILE, help=f"database file (default: {db.DB_FILE})")
+    parser.add_argument("--log", default=db.slow_query_log_path(), help=f"slow-query log (default: {db.slow_query_log_path()})")
+    parser.add_argument("--top", type=int, default=20, help="worst fingerprints (by total time) to replay")
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per query; the median is reported")
+    parser.add_argument("--analyze", action="store_true", help="run ANALYZE first (always done when sqlite_stat1 is missing)")
+    args = parser.parse_args(argv)
+
+    if not slow_queries.log_files(args.log):
+        print(f"No slow-query log at {args.log} (set DIYI_SLOW_QUERY_MS to start logging).")
+        return 1
+    summaries = slow_queries.aggregate(slow_queries.read_entries(args.log))
+    worst = sorted(summaries, key=lambda summary: summary["TotalMs"], reverse=True)[:args.top]
+    conn = open_database(args.db)
+    has_stats = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'").fetchone()
+    if args.analyze or not has_stats:
+        print("Running ANALYZE ...", flush=True)
+        conn.execute("ANALYZE")
+    replayed, skipped = replay(conn, worst, args.repeat)
+    proposals = propose_missing(conn, replayed, args.repeat)
+    unused = find_unused(conn, summaries, replayed, args.repeat)
+    print_report(conn, proposals, unused, replayed, skipped)
+    conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,152 @@
+"""Summarize the slow-query log written by database.py.
+
+    DIYI_SLOW_QUERY_MS=50 streamlit run app.py
+    python slow_queries.py
+    python slow_queries.py --log data/slow_queries.jsonl --top 10 --sort max
+
+Entries are grouped by fingerprint (the statement with literals normalized), and
+the worst fingerprints are listed with their count, total/p95/max duration and
+rows, the parameter types they were called with and their latest query plan.
+Plans that scan a whole Orders, OrderItems, Invoices, Expenses,
+SupplierServices or ProjectMaterials table are flagged, since those grow with
+every sale and every project. A scan under a LIMIT that needs no temp B-tree
+reads one page and is not flagged.
+"""
+import argparse
+import json
+import os
+import re
+import sys
+
+import database as db
+
+WATCHED_TABLES = ("Orders", "OrderItems", "Invoices", "Expenses", "SupplierServices", "ProjectMaterials")
+SORT_KEYS = {"total": "TotalMs", "p95": "P95Ms", "max": "MaxMs", "count": "Count"}
+
+_TABLE_REFERENCE = re.compile(r"\b(?:FROM|JOIN)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?", re.I)
+_NOT_ALIASES = {"on", "where", "join", "left", "right", "inner", "outer", "cross", "natural", "group", "order", "limit",
+                "using", "union", "window", "having", "indexed", "not", "set", "values"}
+_FULL_SCAN = re.compile(r"^\s*SCAN (\w+)\s*$")
+_LIMIT = re.compile(r"\bLIMIT\b", re.I)
+
+
+def log_files(path):
+    """The log followed by its rotated files, oldest last; files that don't exist are skipped."""
+    candidates = [path] + [f"{path}.{n}" for n in range(1, db.SLOW_QUERY_LOG_BACKUPS + 1)]
+    return [candidate for candidate in candidates if os.path.exists(candidate)]
+
+
+def read_entries(path):
+    """Yields the logged statements from the log and its rotated files, skipping lines that don't parse."""
+    for file_path in log_files(path):
+        with open(file_path, encoding="utf-8") as handle:
+            for line in handle:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+
+
+def table_aliases(sql):
+    """Maps every table name and alias in the FROM/JOIN clauses of sql to the table's name."""
+    aliases = {}
+    for table, alias in _TABLE_REFERENCE.findall(sql):
+        aliases[table] = table
+        if alias and alias.lower() not in _NOT_ALIASES:
+            aliases[alias] = table
+    return aliases
+
+
+def scanned_tables(sql, plan):
+    """Tables the plan reads in full: a bare SCAN, with no index to narrow or order it.
+
+    Under a LIMIT with no temp B-tree the scan stops after a page (keyset paging down the
+    rowid, e.g. ORDER BY OrderID DESC LIMIT ?), so it is not counted.
+    """
+    plan = plan or ()
+    if _LIMIT.search(sql) and not any("USE TEMP B-TREE" in line for line in plan):
+        return []
+    aliases = table_aliases(sql)
+    scanned = []
+    for line in plan:
+        match = _FULL_SCAN.match(line)
+        table = match and aliases.get(match.group(1), match.group(1))
+        if table and table not in scanned:
+            scanned.append(table)
+    return scanned
+
+
+def full_scans(sql, plan):
+    """Watched tables the plan reads in full (see scanned_tables)."""
+    return [table for table in scanned_tables(sql, plan) if table in WATCHED_TABLES]
+
+
+def _percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))]
+
+
+def aggregate(entries):
+    """One summary dict per fingerprint, unsorted."""
+    groups = {}
+    for entry in entries:
+        group = groups.setdefault(entry["Fingerprint"], {"Fingerprint": entry["Fingerprint"], "SQL": entry["SQL"],
+                                                         "Statement": entry.get("Statement") or entry["SQL"],
+                                                         "Durations": [], "Rows": 0, "ParamShapes": [], "Plan": None,
+                                                         "LastSeen": None})
+        group["Durations"].append(entry["DurationMs"])
+        group["Rows"] += entry.get("Rows") or 0
+        if entry.get("Params") not in group["ParamShapes"]:
+            group["ParamShapes"].append(entry.get("Params"))
+        if group["LastSeen"] is None or entry["Timestamp"] >= group["LastSeen"]:
+            group["LastSeen"] = entry["Timestamp"]
+            group["Plan"] = entry.get("Plan") or group["Plan"]
+    summaries = []
+    for group in groups.values():
+        durations = sorted(group.pop("Durations"))
+        summaries.append({
+            **group,
+            "Count": len(durations),
+            "TotalMs": sum(durations),
+            "P95Ms": _percentile(durations, 0.95),
+            "MaxMs": durations[-1],
+            "FullScans": full_scans(group["SQL"], group["Plan"]),
+        })
+    return summaries
+
+
+def print_report(summaries, top=20, sort="total"):
+    key = SORT_KEYS[sort]
+    worst = sorted(summaries, key=lambda s: s[key], reverse=True)[:top]
+    flagged = sum(1 for s in summaries if s["FullScans"])
+    print(f"{len(summaries):,} fingerprints, {sum(s['Count'] for s in summaries):,} slow statements, "
+          f"{flagged:,} with full scans of {', '.join(WATCHED_TABLES)}")
+    for rank, s in enumerate(worst, 1):
+        flag = f"  !! FULL SCAN: {', '.join(s['FullScans'])}" if s["FullScans"] else ""
+        print(f"\n#{rank} {s['Fingerprint']}  count={s['Count']:,}  total={s['TotalMs']:,.1f}ms  "
+              f"p95={s['P95Ms']:,.1f}ms  max={s['MaxMs']:,.1f}ms  rows={s['Rows']:,}{flag}")
+        print(f"   {s['SQL']}")
+        print(f"   params: {'; '.join(json.dumps(shape) for shape in s['ParamShapes'])}")
+        for line in s["Plan"] or ["(no plan)"]:
+            print(f"   | {line}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Summarize the DIYI slow-query log by statement fingerprint.")
+    parser.add_argument("--log", default=db.slow_query_log_path(), help=f"log file (default: {db.slow_query_log_path()})")
+    parser.add_argument("--top", type=int, default=20, help="fingerprints to list")
+    parser.add_argument("--sort", choices=sorted(SORT_KEYS), default="total", help="what makes a fingerprint worst")
+    parser.add_argument("--scans-only", action="store_true", help="only list fingerprints with flagged full scans")
+    args = parser.parse_args(argv)
+
+    if not log_files(args.log):
+        print(f"No slow-query log at {args.log} (set DIYI_SLOW_QUERY_MS to start logging).")
+        return 1
+    summaries = aggregate(read_entries(args.log))
+    if args.scans_only:
+        summaries = [s for s in summaries if s["FullScans"]]
+    print_report(summaries, top=args.top, sort=args.sort)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())